@@ -0,0 +1,168 @@
+"""
+Admission control for write requests.
+
+Off unless ADMISSION_CONTROL=1. Two layers, both in-process and shared by
+the FastAPI and Flask backends:
+
+- a per-client token bucket (RATE_LIMIT_PER_SECOND sustained, RATE_LIMIT_BURST
+  peak) that rejects with 429 once a client is over its budget. Sign-up and
+  sign-in (/api/auth/) have their own, smaller bucket
+  (AUTH_RATE_LIMIT_PER_SECOND, AUTH_RATE_LIMIT_BURST): each costs a bcrypt
+  hash, guessing passwords should be slow, and voting must not use up a
+  client's budget for signing in;
+- a concurrency limiter (WRITE_CONCURRENCY writes in flight) with a bounded
+  wait queue: a write that cannot start within WRITE_QUEUE_TIMEOUT_MS, or
+  arrives when WRITE_QUEUE_MAX writes are already waiting, is shed with 503.
+
+Rejections carry Retry-After so clients back off instead of piling up, which
+keeps reads and real-time delivery responsive during a vote storm. Limits
+are per process; with several workers the effective limit is multiplied.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from app import metrics
+
+ENABLED = os.getenv("ADMISSION_CONTROL", "0").lower() in ("1", "true", "yes", "on")
+WRITE_CONCURRENCY = int(os.getenv("WRITE_CONCURRENCY", "32"))
+WRITE_QUEUE_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT_MS", "500")) / 1000
+WRITE_QUEUE_MAX = int(os.getenv("WRITE_QUEUE_MAX", "256"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "30"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+AUTH_RATE_LIMIT_PER_SECOND = float(os.getenv("AUTH_RATE_LIMIT_PER_SECOND", "0.2"))
+AUTH_RATE_LIMIT_BURST = float(os.getenv("AUTH_RATE_LIMIT_BURST", "5"))
+
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+AUTH_PATH_PREFIX = "/api/auth/"
+
+RATE_LIMITED_MESSAGE = "Too many requests, slow down"
+OVERLOADED_MESSAGE = "Server is busy, try again shortly"
+
+def is_write(method: str, path: str) -> bool:
+    return method in WRITE_METHODS and path.startswith("/api/")
+
+def is_auth(path: str) -> bool:
+    return path.startswith(AUTH_PATH_PREFIX)
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+class TokenBucketLimiter:
+    """Per-key token buckets, two floats per client, capped at max_clients keys"""
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Take one token for key; returns 0 if allowed, else seconds until a token is due"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._evict(now)
+                bucket = self._buckets[key] = _Bucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / self.rate
+
+    def _evict(self, now: float):
+        # A bucket that has refilled is indistinguishable from a new one, so
+        # drop those first; if every client is active, drop the oldest keys.
+        full = [key for key, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+        while len(self._buckets) >= self.max_clients:
+            del self._buckets[next(iter(self._buckets))]
+
+class ConcurrencyLimiter:
+    """Bounded in-flight writes for threaded/gevent servers (create after monkey patching)"""
+
+    def __init__(self, limit: int = WRITE_CONCURRENCY, max_wait: float = WRITE_QUEUE_TIMEOUT,
+                 max_queue: int = WRITE_QUEUE_MAX):
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        if self._semaphore.acquire(blocking=False):
+            metrics.WRITES_IN_FLIGHT.inc()
+            return True
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+        start = time.perf_counter()
+        try:
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+        if acquired:
+            metrics.WRITES_IN_FLIGHT.inc()
+        return acquired
+
+    def release(self):
+        metrics.WRITES_IN_FLIGHT.dec()
+        self._semaphore.release()
+
+class AsyncConcurrencyLimiter:
+    """Bounded in-flight writes for asyncio servers"""
+
+    def __init__(self, limit: int = WRITE_CONCURRENCY, max_wait: float = WRITE_QUEUE_TIMEOUT,
+                 max_queue: int = WRITE_QUEUE_MAX):
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            metrics.WRITES_IN_FLIGHT.inc()
+            return True
+        if self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+            metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+        metrics.WRITES_IN_FLIGHT.inc()
+        return True
+
+    def release(self):
+        metrics.WRITES_IN_FLIGHT.dec()
+        self._semaphore.release()
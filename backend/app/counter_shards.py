@@ -0,0 +1,240 @@
+"""
+Sharded vote counters for hot polls.
+
+Every vote normally updates the same poll_options row and the same polls
+row (total_votes, version), so a poll going viral serializes on two row
+locks. Once a poll receives more than HOT_POLL_VOTES_PER_SECOND votes in a
+second (per process), its votes instead add +/-1 to one of COUNTER_SHARDS
+rows per option in a shard table, picked at random, and leave the poll and
+option rows untouched.
+
+The true count is always base row + shard rows, so workers need no
+coordination: reads add the shard sums (cached briefly), a poll can move in
+and out of sharded mode at any time, and fold() moves the shard sums back
+into the base rows when it closes and on the first unsharded vote after a
+poll cools down. Votes fold only polls whose shards this process wrote or
+read, so votes on polls that never had shards run no shard query. Each shard row also counts its writes, which are added to
+polls.version so ETags keep changing.
+
+COUNTER_SHARDING=auto (default) | always | off.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import func, select
+
+MODE = os.getenv("COUNTER_SHARDING", "auto").lower()
+SHARD_COUNT = int(os.getenv("COUNTER_SHARDS", "16"))
+HOT_VOTES_PER_SECOND = float(os.getenv("HOT_POLL_VOTES_PER_SECOND", "20"))
+HOT_COOLDOWN_SECONDS = float(os.getenv("HOT_POLL_COOLDOWN_SECONDS", "300"))
+TOTALS_TTL_SECONDS = 1.0
+MAX_TRACKED_POLLS = 10_000
+
+class _PollRate:
+    __slots__ = ("window", "count", "hot_until")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self.hot_until = 0.0
+
+class HotPollTracker:
+    """Per-poll vote rate in one-second windows; a poll stays hot for a cooldown"""
+
+    def __init__(self, threshold: float = HOT_VOTES_PER_SECOND, cooldown: float = HOT_COOLDOWN_SECONDS,
+                 mode: str = MODE):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.mode = mode
+        self._polls: Dict[int, _PollRate] = {}
+        # Polls this process wrote or read shard rows of, until they are folded
+        self._sharded: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def record_vote(self, poll_id: int, now: Optional[float] = None) -> bool:
+        """Count a vote; returns True when it should go to a counter shard"""
+        if self.mode == "always":
+            return True
+        if self.mode == "off":
+            return False
+        now = time.monotonic() if now is None else now
+        window = int(now)
+        with self._lock:
+            rate = self._polls.get(poll_id)
+            if rate is None:
+                if len(self._polls) >= MAX_TRACKED_POLLS:
+                    self._prune(now)
+                rate = self._polls[poll_id] = _PollRate(window)
+            if rate.window != window:
+                rate.window = window
+                rate.count = 0
+            rate.count += 1
+            if rate.count > self.threshold:
+                rate.hot_until = now + self.cooldown
+            return rate.hot_until > now
+
+    def note_shards(self, poll_id: int):
+        if len(self._sharded) >= MAX_TRACKED_POLLS and poll_id not in self._sharded:
+            # Only costs folds: reads and closes handle shards regardless
+            self._sharded.clear()
+        self._sharded.add(poll_id)
+
+    def may_have_shards(self, poll_id: int) -> bool:
+        return poll_id in self._sharded
+
+    def folded(self, poll_id: int):
+        self._sharded.discard(poll_id)
+
+    def _prune(self, now: float):
+        for poll_id in [poll_id for poll_id, rate in self._polls.items() if rate.hot_until <= now]:
+            del self._polls[poll_id]
+
+class ShardTotals:
+    """Shard sums for one poll: option_id -> net votes, and shard write count"""
+    __slots__ = ("options", "writes")
+
+    def __init__(self, options: Optional[Dict[int, int]] = None, writes: int = 0):
+        self.options = options or {}
+        self.writes = writes
+
+    @property
+    def votes(self) -> int:
+        # Vote changes add -1 and +1, so the net over options is new votes only
+        return sum(self.options.values())
+
+class ShardTotalsCache:
+    def __init__(self, ttl: float = TOTALS_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[int, tuple] = {}
+
+    def get(self, poll_id: int, loader) -> ShardTotals:
+        now = time.monotonic()
+        entry = self._entries.get(poll_id)
+        if entry and entry[1] > now:
+            return entry[0]
+        totals = loader()
+        self.put(poll_id, totals)
+        return totals
+
+    def put(self, poll_id: int, totals: ShardTotals):
+        if len(self._entries) >= MAX_TRACKED_POLLS and poll_id not in self._entries:
+            self._entries.clear()
+        self._entries[poll_id] = (totals, time.monotonic() + self.ttl)
+
+    def invalidate(self, poll_id: int):
+        self._entries.pop(poll_id, None)
+
+tracker = HotPollTracker()
+totals_cache = ShardTotalsCache()
+
+def _upsert(dialect_name: str, shards):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(shards)
+
+def increment(session, shards, poll_id: int, option_id: int, delta: int, shard: Optional[int] = None):
+    """Add delta to a random shard of option_id (one row lock, no poll row lock)"""
+    shard = random.randrange(SHARD_COUNT) if shard is None else shard
+    tracker.note_shards(poll_id)
+    c = shards.c
+    stmt = _upsert(session.get_bind().dialect.name, shards)
+    if stmt is not None:
+        stmt = stmt.values(poll_id=poll_id, option_id=option_id, shard=shard, count=delta, writes=1)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[c.option_id, c.shard],
+            set_={"count": c.count + delta, "writes": c.writes + 1}
+        ))
+        return
+    updated = session.execute(
+        shards.update().where(c.option_id == option_id, c.shard == shard)
+        .values(count=c.count + delta, writes=c.writes + 1)
+    ).rowcount
+    if not updated:
+        session.execute(shards.insert().values(
+            poll_id=poll_id, option_id=option_id, shard=shard, count=delta, writes=1
+        ))
+
+def load_totals(session, shards, poll_id: int) -> ShardTotals:
+    c = shards.c
+    rows = session.execute(
+        select(c.option_id, func.sum(c.count), func.sum(c.writes))
+        .where(c.poll_id == poll_id).group_by(c.option_id)
+    ).all()
+    if rows:
+        tracker.note_shards(poll_id)
+    return ShardTotals({option_id: int(count) for option_id, count, _ in rows},
+                       sum(int(writes) for _, _, writes in rows))
+
+def cached_totals(session, shards, poll_id: int) -> ShardTotals:
+    return totals_cache.get(poll_id, lambda: load_totals(session, shards, poll_id))
+
+def refresh_totals(session, shards, poll_id: int) -> ShardTotals:
+    """Re-read after a sharded write, for the broadcast and the cache"""
+    totals = load_totals(session, shards, poll_id)
+    totals_cache.put(poll_id, totals)
+    return totals
+
+def pending_writes(shards, poll_id_column):
+    """Scalar subquery: shard writes not yet folded into polls.version"""
+    c = shards.c
+    return func.coalesce(
+        select(func.sum(c.writes)).where(c.poll_id == poll_id_column).scalar_subquery(), 0
+    )
+
+def total_pending_writes(shards):
+    return func.coalesce(select(func.sum(shards.c.writes)).scalar_subquery(), 0)
+
+def shard_votes_statement(shards, poll_ids: Iterable[int]):
+    """poll_id -> votes counted in shards and not yet folded into polls.total_votes"""
+    return select(shards.c.poll_id, func.sum(shards.c.count)).where(
+        shards.c.poll_id.in_(list(poll_ids))
+    ).group_by(shards.c.poll_id)
+
+def apply_to_detail(detail: dict, totals: ShardTotals) -> dict:
+    """Add shard sums to a serialized poll detail (total_votes, options[].vote_count)"""
+    if not totals.options:
+        return detail
+    detail["total_votes"] = (detail["total_votes"] or 0) + totals.votes
+    for option in detail["options"]:
+        option["vote_count"] = (option["vote_count"] or 0) + totals.options.get(option["id"], 0)
+    return detail
+
+def fold(session, shards, options, polls, poll_id: int) -> ShardTotals:
+    """Move a poll's shard sums into its option and poll rows
+
+    Each shard row is decremented by exactly what was read, so increments
+    committed concurrently by other workers are kept, not lost.
+    """
+    session.flush()
+    c = shards.c
+    rows = session.execute(
+        select(c.option_id, c.shard, c.count, c.writes).where(c.poll_id == poll_id)
+    ).all()
+    totals = ShardTotals()
+    if not rows:
+        tracker.folded(poll_id)
+        return totals
+    for option_id, shard, count, writes in rows:
+        session.execute(shards.update().where(c.option_id == option_id, c.shard == shard)
+                        .values(count=c.count - count, writes=c.writes - writes))
+        totals.options[option_id] = totals.options.get(option_id, 0) + count
+        totals.writes += writes
+    for option_id, count in totals.options.items():
+        if count:
+            session.execute(options.update().where(options.c.id == option_id)
+                            .values(vote_count=options.c.vote_count + count))
+    session.execute(polls.update().where(polls.c.id == poll_id).values(
+        total_votes=polls.c.total_votes + totals.votes,
+        version=polls.c.version + totals.writes
+    ))
+    session.execute(shards.delete().where(c.poll_id == poll_id, c.writes == 0))
+    totals_cache.invalidate(poll_id)
+    tracker.folded(poll_id)
+    return totals
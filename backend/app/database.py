@@ -1,16 +1,33 @@
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app import group_commit, replicas, sql_profiler
+
 # Use SQLite for development, PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./opinion_poll.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+def _create_engine(url: str):
+    return create_engine(url, connect_args={"check_same_thread": False} if "sqlite" in url else {})
+
+engine = _create_engine(DATABASE_URL)
+sql_profiler.attach(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Votes and likes go through one writer thread on SQLite (see app.group_commit)
+group_writer = group_commit.writer_for(engine)
+
+# Optional read replica for read-only routes (see app.replicas)
+replica_engine = None
+ReplicaSessionLocal = None
+if replicas.REPLICA_URL:
+    replica_engine = _create_engine(replicas.normalize_url(replicas.REPLICA_URL))
+    sql_profiler.attach(replica_engine)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine, info={"replica": True})
 
 Base = declarative_base()
 
@@ -20,3 +37,33 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def client_key(request: Request) -> str:
+    """Anonymous client identity: address and user agent"""
+    return f"{request.client.host}|{request.headers.get('user-agent', '')}"
+
+def get_read_db(request: Request):
+    """Session for read-only routes: the replica, unless the client just wrote"""
+    if ReplicaSessionLocal is None or not replicas.use_replica(client_key(request), request.cookies):
+        yield from get_db()
+        return
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def use_primary(db: Session) -> Session:
+    """Move a replica session over to the primary, e.g. when the replica lags"""
+    if replicas.is_replica(db):
+        db.close()
+        db.bind = engine
+        db.info["replica"] = False
+    return db
+
+def after_fork():
+    """Drop pooled connections inherited from a parent that imported the app (app.launcher)"""
+    engines = [engine, replica_engine, group_writer.engine if group_writer is not None else None]
+    for pooled in engines:
+        if pooled is not None:
+            pooled.dispose(close=False)
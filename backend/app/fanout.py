@@ -0,0 +1,136 @@
+"""
+Relay of real-time updates between the worker processes of one server.
+
+WebSocket and SSE clients stay connected to one worker each, but a vote is
+handled by whichever worker accepted the request. With more than one
+worker (python -m app.launcher), each broadcast must therefore also reach
+the other workers' clients. The launcher creates a directory and passes it
+to its workers in FANOUT_DIR. Every worker binds a Unix datagram socket
+named after its pid there, sends each broadcast once to every other
+socket, and delivers what it receives to its own clients only, without
+relaying it again.
+
+Datagrams between two processes arrive in order and cost one syscall per
+peer. A peer whose receive buffer is full misses the update
+(fanout_dropped_total), just as a stalled client would. The relay covers
+the workers of one host; without FANOUT_DIR (a single worker, uvicorn run
+directly, tests) nothing is relayed.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from app import metrics
+from app.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = os.getenv("FANOUT_DIR") or None
+MAX_DATAGRAM = 64 * 1024
+RECEIVE_BUFFER = 1 << 20
+PEERS_TTL_SECONDS = 1.0
+
+RELAYED = metrics.registry.counter(
+    "fanout_relayed_total", "Real-time updates relayed between workers", ["direction"]
+)
+DROPPED = metrics.registry.counter(
+    "fanout_dropped_total", "Real-time updates not relayed to another worker (buffer full or too large)"
+)
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+class WorkerBus:
+    def __init__(self, directory: Optional[str] = DIRECTORY):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+        self._deliver: Optional[Deliver] = None
+        self._peers: List[str] = []
+        self._peers_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._socket is not None
+
+    def start(self, deliver: Deliver):
+        """Bind this worker's socket; relayed updates go to deliver() on the running loop"""
+        if self.directory is None or self._socket is not None:
+            return
+        self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            # Left behind by an earlier process with the same pid
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        sock.bind(self.path)
+        sock.setblocking(False)
+        self._socket = sock
+        self._deliver = deliver
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._receive)
+        logger.info(f"Relaying real-time updates through {self.path}")
+
+    def stop(self):
+        if self._socket is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        except RuntimeError:
+            pass
+        self._socket.close()
+        self._socket = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _peer_paths(self) -> List[str]:
+        now = time.monotonic()
+        if now >= self._peers_until:
+            own = os.path.basename(self.path)
+            self._peers = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                           if name.endswith(".sock") and name != own]
+            self._peers_until = now + PEERS_TTL_SECONDS
+        return self._peers
+
+    def publish(self, update: dict):
+        """Send an update to every other worker"""
+        if self._socket is None:
+            return
+        payload = dumps(update)
+        peers = self._peer_paths()
+        if len(payload) > MAX_DATAGRAM:
+            DROPPED.inc(len(peers))
+            logger.warning(f"Real-time update of {len(payload)} bytes is too large to relay")
+            return
+        for peer in peers:
+            try:
+                self._socket.sendto(payload, peer)
+                RELAYED.inc(direction="sent")
+            except BlockingIOError:
+                DROPPED.inc()
+            except ConnectionRefusedError:
+                # Nothing is bound to it any more: a worker that exited
+                self._forget(peer)
+            except FileNotFoundError:
+                self._peers_until = 0.0
+
+    def _forget(self, peer: str):
+        try:
+            os.unlink(peer)
+        except FileNotFoundError:
+            pass
+        self._peers_until = 0.0
+
+    def _receive(self):
+        while self._socket is not None:
+            try:
+                payload = self._socket.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            RELAYED.inc(direction="received")
+            asyncio.ensure_future(self._deliver(loads(payload)))
+
+bus = WorkerBus()
@@ -0,0 +1,25 @@
+"""
+Heartbeat settings shared by the real-time transports.
+
+The server pings every client each REALTIME_PING_INTERVAL seconds and drops
+clients it has not heard from for REALTIME_IDLE_TIMEOUT seconds, so
+half-open connections (typically mobile clients that vanished) stop costing
+a send on every broadcast. Raw WebSocket clients must answer
+{"type": "ping"} with a message of their own, conventionally
+{"type": "pong"}: a client that only listens is dropped after
+REALTIME_IDLE_TIMEOUT. Socket.IO clients answer Engine.IO pings
+automatically. Flask counts Socket.IO clients dropped this way from the
+disconnect reason, which python-socketio passes since 5.12.
+"""
+import os
+
+PING_INTERVAL = float(os.getenv("REALTIME_PING_INTERVAL", "25"))
+IDLE_TIMEOUT = float(os.getenv("REALTIME_IDLE_TIMEOUT", "60"))
+
+def engineio_options() -> dict:
+    """SocketIO() keyword arguments giving Engine.IO the same heartbeat"""
+    # Engine.IO drops a client that has not answered within interval + timeout
+    return {
+        "ping_interval": PING_INTERVAL,
+        "ping_timeout": max(5.0, IDLE_TIMEOUT - PING_INTERVAL)
+    }
@@ -0,0 +1,367 @@
+"""
+In-process state of live polls: counts in arrays, checkpointed to the DB.
+
+Every poll detail read loaded the poll, its creator and its options as ORM
+objects to read a handful of integers, and every vote and like updated the
+same poll and option rows. With HOT_STATE=1 each worker keeps a PollState
+per live poll it serves, loaded on the first read or write:
+
+- option ids and their counts in two array('q'), the poll totals as ints and
+  the poll's text fields in one tuple, so an entry costs a few hundred bytes
+  (benchmarks/bench_hot_state.py measures it per 100k polls);
+- votes, likes and unlikes still commit their vote/like row, but add their
+  counter changes to the entry's pending deltas instead of updating the
+  poll and option rows;
+- every HOT_STATE_CHECKPOINT_SECONDS a background thread adds the pending
+  deltas to the rows (vote_count = vote_count + d, version = version + n),
+  so workers never overwrite each other's counts.
+
+GET /api/polls/{id} is answered from the entry while the poll's stored
+version (read through the version cache, shards included) is the one the
+entry was loaded at; a checkpoint or edit by another worker, or a PATCH,
+reloads it. ETags are the stored version plus the entry's pending writes.
+The feed adds the pending deltas of this worker's entries to its counts and
+their writes to its version, so its ETag changes with every vote and stays
+valid across a checkpoint. Pending writes are per worker: until their next
+checkpoints, two workers can answer with the same ETag for different
+counts, so a client switching workers may get a 304 for counts up to one
+interval old. Closing a poll and checkpoints of closed polls still add the
+dropped writes to its version, so versions never go backwards. Replica
+reads see counts as of the last checkpoint.
+
+A worker that dies loses at most one interval of counter deltas; the vote
+and like rows are intact and closing a poll recounts its counters from
+them. Checkpoints skip closed polls for the same reason. At most
+HOT_STATE_MAX_POLLS entries are kept; entries with pending deltas are never
+evicted. Entries, lookups and checkpoints are exported on /metrics
+(hot_state_*).
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, exists, func, select
+
+from app import metrics
+from app.versioning import versions
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("HOT_STATE", "0").lower() in ("1", "true", "yes", "on")
+CHECKPOINT_SECONDS = float(os.getenv("HOT_STATE_CHECKPOINT_SECONDS", "1"))
+MAX_POLLS = int(os.getenv("HOT_STATE_MAX_POLLS", "100000"))
+
+ENTRIES = metrics.registry.gauge("hot_state_polls", "Polls held in the hot state store")
+LOOKUPS = metrics.registry.counter(
+    "hot_state_lookups_total", "Poll detail reads by hot state outcome", ["result"]
+)
+CHECKPOINTED = metrics.registry.counter(
+    "hot_state_checkpointed_polls_total", "Polls whose pending counter deltas were checkpointed"
+)
+CHECKPOINT_SECONDS_METRIC = metrics.registry.histogram(
+    "hot_state_checkpoint_seconds", "Time to write and commit one hot state checkpoint"
+)
+
+class PollState:
+    """Counts of one live poll: stored values plus this worker's pending deltas"""
+    __slots__ = ("poll_id", "header", "option_ids", "counts", "pending", "total_votes", "total_likes",
+                 "pending_votes", "pending_likes", "pending_writes", "db_version")
+
+    def __init__(self, poll_id: int, header: tuple, option_ids: array, counts: array,
+                 total_votes: int, total_likes: int, db_version: int):
+        self.poll_id = poll_id
+        # (title, description, created_at, updated_at, creator_id, creator username,
+        #  creator email, creator created_at, poll type, option texts)
+        self.header = header
+        self.option_ids = option_ids
+        self.counts = counts
+        # Allocated on the first vote
+        self.pending: Optional[array] = None
+        self.total_votes = total_votes
+        self.total_likes = total_likes
+        self.pending_votes = 0
+        self.pending_likes = 0
+        self.pending_writes = 0
+        self.db_version = db_version
+
+    @property
+    def version(self) -> int:
+        return self.db_version + self.pending_writes
+
+    @property
+    def votes(self) -> int:
+        return self.total_votes + self.pending_votes
+
+    @property
+    def likes(self) -> int:
+        return self.total_likes + self.pending_likes
+
+    @property
+    def dirty(self) -> bool:
+        return self.pending_writes > 0
+
+    def vote_counts(self) -> List[int]:
+        if self.pending is None:
+            return self.counts.tolist()
+        return [count + delta for count, delta in zip(self.counts, self.pending)]
+
+    def vote_count(self, option_id: int) -> int:
+        index = self.option_ids.index(option_id)
+        return self.counts[index] + (self.pending[index] if self.pending is not None else 0)
+
+    def options(self) -> Iterable[Tuple[int, str, int]]:
+        """(option id, option text, vote count) in display order"""
+        return zip(self.option_ids, self.header[-1], self.vote_counts())
+
+    def add_vote(self, previous_option_id: Optional[int], option_id: int):
+        if self.pending is None:
+            self.pending = array("q", bytes(8 * len(self.option_ids)))
+        if previous_option_id is None:
+            self.pending_votes += 1
+        else:
+            self.pending[self.option_ids.index(previous_option_id)] -= 1
+        self.pending[self.option_ids.index(option_id)] += 1
+        self.pending_writes += 1
+
+    def add_like(self, delta: int):
+        self.pending_likes += delta
+        self.pending_writes += 1
+
+    def take_pending(self) -> tuple:
+        """A copy of the pending deltas with the option ids, for a checkpoint"""
+        return (self.pending_votes, self.pending_likes, self.pending_writes,
+                array("q", self.pending) if self.pending is not None else None, self.option_ids)
+
+    def checkpointed(self, deltas: tuple):
+        """Move checkpointed deltas from pending into the stored values"""
+        votes, likes, writes, pending, _ = deltas
+        self.total_votes += votes
+        self.pending_votes -= votes
+        self.total_likes += likes
+        self.pending_likes -= likes
+        self.db_version += writes
+        self.pending_writes -= writes
+        if pending is not None:
+            for index, delta in enumerate(pending):
+                if delta:
+                    self.counts[index] += delta
+                    self.pending[index] -= delta
+
+    def reload(self, state: "PollState"):
+        """Take stored values from a fresh load, keeping pending deltas"""
+        self.header = state.header
+        self.option_ids = state.option_ids
+        self.counts = state.counts
+        self.total_votes = state.total_votes
+        self.total_likes = state.total_likes
+        self.db_version = state.db_version
+
+def state_from_poll(poll, totals) -> PollState:
+    """PollState of an ORM poll loaded with its creator and options, plus its
+    counter_shards.ShardTotals"""
+    creator = poll.creator
+    options = poll.options
+    header = (poll.title, poll.description, poll.created_at, poll.updated_at, poll.creator_id,
+              creator.username, creator.email, creator.created_at, poll.poll_type,
+              tuple(option.option_text for option in options))
+    return PollState(
+        poll.id, header,
+        array("q", [option.id for option in options]),
+        array("q", [(option.vote_count or 0) + totals.options.get(option.id, 0) for option in options]),
+        (poll.total_votes or 0) + totals.votes, poll.total_likes or 0, poll.version + totals.writes
+    )
+
+
+def _write_deltas(session, polls, options, deltas: Dict[int, tuple]):
+    """Add checkpointed deltas to the counters of polls still open
+
+    Poll rows are updated first, so on PostgreSQL a checkpoint racing a close
+    waits for it and then skips the closed poll's counters too. Versions are
+    advanced either way, since the writes were in this worker's ETags.
+    """
+    p, o = polls.c, options.c
+    session.execute(
+        polls.update().where(p.id == bindparam("poll_id")).values(
+            total_votes=case((p.is_active == True, p.total_votes + bindparam("votes")), else_=p.total_votes),
+            total_likes=case((p.is_active == True, p.total_likes + bindparam("likes")), else_=p.total_likes),
+            version=p.version + bindparam("writes")
+        ),
+        [{"poll_id": poll_id, "votes": votes, "likes": likes, "writes": writes}
+         for poll_id, (votes, likes, writes, _, _) in deltas.items()]
+    )
+    option_rows = [
+        {"option_id": option_id, "delta": delta}
+        for _, _, _, pending, option_ids in deltas.values() if pending is not None
+        for option_id, delta in zip(option_ids, pending) if delta
+    ]
+    if option_rows:
+        session.execute(
+            options.update().where(
+                o.id == bindparam("option_id"),
+                exists().where(p.id == o.poll_id, p.is_active == True)
+            ).values(vote_count=o.vote_count + bindparam("delta")),
+            option_rows
+        )
+
+def recount(session, polls, options, votes, likes, shards, poll_id: int):
+    """Set a poll's counters from its vote and like rows and drop its shards, without committing"""
+    session.flush()
+    p, o = polls.c, options.c
+    session.execute(options.update().where(o.poll_id == poll_id).values(
+        vote_count=select(func.count()).where(votes.c.option_id == o.id).scalar_subquery()
+    ))
+    session.execute(shards.delete().where(shards.c.poll_id == poll_id))
+    session.execute(polls.update().where(p.id == poll_id).values(
+        total_votes=select(func.count()).where(votes.c.poll_id == poll_id).scalar_subquery(),
+        total_likes=select(func.count()).where(likes.c.poll_id == poll_id).scalar_subquery()
+    ))
+
+class HotStateStore:
+    def __init__(self, max_polls: int = MAX_POLLS, interval: float = CHECKPOINT_SECONDS):
+        self.max_polls = max_polls
+        self.interval = interval
+        self._polls: Dict[int, PollState] = {}
+        # Sum of the entries' pending_writes, for the feed's version
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        # Held across a checkpoint's write, so a reload never reads rows that
+        # are missing deltas already taken out of pending. Created by
+        # configure(), after gevent has patched threading.
+        self._checkpoint_lock: Optional[threading.Lock] = None
+        self._checkpoint: Optional[Callable[[], int]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return len(self._polls)
+
+    def get(self, poll_id: int) -> Optional[PollState]:
+        return self._polls.get(poll_id)
+
+    def fresh(self, poll_id: int, stored_version: Callable[[], Optional[int]]) -> Optional[PollState]:
+        """The poll's entry if it was loaded at the stored version, read by
+        stored_version() only when there is an entry"""
+        state = self._polls.get(poll_id)
+        if state is None:
+            LOOKUPS.inc(result="miss")
+            return None
+        if state.db_version != stored_version():
+            LOOKUPS.inc(result="stale")
+            return None
+        LOOKUPS.inc(result="hit")
+        return state
+
+    def pending_writes(self, poll_id: int) -> int:
+        state = self._polls.get(poll_id)
+        return state.pending_writes if state is not None else 0
+
+    def total_pending_writes(self) -> int:
+        return self._pending_writes
+
+    def load(self, poll, totals) -> PollState:
+        """Enter a live ORM poll (creator and options loaded) with its shard totals"""
+        loaded = state_from_poll(poll, totals)
+        with self._checkpoint_lock or nullcontext(), self._lock:
+            state = self._polls.get(poll.id)
+            if state is None:
+                state = self._polls[poll.id] = loaded
+                self._evict()
+            else:
+                state.reload(loaded)
+        ENTRIES.set(len(self._polls))
+        return state
+
+    def _evict(self):
+        # Oldest entries first; pending deltas are kept until checkpointed
+        excess = len(self._polls) - self.max_polls
+        if excess <= 0:
+            return
+        for poll_id in [poll_id for poll_id, state in self._polls.items() if not state.dirty][:excess]:
+            del self._polls[poll_id]
+
+    def record_vote(self, state: PollState, previous_option_id: Optional[int], option_id: int) -> PollState:
+        """Count a committed vote (moved from previous_option_id, if any)"""
+        with self._lock:
+            # Re-entered in case it was evicted since the caller looked it up
+            state = self._polls.setdefault(state.poll_id, state)
+            state.add_vote(previous_option_id, option_id)
+            self._pending_writes += 1
+        self._start()
+        return state
+
+    def record_like(self, state: PollState, delta: int) -> PollState:
+        """Count a committed like (+1) or unlike (-1)"""
+        with self._lock:
+            state = self._polls.setdefault(state.poll_id, state)
+            state.add_like(delta)
+            self._pending_writes += 1
+        self._start()
+        return state
+
+    def forget(self, poll_id: int):
+        """Drop a poll and its pending deltas, e.g. once it is closed and recounted"""
+        with self._lock:
+            state = self._polls.pop(poll_id, None)
+            if state is not None:
+                self._pending_writes -= state.pending_writes
+        ENTRIES.set(len(self._polls))
+
+    def configure(self, run_write: Callable, polls, options):
+        """Set how checkpoints are written: run_write(operation) runs
+        operation(session) and commits, polls/options are the tables"""
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint = lambda: self.checkpoint(run_write, polls, options)
+        atexit.register(self.flush)
+
+    def checkpoint(self, run_write: Callable, polls, options) -> int:
+        """Write every entry's pending deltas in one transaction; returns the polls written"""
+        with self._checkpoint_lock or nullcontext():
+            with self._lock:
+                deltas = {poll_id: state.take_pending() for poll_id, state in self._polls.items() if state.dirty}
+            if not deltas:
+                return 0
+            start = time.perf_counter()
+            run_write(lambda session: _write_deltas(session, polls, options, deltas))
+            CHECKPOINT_SECONDS_METRIC.observe(time.perf_counter() - start)
+            with self._lock:
+                for poll_id, taken in deltas.items():
+                    state = self._polls.get(poll_id)
+                    if state is not None:
+                        state.checkpointed(taken)
+                        self._pending_writes -= taken[2]
+        for poll_id in deltas:
+            # Reload the stored version; other workers' checkpoints may be in it too
+            versions.record_write(poll_id)
+        CHECKPOINTED.inc(len(deltas))
+        return len(deltas)
+
+    def flush(self):
+        """Checkpoint now, e.g. at shutdown"""
+        if self._checkpoint is None:
+            return
+        try:
+            self._checkpoint()
+        except Exception:
+            logger.exception("Hot state checkpoint failed")
+
+    def _start(self):
+        # Started on first use, after gevent has patched threading
+        if self._thread is not None or self._checkpoint is None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="hot-state-checkpoint", daemon=True)
+        # Not under the lock: start() waits for the thread, which yields under gevent
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+store = HotStateStore()
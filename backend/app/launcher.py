@@ -0,0 +1,172 @@
+"""
+Production launcher for either backend.
+
+    cd backend && python -m app.launcher --backend fastapi
+    cd backend && python -m app.launcher --backend flask --bind 0.0.0.0:10000
+
+Both backends run under gunicorn's pre-fork master. It binds the listening
+socket once and every worker accepts from that shared socket. `kill -HUP`
+on the master reloads gracefully: new workers start with fresh code and the
+old ones finish their requests first (up to GRACEFUL_TIMEOUT). `kill -USR2`
+starts a whole new master on the same socket for upgrades.
+
+- fastapi runs WEB_CONCURRENCY workers. The default is one per CPU this
+  process may use: its CPU affinity, capped by a cgroup CPU quota. Workers
+  are uvicorn on uvloop and httptools when those are installed. The app is
+  imported once in the master before forking, so migrations run once and
+  workers start from shared, already-imported code. Each worker then drops
+  the connection pools it inherited. Real-time updates reach the clients of
+  other workers through app.fanout.
+- flask runs one gevent worker by default. Socket.IO's polling transport
+  needs all of a client's requests on one process, which a shared socket
+  does not guarantee. More workers (--workers) only suit clients that use
+  the websocket transport. The app is not preloaded: gevent has to patch
+  the standard library in the worker before the app is imported.
+
+Every worker warms up before it takes requests. It opens
+WARMUP_CONNECTIONS pooled database connections, and with HOT_STATE=1 it
+loads the WARMUP_POLLS most recent live polls into the hot state store.
+"""
+import argparse
+import importlib.util
+import math
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+WARMUP_POLLS = int(os.getenv("WARMUP_POLLS", "1000"))
+
+TARGETS = {"fastapi": "app.main:app", "flask": "app_flask:app"}
+
+def _event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def _http_parser() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+try:
+    from uvicorn.workers import UvicornWorker
+except ImportError:
+    UvicornWorker = None
+else:
+    class FastAPIWorker(UvicornWorker):
+        """uvicorn worker on uvloop and httptools when they are installed"""
+        CONFIG_KWARGS = {"loop": _event_loop(), "http": _http_parser(), "lifespan": "on"}
+
+def available_cpus() -> int:
+    """CPUs this process may run on, capped by a cgroup (v2) CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def default_workers(backend: str) -> int:
+    if backend == "flask":
+        return 1
+    return available_cpus()
+
+def warm_pool(engine, connections: int):
+    """Open up to connections pooled connections and hand them back to the pool"""
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.exec_driver_sql("SELECT 1")
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+
+def _after_fork_fastapi(server, worker):
+    from app import database
+    database.after_fork()
+
+def _warm_fastapi(worker):
+    from app.database import engine
+    from app.routers import polls
+    start = time.perf_counter()
+    warm_pool(engine, WARMUP_CONNECTIONS)
+    loaded = polls.warm_hot_state(WARMUP_POLLS)
+    worker.log.info(f"Worker {worker.pid} warmed up in {time.perf_counter() - start:.2f}s "
+                    f"({WARMUP_CONNECTIONS} connections, {loaded} polls)")
+
+def _warm_flask(worker):
+    import app_flask
+    start = time.perf_counter()
+    with app_flask.app.app_context():
+        warm_pool(app_flask.db.engine, WARMUP_CONNECTIONS)
+    loaded = app_flask.warm_hot_state(WARMUP_POLLS)
+    worker.log.info(f"Worker {worker.pid} warmed up in {time.perf_counter() - start:.2f}s "
+                    f"({WARMUP_CONNECTIONS} connections, {loaded} polls)")
+
+class Server(BaseApplication):
+    """gunicorn configured from arguments instead of a config file"""
+
+    def __init__(self, target: str, options: dict):
+        self.target = target
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return import_app(self.target)
+
+def server_options(backend: str, bind: str, workers: int) -> dict:
+    options = {
+        "bind": bind,
+        "workers": workers,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "keepalive": 5,
+        "accesslog": None,
+        "errorlog": "-",
+    }
+    if backend == "fastapi":
+        if UvicornWorker is None:
+            raise SystemExit("The FastAPI backend needs uvicorn: pip install uvicorn uvloop httptools")
+        options.update(worker_class="app.launcher.FastAPIWorker", preload_app=True,
+                       post_fork=_after_fork_fastapi, post_worker_init=_warm_fastapi)
+    else:
+        options.update(worker_class="gevent", preload_app=False, post_worker_init=_warm_flask)
+    return options
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=sorted(TARGETS), default="fastapi")
+    parser.add_argument("--bind", default=f"0.0.0.0:{os.getenv('PORT', '8000')}")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="default: WEB_CONCURRENCY, else one per CPU (fastapi) or 1 (flask)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or default_workers(args.backend)
+    fanout_dir = None
+    if args.backend == "fastapi" and workers > 1 and not os.getenv("FANOUT_DIR"):
+        # Read by app.fanout when the app is imported, before the workers fork
+        fanout_dir = os.environ["FANOUT_DIR"] = tempfile.mkdtemp(prefix="poll-fanout-")
+    master_pid = os.getpid()
+    try:
+        Server(TARGETS[args.backend], server_options(args.backend, args.bind, workers)).run()
+    finally:
+        # Exiting workers unwind through here too
+        if fanout_dir is not None and os.getpid() == master_pid:
+            shutil.rmtree(fanout_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
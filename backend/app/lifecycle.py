@@ -0,0 +1,240 @@
+"""
+Vote lifecycle: archive raw votes of closed polls, partition the live table.
+
+Closed polls take no more votes and their counts are final in poll_options
+(and the frozen snapshot), yet their vote rows stayed in the votes table and
+its indexes forever. `archive` streams each long-closed poll's votes into a
+gzip NDJSON file under VOTE_ARCHIVE_DIR, then deletes them and records the
+file in vote_archives, in one transaction. The file is fsynced before any
+row is deleted, and the delete must match the row count that was written,
+so a crash or a concurrent write leaves the rows in place. The live table is
+left with the votes of open polls, whose indexes stay small.
+
+`partition` converts votes on PostgreSQL into a table hash-partitioned by
+poll_id (VOTE_PARTITIONS parts, 16 by default). A poll's votes and index
+entries then live in one small partition, and the unique
+(user_id, poll_id) index still applies because it contains the partition
+key. It is a one-off migration that copies the table; run it during a quiet
+period. SQLite has no table partitioning, so there archiving alone keeps
+the table to open polls.
+
+Archived polls keep their counts, snapshot and likes. What is lost from the
+database is who voted for what, so /api/me/poll-state reports no vote on
+them.
+
+    cd backend && python -m app.lifecycle archive --backend fastapi
+    cd backend && python -m app.lifecycle archive --backend flask --closed-days 0 --vacuum
+    cd backend && python -m app.lifecycle partition --backend fastapi
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func, inspect, select, text
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("VOTE_ARCHIVE_DIR", "./archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("VOTE_ARCHIVE_AFTER_DAYS", "7"))
+PARTITIONS = int(os.getenv("VOTE_PARTITIONS", "16"))
+BATCH_ROWS = 10_000
+
+class ArchiveResult:
+    __slots__ = ("poll_id", "path", "rows", "bytes", "sha256")
+
+    def __init__(self, poll_id: int, path: str, rows: int, size: int, sha256: str):
+        self.poll_id = poll_id
+        self.path = path
+        self.rows = rows
+        self.bytes = size
+        self.sha256 = sha256
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def archivable_poll_ids(conn, polls, archives, closed_before: datetime, limit: Optional[int] = None) -> List[int]:
+    """Closed polls last changed before closed_before whose votes are not archived yet"""
+    stmt = select(polls.c.id).where(
+        polls.c.is_active == False,
+        func.coalesce(polls.c.updated_at, polls.c.created_at) < closed_before,
+        polls.c.id.not_in(select(archives.c.poll_id))
+    ).order_by(polls.c.id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return list(conn.execute(stmt).scalars())
+
+def _write_archive(conn, votes, poll_id: int, path: str):
+    """Stream a poll's votes to path as gzip NDJSON; returns (rows, bytes, sha256)"""
+    rows = 0
+    tmp_path = path + ".tmp"
+    result = conn.execution_options(yield_per=BATCH_ROWS).execute(
+        select(votes).where(votes.c.poll_id == poll_id).order_by(votes.c.id)
+    )
+    with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as out:
+        for row in result.mappings():
+            out.write(json.dumps(dict(row), default=_json_default).encode("utf-8") + b"\n")
+            rows += 1
+        out.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return rows, os.path.getsize(path), digest.hexdigest()
+
+def archive_poll_votes(engine, votes, archives, poll_id: int, directory: str = ARCHIVE_DIR) -> Optional[ArchiveResult]:
+    """Move one closed poll's votes to an archive file; None if they changed meanwhile"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"votes-poll-{poll_id}.ndjson.gz")
+    with engine.begin() as conn:
+        rows, size, sha256 = _write_archive(conn, votes, poll_id, path)
+        deleted = conn.execute(votes.delete().where(votes.c.poll_id == poll_id)).rowcount
+        if deleted != rows:
+            # Rolled back; the file is rewritten on the next run
+            raise RuntimeError(f"Poll {poll_id}: archived {rows} votes but {deleted} matched the delete")
+        conn.execute(archives.insert().values(
+            poll_id=poll_id, path=path, row_count=rows, bytes=size, sha256=sha256, archived_at=datetime.utcnow()
+        ))
+    logger.info(f"Archived {rows} votes of poll {poll_id} to {path} ({size} bytes)")
+    return ArchiveResult(poll_id, path, rows, size, sha256)
+
+def archive_closed_polls(engine, polls, votes, archives, closed_days: float = ARCHIVE_AFTER_DAYS,
+                         directory: str = ARCHIVE_DIR, limit: Optional[int] = None) -> List[ArchiveResult]:
+    closed_before = datetime.utcnow() - timedelta(days=closed_days)
+    with engine.connect() as conn:
+        poll_ids = archivable_poll_ids(conn, polls, archives, closed_before, limit)
+    results = []
+    for poll_id in poll_ids:
+        try:
+            results.append(archive_poll_votes(engine, votes, archives, poll_id, directory))
+        except Exception as e:
+            logger.warning(f"Skipped archiving poll {poll_id}: {e}")
+    return results
+
+def read_archive(path: str) -> Iterator[dict]:
+    """Vote rows of an archive file, e.g. for audits or re-import"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def vacuum(engine, table: str):
+    """Return the space freed by archiving (SQLite: whole file, PostgreSQL: the table)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("VACUUM"))
+        elif engine.dialect.name == "postgresql":
+            conn.execute(text(f'VACUUM ANALYZE "{table}"'))
+
+def partition_votes(engine, votes, partitions: int = PARTITIONS) -> bool:
+    """Convert votes into a table hash-partitioned by poll_id (PostgreSQL only)
+
+    Returns False when there is nothing to do: not PostgreSQL, or already
+    partitioned.
+    """
+    if engine.dialect.name != "postgresql":
+        logger.info("Vote partitioning needs PostgreSQL; archiving keeps the SQLite table small")
+        return False
+    table = votes.name
+    with engine.begin() as conn:
+        partitioned = conn.execute(text(
+            "SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(:table)"
+        ), {"table": table}).scalar()
+        if partitioned:
+            return False
+
+        legacy = f"{table}_unpartitioned"
+        conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+        # Constraints keep their names across the rename; move them aside so
+        # the new table's primary and foreign keys get the original names
+        primary_key = inspect(conn).get_pk_constraint(legacy)["name"] or f"{table}_pkey"
+        foreign_keys = inspect(conn).get_foreign_keys(legacy)
+        for name in [primary_key] + [fk["name"] for fk in foreign_keys]:
+            conn.execute(text(
+                f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{name}" TO "{name}_unpartitioned"'
+            ))
+        # The primary key and unique indexes must contain the partition key
+        conn.execute(text(
+            f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY HASH (poll_id)'
+        ))
+        for remainder in range(partitions):
+            conn.execute(text(
+                f'CREATE TABLE "{table}_p{remainder}" PARTITION OF "{table}" '
+                f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+            ))
+        conn.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY (id, poll_id)'))
+        for index in inspect(conn).get_indexes(legacy):
+            conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+            columns = ", ".join(f'"{column}"' for column in index["column_names"])
+            unique = "UNIQUE " if index.get("unique") else ""
+            conn.execute(text(f'CREATE {unique}INDEX "{index["name"]}" ON "{table}" ({columns})'))
+        for fk in foreign_keys:
+            columns = ", ".join(f'"{column}"' for column in fk["constrained_columns"])
+            referred = ", ".join(f'"{column}"' for column in fk["referred_columns"])
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{fk["name"]}" FOREIGN KEY ({columns}) '
+                f'REFERENCES "{fk["referred_table"]}" ({referred})'
+            ))
+        conn.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"'))
+        # Keep the id sequence, which belongs to the old table's column
+        conn.execute(text(
+            f"ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY \"{table}\".id"
+        ))
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+    logger.info(f"Partitioned {table} into {partitions} hash partitions by poll_id")
+    return True
+
+def _load_tables(backend: str):
+    """(engine, polls, votes, vote_archives) of either backend"""
+    if backend == "flask":
+        import app_flask
+        with app_flask.app.app_context():
+            engine = app_flask.db.engine
+        return engine, app_flask.Poll.__table__, app_flask.Vote.__table__, app_flask.VoteArchive.__table__
+
+    from app import models
+    from app.database import Base, engine
+    Base.metadata.create_all(bind=engine, tables=[models.VoteArchive.__table__])
+    return engine, models.Poll.__table__, models.Vote.__table__, models.VoteArchive.__table__
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["archive", "partition"])
+    parser.add_argument("--backend", choices=["fastapi", "flask"], default="fastapi")
+    parser.add_argument("--closed-days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="archive polls closed at least this many days ago")
+    parser.add_argument("--directory", default=ARCHIVE_DIR)
+    parser.add_argument("--limit", type=int, help="archive at most this many polls")
+    parser.add_argument("--vacuum", action="store_true", help="reclaim space after archiving")
+    parser.add_argument("--partitions", type=int, default=PARTITIONS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine, polls, votes, archives = _load_tables(args.backend)
+    if args.command == "partition":
+        print(json.dumps({"partitioned": partition_votes(engine, votes, args.partitions)}))
+        return
+
+    results = archive_closed_polls(engine, polls, votes, archives, args.closed_days, args.directory, args.limit)
+    if args.vacuum and results:
+        vacuum(engine, votes.name)
+    print(json.dumps({
+        "polls": len(results),
+        "votes": sum(result.rows for result in results),
+        "bytes": sum(result.bytes for result in results)
+    }))
+
+if __name__ == "__main__":
+    main()
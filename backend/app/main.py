@@ -1,11 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import logging
+import time
+from typing import Optional
 
-from app.database import engine
-from app.models import Base
-from app.routers import polls, websocket
+from app import admission, fanout, membership, metrics, replicas, sampling_profiler, sql_profiler
+from app.database import client_key, engine, replica_engine
+from app.models import Base, Like, Poll, Vote
+from app.migrations import ensure_column, ensure_unique_index
+from app.search import install_search_index
+from app.responses import FastJSONResponse
+from app.routers import me, polls, websocket
+from app.websocket_manager import manager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,13 +20,126 @@ logger = logging.getLogger(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_column(engine, Poll.__tablename__, "version", "INTEGER NOT NULL DEFAULT 1")
+ensure_column(engine, Poll.__tablename__, "poll_type", "VARCHAR(16) NOT NULL DEFAULT 'single'")
+install_search_index(engine, Poll.__tablename__)
+membership.voters.enabled = ensure_unique_index(engine, Vote.__tablename__, "uq_votes_user_poll", ["user_id", "poll_id"])
+membership.likers.enabled = ensure_unique_index(engine, Like.__tablename__, "uq_likes_user_poll", ["user_id", "poll_id"])
+metrics.instrument_engine(engine)
+if replica_engine is not None:
+    metrics.instrument_engine(replica_engine)
 
 app = FastAPI(
     title="Opinion Poll Platform",
     description="Real-time polling platform with live updates",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+def _route_template(request: Request) -> str:
+    """Path with parameter values replaced by their names, e.g. /api/polls/{poll_id}
+
+    Labelling by template rather than raw path keeps metric cardinality bounded.
+    """
+    if request.scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in request.path_params.items()}
+    return "/".join(
+        "{" + params[segment] + "}" if segment in params else segment
+        for segment in request.url.path.split("/")
+    )
+
+if admission.ENABLED:
+    rate_limiter = admission.TokenBucketLimiter()
+    auth_rate_limiter = admission.TokenBucketLimiter(admission.AUTH_RATE_LIMIT_PER_SECOND, admission.AUTH_RATE_LIMIT_BURST)
+    write_limiter = admission.AsyncConcurrencyLimiter()
+
+    @app.middleware("http")
+    async def admit_writes(request: Request, call_next):
+        """Rate limit and bound concurrent writes; shed excess load with 429/503"""
+        if not admission.is_write(request.method, request.url.path):
+            return await call_next(request)
+
+        limiter = auth_rate_limiter if admission.is_auth(request.url.path) else rate_limiter
+        retry_after = limiter.acquire(client_key(request))
+        if retry_after:
+            metrics.ADMISSION_REJECTIONS.inc(reason="rate_limited")
+            return FastJSONResponse(
+                {"detail": admission.RATE_LIMITED_MESSAGE}, status_code=429,
+                headers=admission.retry_after_header(retry_after)
+            )
+        if not await write_limiter.acquire():
+            metrics.ADMISSION_REJECTIONS.inc(reason="overloaded")
+            return FastJSONResponse(
+                {"detail": admission.OVERLOADED_MESSAGE}, status_code=503,
+                headers=admission.retry_after_header(write_limiter.max_wait)
+            )
+        try:
+            return await call_next(request)
+        finally:
+            write_limiter.release()
+
+if replicas.REPLICA_URL:
+    @app.middleware("http")
+    async def stick_writers_to_primary(request: Request, call_next):
+        """After a successful write the client reads from the primary for a while"""
+        response = await call_next(request)
+        if admission.is_write(request.method, request.url.path) and response.status_code < 400:
+            replicas.sticky.wrote(client_key(request))
+            response.set_cookie(**replicas.sticky_cookie())
+        return response
+
+@app.middleware("http")
+async def collect_request_metrics(request: Request, call_next):
+    stats = metrics.start_request()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.finish_request(
+            stats, request.method, _route_template(request),
+            status_code, time.perf_counter() - start
+        )
+
+if sql_profiler.ENABLED:
+    @app.middleware("http")
+    async def profile_request_sql(request: Request, call_next):
+        profile = sql_profiler.start_profile(request.method, request.url.path)
+        try:
+            response = await call_next(request)
+        finally:
+            sql_profiler.finish_profile(profile, _route_template(request))
+        response.headers.update(sql_profiler.response_headers(profile))
+        return response
+
+    @app.get("/debug/queries/{profile_id}", include_in_schema=False)
+    async def query_profile(profile_id: str):
+        """Query breakdown of one profiled request, slowest statement first"""
+        profile = sql_profiler.get_profile(profile_id)
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return profile
+
+if sampling_profiler.TOKEN:
+    @app.get("/debug/profile", include_in_schema=False)
+    async def sample_stacks(request: Request, seconds: Optional[str] = None, interval_ms: Optional[str] = None):
+        """Sample this worker's threads and tasks; collapsed stacks for a flamegraph"""
+        if not sampling_profiler.authorized(request.headers.get(sampling_profiler.TOKEN_HEADER)):
+            raise HTTPException(status_code=403, detail="Not authorized to profile")
+        try:
+            seconds, interval_ms = sampling_profiler.parse_window(seconds, interval_ms)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="seconds and interval_ms must be numbers")
+        profile = await sampling_profiler.profile_tasks(seconds, interval_ms)
+        if profile is None:
+            raise HTTPException(status_code=409, detail=sampling_profiler.BUSY_MESSAGE)
+        return Response(content=profile.collapsed(), media_type=sampling_profiler.MEDIA_TYPE,
+                        headers=profile.headers())
+
+# Added last so it is the outermost middleware and rejections still carry CORS headers
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -31,8 +151,18 @@ app.add_middleware(
 
 # Include routers
 app.include_router(polls.router, prefix="/api/polls", tags=["polls"])
+app.include_router(me.router, prefix="/api/me", tags=["me"])
 app.include_router(websocket.router, prefix="/api", tags=["websocket"])
 
+@app.on_event("startup")
+async def start_fanout():
+    """Relay real-time updates to the other workers of app.launcher, if any"""
+    fanout.bus.start(manager.deliver_relayed)
+
+@app.on_event("shutdown")
+async def stop_fanout():
+    fanout.bus.stop()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -43,6 +173,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,159 @@
+"""
+Per-poll sets of user ids that have voted or liked, kept in memory.
+
+Nearly every vote and like comes from a user who has not voted or liked
+that poll before, yet each one looked up votes/likes by (user_id, poll_id)
+first. IdBitmap is a compact exact set of integer ids (a simplified Roaring
+bitmap: ids are bucketed by their high bits into sorted 16-bit arrays,
+converted to 8 KiB bitmaps once a bucket fills up), so a poll with 10M
+voters costs a few MiB and lookups have no false positives.
+
+A miss lets the write skip its lookup query. It is only trusted because
+votes and likes carry a unique (user_id, poll_id) index: rows written by
+another worker after this process loaded the poll make the insert fail,
+and the caller retries with the lookup. Without the index (ensure_unique_index
+failed on duplicate legacy rows) the index stays disabled. The FastAPI
+routes load a poll's set in a worker thread, so the first write to a poll
+with many voters does not stall the event loop.
+"""
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+MAX_POLLS = int(os.getenv("MEMBERSHIP_MAX_POLLS", "10000"))
+
+_CHUNK_BITS = 16
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+# An array of 4096 uint16 is 8 KiB, the size of a full 65536-bit bitmap
+_ARRAY_LIMIT = 4096
+
+class IdBitmap:
+    """Exact set of non-negative integers, compressed by dense 65536-id chunks"""
+    __slots__ = ("_chunks", "_size")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._chunks = {}
+        self._size = 0
+        for value in ids:
+            self.add(value)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        chunk = self._chunks.get(value >> _CHUNK_BITS)
+        if chunk is None:
+            return False
+        low = value & _CHUNK_MASK
+        if isinstance(chunk, bytearray):
+            return bool(chunk[low >> 3] & (1 << (low & 7)))
+        index = bisect_left(chunk, low)
+        return index < len(chunk) and chunk[index] == low
+
+    def add(self, value: int):
+        key, low = value >> _CHUNK_BITS, value & _CHUNK_MASK
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            self._chunks[key] = array("H", (low,))
+            self._size += 1
+            return
+        if isinstance(chunk, bytearray):
+            bit = 1 << (low & 7)
+            if not chunk[low >> 3] & bit:
+                chunk[low >> 3] |= bit
+                self._size += 1
+            return
+        index = bisect_left(chunk, low)
+        if index < len(chunk) and chunk[index] == low:
+            return
+        chunk.insert(index, low)
+        self._size += 1
+        if len(chunk) > _ARRAY_LIMIT:
+            bitmap = bytearray(1 << (_CHUNK_BITS - 3))
+            for member in chunk:
+                bitmap[member >> 3] |= 1 << (member & 7)
+            self._chunks[key] = bitmap
+
+    def discard(self, value: int):
+        key, low = value >> _CHUNK_BITS, value & _CHUNK_MASK
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            return
+        if isinstance(chunk, bytearray):
+            bit = 1 << (low & 7)
+            if chunk[low >> 3] & bit:
+                chunk[low >> 3] &= ~bit & 0xFF
+                self._size -= 1
+            return
+        index = bisect_left(chunk, low)
+        if index < len(chunk) and chunk[index] == low:
+            del chunk[index]
+            self._size -= 1
+            if not chunk:
+                del self._chunks[key]
+
+    def memory_bytes(self) -> int:
+        """Payload bytes of the containers (excludes the per-object overhead)"""
+        return sum(
+            len(chunk) if isinstance(chunk, bytearray) else chunk.itemsize * len(chunk)
+            for chunk in self._chunks.values()
+        )
+
+class MembershipIndex:
+    """poll_id -> IdBitmap of members, loaded on first use, least recently used evicted"""
+
+    def __init__(self, name: str, max_polls: int = MAX_POLLS):
+        self.name = name
+        self.max_polls = max_polls
+        self.enabled = False
+        self._polls: "OrderedDict[int, IdBitmap]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def definitely_absent(self, poll_id: int, user_id: int, loader: Callable[[], Iterable[int]]) -> bool:
+        """True when user_id has no row for poll_id as far as this process knows
+
+        loader returns every member user id of the poll; it runs on first use.
+        """
+        if not self.enabled:
+            return False
+        members = self.get(poll_id)
+        if members is None:
+            members = self.load(poll_id, loader)
+        return user_id not in members
+
+    def load(self, poll_id: int, loader: Callable[[], Iterable[int]]) -> IdBitmap:
+        """Build and keep the poll's member set; async callers run it in a thread"""
+        members = IdBitmap(loader())
+        with self._lock:
+            self._polls[poll_id] = members
+            while len(self._polls) > self.max_polls:
+                self._polls.popitem(last=False)
+        return members
+
+    def add(self, poll_id: int, user_id: int):
+        members = self.get(poll_id)
+        if members is not None:
+            members.add(user_id)
+
+    def discard(self, poll_id: int, user_id: int):
+        members = self.get(poll_id)
+        if members is not None:
+            members.discard(user_id)
+
+    def forget(self, poll_id: int):
+        with self._lock:
+            self._polls.pop(poll_id, None)
+
+    def get(self, poll_id: int) -> Optional[IdBitmap]:
+        """The poll's member set, or None when it is not loaded"""
+        with self._lock:
+            members = self._polls.get(poll_id)
+            if members is not None:
+                self._polls.move_to_end(poll_id)
+            return members
+
+voters = MembershipIndex("votes")
+likers = MembershipIndex("likes")
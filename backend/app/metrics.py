@@ -0,0 +1,267 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Kept dependency-free and cheap enough to leave on in production: every
+observation is a dict lookup plus a few integer/float updates under a lock,
+and SQL timing adds two perf_counter() calls per statement.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+FANOUT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 50000, 100000)
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def header(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        yield from self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        yield from self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        yield from self.header()
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+REQUEST_QUERIES = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request",
+    ["method", "route"]
+)
+DB_STATEMENTS = registry.counter("db_statements_total", "SQL statements executed")
+DB_STATEMENT_SECONDS = registry.counter("db_statement_seconds_total", "Time spent executing SQL statements")
+REALTIME_CONNECTIONS = registry.gauge(
+    "realtime_connections", "Open real-time client connections", ["transport"]
+)
+BROADCAST_FANOUT = registry.histogram(
+    "realtime_broadcast_fanout", "Clients targeted per broadcast",
+    ["transport"], buckets=FANOUT_BUCKETS
+)
+BROADCAST_SECONDS = registry.histogram(
+    "realtime_broadcast_seconds", "Time to send one broadcast to every client", ["transport"]
+)
+REALTIME_REAPED = registry.counter(
+    "realtime_reaped_connections_total", "Real-time connections dropped without a clean disconnect",
+    ["transport", "reason"]
+)
+BCRYPT_IN_FLIGHT = registry.gauge(
+    "bcrypt_in_flight", "bcrypt hash/verify calls running or waiting for CPU"
+)
+BCRYPT_SECONDS = registry.histogram(
+    "bcrypt_duration_seconds", "bcrypt call latency", ["operation"]
+)
+WRITES_IN_FLIGHT = registry.gauge(
+    "admission_writes_in_flight", "Write requests currently admitted"
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "admission_queue_wait_seconds", "Time write requests waited for a concurrency slot"
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total", "Write requests rejected by admission control", ["reason"]
+)
+
+class RequestStats:
+    """SQL activity attributed to the request currently being handled"""
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+def start_request() -> RequestStats:
+    stats = RequestStats()
+    _current_request.set(stats)
+    return stats
+
+def finish_request(stats: RequestStats, method: str, route: str, status: int, seconds: float):
+    REQUEST_SECONDS.observe(seconds, method=method, route=route, status=status)
+    REQUEST_QUERIES.observe(stats.queries, method=method, route=route)
+    REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
+    _current_request.set(None)
+
+def current_request() -> Optional[RequestStats]:
+    return _current_request.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_STATEMENTS.inc()
+    DB_STATEMENT_SECONDS.inc(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+def instrument_engine(engine):
+    """Count and time every statement on engine, globally and per request"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+@contextmanager
+def track_bcrypt(operation: str):
+    """Wrap a bcrypt call; in-flight calls approximate the bcrypt queue depth"""
+    BCRYPT_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        BCRYPT_IN_FLIGHT.dec()
+        BCRYPT_SECONDS.observe(time.perf_counter() - start, operation=operation)
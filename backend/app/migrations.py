@@ -0,0 +1,60 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+def ensure_column(engine, table: str, column: str, ddl: str):
+    """Add a column to an existing table if create_all() predates it
+
+    create_all() only creates missing tables, so columns introduced after a
+    database was first deployed are added here. ddl is the column type and
+    constraints, e.g. "INTEGER NOT NULL DEFAULT 1".
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return
+    if column in {c["name"] for c in inspector.get_columns(table)}:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+    logger.info(f"Added column {table}.{column}")
+
+def ensure_unique_index(engine, table: str, name: str, columns) -> bool:
+    """Create a unique index if missing; returns False if existing rows violate it"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return False
+    wanted = list(columns)
+    for index in inspector.get_indexes(table):
+        if index.get("unique") and index["column_names"] == wanted:
+            return True
+    for constraint in inspector.get_unique_constraints(table):
+        if constraint["column_names"] == wanted:
+            return True
+
+    column_list = ", ".join(f'"{column}"' for column in wanted)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE UNIQUE INDEX "{name}" ON "{table}" ({column_list})'))
+    except Exception as e:
+        logger.warning(f"Could not create unique index {name} on {table}: {e}")
+        return False
+    logger.info(f"Created unique index {name} on {table}")
+    return True
+
+def ensure_index(engine, table: str, name: str, columns):
+    """Create a (non-unique) index if no index starts with the same columns"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return
+    wanted = list(columns)
+    for index in inspector.get_indexes(table):
+        if index["column_names"][:len(wanted)] == wanted:
+            return
+
+    column_list = ", ".join(f'"{column}"' for column in wanted)
+    with engine.begin() as conn:
+        conn.execute(text(f'CREATE INDEX "{name}" ON "{table}" ({column_list})'))
+    logger.info(f"Created index {name} on {table}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -29,12 +29,17 @@ class Poll(Base):
     is_active = Column(Boolean, default=True)
     total_votes = Column(Integer, default=0)
     total_likes = Column(Integer, default=0)
+    # Bumped on every vote, like and edit; drives ETags and cache freshness
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # single, multiple or ranked (see app.tally)
+    poll_type = Column(String(16), nullable=False, default="single", server_default="single")
 
     # Relationships
     creator = relationship("User", back_populates="polls")
     options = relationship("PollOption", back_populates="poll", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="poll", cascade="all, delete-orphan")
     likes = relationship("Like", back_populates="poll", cascade="all, delete-orphan")
+    snapshot = relationship("PollSnapshot", uselist=False, cascade="all, delete-orphan")
 
 class PollOption(Base):
     __tablename__ = "poll_options"
@@ -62,6 +67,13 @@ class Vote(Base):
     poll = relationship("Poll", back_populates="votes")
     option = relationship("PollOption", back_populates="votes")
 
+    # One vote per user per poll; app.membership relies on it. The second
+    # index serves the grouped counts of app.reconcile
+    __table_args__ = (
+        Index("uq_votes_user_poll", "user_id", "poll_id", unique=True),
+        Index("ix_votes_poll_option", "poll_id", "option_id"),
+    )
+
 class Like(Base):
     __tablename__ = "likes"
 
@@ -73,3 +85,51 @@ class Like(Base):
     # Relationships
     user = relationship("User", back_populates="likes")
     poll = relationship("Poll", back_populates="likes")
+
+    __table_args__ = (
+        Index("uq_likes_user_poll", "user_id", "poll_id", unique=True),
+        Index("ix_likes_poll", "poll_id"),
+    )
+
+class Ballot(Base):
+    """A voter's choices on a multiple- or ranked-choice poll (see app.tally)"""
+    __tablename__ = "ballots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    # Option ids in preference order, packed as int32
+    choices = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (Index("uq_ballots_user_poll", "user_id", "poll_id", unique=True),)
+
+class PollSnapshot(Base):
+    __tablename__ = "poll_snapshots"
+
+    poll_id = Column(Integer, ForeignKey("polls.id"), primary_key=True)
+    payload = Column(Text, nullable=False)
+    etag = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class VoteCountShard(Base):
+    """One of several counter rows per option for hot polls (see app.counter_shards)"""
+    __tablename__ = "vote_count_shards"
+
+    option_id = Column(Integer, ForeignKey("poll_options.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    count = Column(Integer, nullable=False, default=0)
+    writes = Column(Integer, nullable=False, default=0)
+
+class VoteArchive(Base):
+    """Votes of a closed poll moved to an archive file (see app.lifecycle)"""
+    __tablename__ = "vote_archives"
+
+    poll_id = Column(Integer, ForeignKey("polls.id"), primary_key=True)
+    path = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    bytes = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
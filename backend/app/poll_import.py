@@ -0,0 +1,202 @@
+"""
+Poll creation in one transaction, and bulk import from NDJSON.
+
+Creating a poll committed the poll row, added its options one by one and
+committed again (the FastAPI backend also committed a new anonymous user
+first). insert_polls writes any number of polls with one multi-row
+INSERT ... RETURNING for the polls and one for all of their options, so a
+single poll is one transaction of two statements and
+POST /api/polls:import writes IMPORT_CHUNK_POLLS polls per transaction.
+
+Import bodies are NDJSON, one poll per line:
+
+    {"title": "Lunch?", "description": "optional", "options": ["Pizza", "Salad"]}
+
+Options may also be {"option_text": ...} objects, as in POST /api/polls, and
+"poll_type" may be given as well (single by default, see app.tally).
+Lines that fail validation are reported and skipped; chunks already written
+stay written.
+"""
+import json
+import os
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+
+from app.tally import POLL_TYPES, SINGLE
+
+IMPORT_CHUNK_POLLS = int(os.getenv("POLL_IMPORT_CHUNK", "500"))
+IMPORT_MAX_POLLS = int(os.getenv("POLL_IMPORT_MAX", "50000"))
+MAX_LINE_BYTES = 64 * 1024
+MAX_OPTIONS = 100
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+class PollDraft:
+    __slots__ = ("title", "description", "options", "poll_type")
+
+    def __init__(self, title: str, description: Optional[str], options: List[str], poll_type: str = SINGLE):
+        self.title = title
+        self.description = description
+        self.options = options
+        self.poll_type = poll_type
+
+def check_poll_type(poll_type) -> str:
+    if poll_type not in POLL_TYPES:
+        raise ValueError(f"poll_type must be one of {', '.join(POLL_TYPES)}")
+    return poll_type
+
+def _option_text(option) -> str:
+    if isinstance(option, dict):
+        option = option.get("option_text")
+    if not isinstance(option, str) or not option.strip():
+        raise ValueError("options must be non-empty strings or {\"option_text\": ...} objects")
+    return option
+
+def parse_poll(data) -> PollDraft:
+    """Validate one decoded import line; raises ValueError with a client-facing message"""
+    if not isinstance(data, dict):
+        raise ValueError("Each line must be a JSON object")
+    title = data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title is required")
+    description = data.get("description")
+    if description is not None and not isinstance(description, str):
+        raise ValueError("description must be a string")
+    options = data.get("options")
+    if not isinstance(options, list) or not options:
+        raise ValueError("options must be a non-empty list")
+    if len(options) > MAX_OPTIONS:
+        raise ValueError(f"At most {MAX_OPTIONS} options per poll")
+    return PollDraft(title, description, [_option_text(option) for option in options],
+                     check_poll_type(data.get("poll_type", SINGLE)))
+
+def insert_polls(session, polls, options, creator_id: int, drafts: List[PollDraft]) -> List[dict]:
+    """Insert polls and all their options in two statements, without committing
+
+    Returns one dict per draft, in order: id, created_at, version and
+    options as (id, option_text) pairs.
+    """
+    if not drafts:
+        return []
+    poll_rows = session.execute(
+        insert(polls).returning(polls.c.id, polls.c.created_at, polls.c.version, sort_by_parameter_order=True),
+        [{
+            "title": draft.title,
+            "description": draft.description,
+            "creator_id": creator_id,
+            "is_active": True,
+            "poll_type": draft.poll_type,
+            "total_votes": 0,
+            "total_likes": 0
+        } for draft in drafts]
+    ).all()
+
+    option_params = [
+        {"poll_id": poll_id, "option_text": text, "vote_count": 0}
+        for (poll_id, _, _), draft in zip(poll_rows, drafts)
+        for text in draft.options
+    ]
+    option_ids = session.execute(
+        insert(options).returning(options.c.id, sort_by_parameter_order=True), option_params
+    ).scalars().all()
+
+    created = []
+    position = 0
+    for (poll_id, created_at, version), draft in zip(poll_rows, drafts):
+        count = len(draft.options)
+        created.append({
+            "id": poll_id,
+            "created_at": created_at,
+            "version": version,
+            "options": list(zip(option_ids[position:position + count], draft.options))
+        })
+        position += count
+    return created
+
+class PollImport:
+    """Parses an NDJSON body fed in arbitrary chunks and writes polls in batches
+
+    write_chunk(drafts) stores and commits one batch and returns the new
+    poll ids.
+    """
+
+    def __init__(self, write_chunk: Callable[[List[PollDraft]], List[int]],
+                 chunk_polls: int = IMPORT_CHUNK_POLLS, max_polls: int = IMPORT_MAX_POLLS):
+        self.write_chunk = write_chunk
+        self.chunk_polls = chunk_polls
+        self.max_polls = max_polls
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.first_poll_id = None
+        self.last_poll_id = None
+        self.truncated = False
+        self._line = 0
+        self._accepted = 0
+        self._buffer = b""
+        self._pending: List[PollDraft] = []
+
+    def feed(self, data: bytes):
+        if self.truncated:
+            return
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        if len(self._buffer) > MAX_LINE_BYTES:
+            self._line += 1
+            self._error(f"Line longer than {MAX_LINE_BYTES} bytes")
+            self.truncated = True
+            return
+        for line in lines:
+            self._parse(line)
+            if self.truncated:
+                return
+
+    def finish(self) -> dict:
+        if not self.truncated and self._buffer:
+            self._parse(self._buffer)
+        self._buffer = b""
+        self._flush()
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "first_poll_id": self.first_poll_id,
+            "last_poll_id": self.last_poll_id,
+            "truncated": self.truncated,
+            "errors": self.errors
+        }
+
+    def _parse(self, line: bytes):
+        self._line += 1
+        if not line.strip():
+            return
+        if self._accepted >= self.max_polls:
+            self._error(f"Import limit of {self.max_polls} polls reached")
+            self.truncated = True
+            return
+        try:
+            draft = parse_poll(json.loads(line))
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            self._error(str(e))
+            return
+        self._accepted += 1
+        self._pending.append(draft)
+        if len(self._pending) >= self.chunk_polls:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        drafts, self._pending = self._pending, []
+        poll_ids = self.write_chunk(drafts)
+        if poll_ids:
+            self.first_poll_id = self.first_poll_id or poll_ids[0]
+            self.last_poll_id = poll_ids[-1]
+        self.imported += len(poll_ids)
+
+    def _error(self, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": self._line, "error": message})
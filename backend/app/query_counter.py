@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+
+class QueryCounter:
+    """SQL statements executed on an engine while a count_queries() block is open"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def report(self) -> str:
+        return "\n".join(f"{i + 1}. {statement}" for i, statement in enumerate(self.statements))
+
+@contextmanager
+def count_queries(engine):
+    """Record every statement sent to the database through engine"""
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def assert_max_queries(engine, limit: int, label: str = "block"):
+    """Fail with the offending statements if the block runs more than limit queries
+
+    Guards endpoints against N+1 regressions, e.g.
+
+        with assert_max_queries(engine, 3, "GET /api/polls/1"):
+            client.get("/api/polls/1")
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f"{label} ran {counter.count} queries, budget is {limit}:\n{counter.report()}"
+        )
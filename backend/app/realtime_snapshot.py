@@ -0,0 +1,49 @@
+"""
+Initial state of the polls a real-time client follows, in one message.
+
+After (re)connecting, clients fetched GET /api/polls/{id} for every poll on
+screen, so a reconnect storm became a burst of detail requests. Instead a
+client names its polls when it connects or subscribes and gets one
+poll_snapshot message back:
+
+- /api/ws?poll_ids=1,2,3 or {"type": "subscribe", "poll_ids": [...]};
+- Socket.IO: io(url, {auth: {poll_ids: [...]}}) (or ?poll_ids=) or the
+  "subscribe" event with {"poll_ids": [...]}. This only asks for the
+  snapshot: Socket.IO clients still receive every poll's updates.
+
+    {"polls": [<GET /api/polls/{id} body>, ...], "missing": [<unknown ids>]}
+
+Closed polls come from their frozen snapshots and live polls from the hot
+state store while it is current; the rest are read in one query (polls
+joined with creators and options, plus their unfolded shard writes). Only
+polls that have shard writes read their shard totals, usually from the
+shard totals cache. The client is subscribed before the snapshot is read,
+so no update is lost in between. At most REALTIME_SNAPSHOT_MAX_POLLS polls
+are sent per message; a client fetches any others itself.
+"""
+import os
+from typing import Dict, Iterable, List
+
+EVENT = "poll_snapshot"
+MAX_POLLS = int(os.getenv("REALTIME_SNAPSHOT_MAX_POLLS", "100"))
+
+def parse_poll_ids(value) -> List[int]:
+    """Poll ids from a list or a comma separated string, without duplicates or non-numbers"""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return []
+    poll_ids = {}
+    for poll_id in value:
+        poll_id = str(poll_id).strip()
+        if poll_id.isdigit():
+            poll_ids.setdefault(int(poll_id), None)
+    return list(poll_ids)
+
+def snapshot_data(poll_ids: Iterable[int], details: Dict[int, dict]) -> dict:
+    """Message body: details in the order asked for, and the ids that do not exist"""
+    poll_ids = list(poll_ids)
+    return {
+        "polls": [details[poll_id] for poll_id in poll_ids if poll_id in details],
+        "missing": [poll_id for poll_id in poll_ids if poll_id not in details]
+    }
@@ -0,0 +1,270 @@
+"""
+Counter reconciliation: find and repair drift in the vote and like counters.
+
+polls.total_votes, polls.total_likes and poll_options.vote_count are kept by
+the write paths next to the vote, like and ballot rows (with counter shards
+and the hot state store in between, see app.counter_shards and
+app.hot_state). A bug, a manual edit or a crash between two steps can still
+leave them off, and nothing used to bring them back, so the feed recounted
+likes on every request instead of reading total_likes.
+
+This job walks the open polls in id order, RECONCILE_CHUNK_POLLS at a time,
+and recounts each chunk with a few grouped queries: votes per option,
+ballots per poll (approvals or first preferences per option via app.tally)
+and likes per poll. Each count is compared with the counter plus its
+counter shards. A poll that drifted is repaired with deltas, so writes
+committed in the meantime are kept, and only if its version (plus shard
+writes) is still the one read while counting; otherwise a write moved it
+and it is left to the next pass. Repairs bump the version so ETags and
+caches move on.
+
+With HOT_STATE=1 workers hold counter changes that are not checkpointed
+yet, which would look like drift. Repairs then wait RECONCILE_SETTLE_SECONDS
+(longer than a checkpoint interval) after counting: a checkpoint in that
+time bumps the version and cancels the repair, and a poll whose version did
+not move had nothing pending.
+
+Closed polls are skipped: their results are frozen in their snapshot and
+their votes may be archived (app.lifecycle).
+
+The last poll id done is checkpointed to RECONCILE_CHECKPOINT after every
+chunk, so a restarted job resumes where it stopped, and the walk is paced
+to RECONCILE_POLLS_PER_SECOND so it does not crowd out live traffic.
+
+    cd backend && python -m app.reconcile --backend fastapi
+    cd backend && python -m app.reconcile --backend flask --loop --interval 3600
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+
+from app import hot_state, tally
+from app.migrations import ensure_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_POLLS = int(os.getenv("RECONCILE_CHUNK_POLLS", "200"))
+POLLS_PER_SECOND = float(os.getenv("RECONCILE_POLLS_PER_SECOND", "500"))
+SETTLE_SECONDS = float(os.getenv("RECONCILE_SETTLE_SECONDS", str(max(2.0, 2 * hot_state.CHECKPOINT_SECONDS))))
+CHECKPOINT_PATH = os.getenv("RECONCILE_CHECKPOINT", "./reconcile-checkpoint.json")
+
+class Tables:
+    __slots__ = ("polls", "options", "votes", "likes", "ballots", "shards")
+
+    def __init__(self, polls, options, votes, likes, ballots, shards):
+        self.polls = polls
+        self.options = options
+        self.votes = votes
+        self.likes = likes
+        self.ballots = ballots
+        self.shards = shards
+
+class Drift:
+    """Counter corrections for one poll, and the version they were counted at"""
+    __slots__ = ("poll_id", "version", "votes", "likes", "options")
+
+    def __init__(self, poll_id: int, version: int, votes: int, likes: int, options: Dict[int, int]):
+        self.poll_id = poll_id
+        self.version = version
+        self.votes = votes
+        self.likes = likes
+        self.options = options
+
+    def __bool__(self):
+        return bool(self.votes or self.likes or self.options)
+
+    def as_dict(self) -> dict:
+        return {"poll_id": self.poll_id, "votes": self.votes, "likes": self.likes,
+                "options": {str(option_id): delta for option_id, delta in self.options.items()}}
+
+def load_checkpoint(path: str) -> int:
+    """Last poll id done by an unfinished pass, or 0"""
+    try:
+        with open(path) as f:
+            return int(json.load(f).get("last_poll_id", 0))
+    except (OSError, ValueError):
+        return 0
+
+def save_checkpoint(path: str, last_poll_id: int):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_poll_id": last_poll_id, "updated_at": datetime.utcnow().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def chunk_poll_ids(conn, polls, after: int, limit: int) -> List[int]:
+    return list(conn.execute(
+        select(polls.c.id).where(polls.c.is_active == True, polls.c.id > after).order_by(polls.c.id).limit(limit)
+    ).scalars())
+
+def _shard_writes(tables: Tables):
+    shards = tables.shards
+    return func.coalesce(
+        select(func.sum(shards.c.writes)).where(shards.c.poll_id == tables.polls.c.id).scalar_subquery(), 0
+    )
+
+def measure(conn, tables: Tables, poll_ids: List[int]) -> List[Drift]:
+    """Recount a chunk of polls; returns the polls whose counters are off"""
+    p, o, s = tables.polls.c, tables.options.c, tables.shards.c
+    # Read first: any write committed after this moves the version and cancels the repair
+    polls = conn.execute(select(
+        p.id, p.poll_type, p.total_votes, p.total_likes, p.version + _shard_writes(tables)
+    ).where(p.id.in_(poll_ids))).all()
+    options = conn.execute(select(o.id, o.poll_id, o.vote_count).where(o.poll_id.in_(poll_ids))).all()
+    shard_counts = dict(conn.execute(
+        select(s.option_id, func.sum(s.count)).where(s.poll_id.in_(poll_ids)).group_by(s.option_id)
+    ).all())
+
+    counted: Dict[int, int] = {}
+    single_ids = [poll_id for poll_id, poll_type, *_ in polls if poll_type not in tally.BALLOT_TYPES]
+    if single_ids:
+        v = tables.votes.c
+        counted.update(conn.execute(
+            select(v.option_id, func.count()).where(v.poll_id.in_(single_ids)).group_by(v.option_id)
+        ).all())
+    ballot_polls = {poll_id: poll_type for poll_id, poll_type, *_ in polls if poll_type in tally.BALLOT_TYPES}
+    ballots: Dict[int, list] = {poll_id: [] for poll_id in ballot_polls}
+    if ballot_polls:
+        b = tables.ballots.c
+        for poll_id, choices in conn.execute(select(b.poll_id, b.choices).where(b.poll_id.in_(list(ballot_polls)))):
+            ballots[poll_id].append(choices)
+    likes = dict(conn.execute(
+        select(tables.likes.c.poll_id, func.count()).where(tables.likes.c.poll_id.in_(poll_ids))
+        .group_by(tables.likes.c.poll_id)
+    ).all())
+
+    option_ids: Dict[int, List[int]] = {}
+    counters: Dict[int, int] = {}
+    for option_id, poll_id, vote_count in options:
+        option_ids.setdefault(poll_id, []).append(option_id)
+        counters[option_id] = (vote_count or 0) + shard_counts.get(option_id, 0)
+    for poll_id, poll_type in ballot_polls.items():
+        ids = sorted(option_ids.get(poll_id, []))
+        counted.update(zip(ids, tally.option_counters(poll_type, ballots[poll_id], ids)))
+
+    drifts = []
+    for poll_id, poll_type, total_votes, total_likes, version in polls:
+        ids = option_ids.get(poll_id, [])
+        if poll_id in ballot_polls:
+            votes = len(ballots[poll_id])
+        else:
+            votes = sum(counted.get(option_id, 0) for option_id in ids)
+        shard_votes = sum(shard_counts.get(option_id, 0) for option_id in ids)
+        drift = Drift(
+            poll_id, version,
+            votes - (total_votes or 0) - shard_votes,
+            likes.get(poll_id, 0) - (total_likes or 0),
+            {option_id: counted.get(option_id, 0) - counters[option_id]
+             for option_id in ids if counted.get(option_id, 0) != counters[option_id]}
+        )
+        if drift:
+            drifts.append(drift)
+    return drifts
+
+def repair(engine, tables: Tables, drift: Drift) -> bool:
+    """Apply one poll's corrections; False if the poll was written or closed since it was counted"""
+    p, o = tables.polls.c, tables.options.c
+    try:
+        with engine.connect() as conn, conn.begin() as transaction:
+            # Options first, in id order, the same lock order as the vote paths
+            for option_id in sorted(drift.options):
+                conn.execute(tables.options.update().where(o.id == option_id)
+                             .values(vote_count=func.coalesce(o.vote_count, 0) + drift.options[option_id]))
+            updated = conn.execute(tables.polls.update().where(
+                p.id == drift.poll_id, p.is_active == True, p.version + _shard_writes(tables) == drift.version
+            ).values(
+                total_votes=func.coalesce(p.total_votes, 0) + drift.votes,
+                total_likes=func.coalesce(p.total_likes, 0) + drift.likes,
+                version=p.version + 1
+            )).rowcount
+            if updated != 1:
+                transaction.rollback()
+                return False
+    except DBAPIError as e:
+        # e.g. a deadlock with a concurrent vote; the next pass retries
+        logger.warning(f"Could not repair poll {drift.poll_id}: {e}")
+        return False
+    logger.warning(f"Repaired counters of poll {drift.poll_id}: {json.dumps(drift.as_dict())}")
+    return True
+
+def reconcile(engine, tables: Tables, chunk: int = CHUNK_POLLS, polls_per_second: float = POLLS_PER_SECOND,
+              settle: Optional[float] = None, checkpoint: str = CHECKPOINT_PATH, dry_run: bool = False) -> dict:
+    """One pass over the open polls, resumed from the checkpoint; returns a summary"""
+    if settle is None:
+        settle = SETTLE_SECONDS if hot_state.ENABLED else 0
+    after = resumed_from = load_checkpoint(checkpoint)
+    summary = {"resumed_from": resumed_from, "polls": 0, "drifted": 0, "repaired": 0, "skipped": 0, "drift": []}
+    started = time.monotonic()
+    while True:
+        with engine.connect() as conn:
+            poll_ids = chunk_poll_ids(conn, tables.polls, after, chunk)
+            drifts = measure(conn, tables, poll_ids) if poll_ids else []
+        if not poll_ids:
+            break
+        summary["polls"] += len(poll_ids)
+        summary["drifted"] += len(drifts)
+        summary["drift"].extend(drift.as_dict() for drift in drifts[:100 - len(summary["drift"])])
+        if drifts and not dry_run:
+            if settle:
+                time.sleep(settle)
+            for drift in drifts:
+                summary["repaired" if repair(engine, tables, drift) else "skipped"] += 1
+        after = poll_ids[-1]
+        save_checkpoint(checkpoint, after)
+        # Pace the walk: at most polls_per_second on average since the pass began
+        delay = summary["polls"] / polls_per_second - (time.monotonic() - started) if polls_per_second else 0
+        if delay > 0:
+            time.sleep(delay)
+    save_checkpoint(checkpoint, 0)
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    return summary
+
+def _load_tables(backend: str):
+    """(engine, Tables) of either backend"""
+    if backend == "flask":
+        import app_flask
+        with app_flask.app.app_context():
+            engine = app_flask.db.engine
+        tables = Tables(app_flask.Poll.__table__, app_flask.PollOption.__table__, app_flask.Vote.__table__,
+                        app_flask.Like.__table__, app_flask.Ballot.__table__, app_flask.VoteCountShard.__table__)
+    else:
+        from app import models
+        from app.database import Base, engine
+        Base.metadata.create_all(bind=engine, tables=[models.Ballot.__table__, models.VoteCountShard.__table__])
+        tables = Tables(models.Poll.__table__, models.PollOption.__table__, models.Vote.__table__,
+                        models.Like.__table__, models.Ballot.__table__, models.VoteCountShard.__table__)
+    # Databases created before these indexes existed get them here
+    ensure_index(engine, tables.votes.name, f"ix_{tables.votes.name}_poll_option", ["poll_id", "option_id"])
+    ensure_index(engine, tables.likes.name, f"ix_{tables.likes.name}_poll", ["poll_id"])
+    return engine, tables
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fastapi", "flask"], default="fastapi")
+    parser.add_argument("--chunk", type=int, default=CHUNK_POLLS, help="polls recounted per round of queries")
+    parser.add_argument("--rate", type=float, default=POLLS_PER_SECOND, help="polls per second, 0 for no limit")
+    parser.add_argument("--settle", type=float, help="seconds to wait before repairing (default: "
+                                                     "RECONCILE_SETTLE_SECONDS with HOT_STATE=1, else 0)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    parser.add_argument("--loop", action="store_true", help="keep running passes")
+    parser.add_argument("--interval", type=float, default=3600, help="seconds between passes with --loop")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine, tables = _load_tables(args.backend)
+    while True:
+        summary = reconcile(engine, tables, args.chunk, args.rate, args.settle, args.checkpoint, args.dry_run)
+        print(json.dumps(summary), flush=True)
+        if not args.loop:
+            return
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
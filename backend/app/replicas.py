@@ -0,0 +1,90 @@
+"""
+Read-replica routing.
+
+With DATABASE_REPLICA_URL set, the read-only endpoints (feed, search, poll
+detail, /api/me/poll-state) query the replica and everything else stays on
+the primary. Two rules hide replica lag from clients:
+
+* Read your writes: a client that wrote in the last REPLICA_STICKY_SECONDS
+  reads from the primary. The write is remembered in this process and in a
+  short-lived cookie, so a read landing on another worker is routed to the
+  primary too (clients that drop cookies rely on the in-process record).
+* Never go back in time: poll and feed ETags carry the version counter. A
+  replica whose version is older than the one in the client's If-None-Match,
+  or that does not have a live copy of the poll yet, is skipped in favour of
+  the primary.
+
+Versions read from the replica are cached apart from the primary's, so an
+ETag always describes the body it is sent with.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from app.versioning import VersionRegistry, versions
+
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "read_primary"
+MAX_TRACKED_CLIENTS = 100_000
+
+_ETAG_VERSION = re.compile(r'-v(\d+)"')
+
+replica_versions = VersionRegistry()
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+def etag_version(if_none_match: Optional[str]) -> Optional[int]:
+    """Highest version counter among the poll/feed ETags in an If-None-Match header"""
+    found = [int(version) for version in _ETAG_VERSION.findall(if_none_match or "")]
+    return max(found) if found else None
+
+def is_behind(version: Optional[int], if_none_match: Optional[str]) -> bool:
+    """True when the replica has no live copy, or an older one than the client has seen"""
+    if version is None:
+        return True
+    seen = etag_version(if_none_match)
+    return seen is not None and version < seen
+
+def is_replica(session) -> bool:
+    return bool(session.info.get("replica"))
+
+def version_registry(session) -> VersionRegistry:
+    return replica_versions if is_replica(session) else versions
+
+class StickyClients:
+    """Clients that wrote recently, and so must read from the primary"""
+
+    def __init__(self, ttl: float = STICKY_SECONDS):
+        self.ttl = ttl
+        self._clients: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wrote(self, client_key: str):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._clients) >= MAX_TRACKED_CLIENTS and client_key not in self._clients:
+                self._clients = {key: until for key, until in self._clients.items() if until > now}
+                if len(self._clients) >= MAX_TRACKED_CLIENTS:
+                    self._clients.clear()
+            self._clients[client_key] = now + self.ttl
+
+    def recent(self, client_key: str) -> bool:
+        until = self._clients.get(client_key)
+        return until is not None and until > time.monotonic()
+
+sticky = StickyClients()
+
+def use_replica(client_key: str, cookies) -> bool:
+    """Whether a read-only request may be served from the replica"""
+    return REPLICA_URL is not None and STICKY_COOKIE not in cookies and not sticky.recent(client_key)
+
+def sticky_cookie() -> dict:
+    """Keyword arguments for set_cookie on a successful write (both frameworks)"""
+    return {"key": STICKY_COOKIE, "value": "1", "max_age": max(1, int(STICKY_SECONDS)),
+            "httponly": True, "samesite": "Lax"}
@@ -0,0 +1,13 @@
+from fastapi.responses import JSONResponse
+
+from app.serialization import dumps
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fast encoder
+
+    Routes that return this directly skip response_model re-validation, so
+    they must pass data already in the documented response shape.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app import user_state
+from app.database import get_read_db
+from app.models import Ballot, Like, User, Vote
+from app.responses import FastJSONResponse
+from app.routers.polls import _creator_identity
+from app.schemas import PollState
+
+router = APIRouter()
+
+@router.get("/poll-state", response_model=List[PollState])
+async def get_poll_state(request: Request, poll_ids: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """The requesting user's vote or ballot and like on each of poll_ids (comma-separated)"""
+    try:
+        ids = user_state.parse_poll_ids(poll_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"Cache-Control": user_state.CACHE_CONTROL}
+
+    username, _ = _creator_identity(request)
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    if user_id is None or not ids:
+        # Users are created on their first write, so an unknown user has no state
+        return FastJSONResponse([user_state.empty_state(poll_id) for poll_id in ids], headers=headers)
+
+    states = user_state.cache.get(user_id, ids, lambda missing: user_state.load_states(
+        db, Vote.__table__, Ballot.__table__, Like.__table__, user_id, missing
+    ))
+    return FastJSONResponse(states, headers=headers)
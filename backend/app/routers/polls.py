@@ -1,71 +1,352 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+import logging
 import time
 import random
 
-from app.database import get_db
-from app.models import Poll, PollOption, Vote, Like, User
-from app.schemas import PollCreate, Poll, PollUpdate, VoteCreate, LikeCreate, PollSummary
+from app.database import SessionLocal, get_db, get_read_db, group_writer, use_primary
+from app import counter_shards, hot_state, membership, poll_import, realtime_snapshot, replicas, sse, tally, user_state
+from app.models import Poll, PollOption, Vote, Like, User, PollSnapshot, VoteCountShard, Ballot
+from app.schemas import PollCreate, Poll as PollSchema, PollUpdate, VoteCreate, LikeCreate, PollSummary, BallotCreate
 from app.websocket_manager import manager
+from app.responses import FastJSONResponse
+from app.serialization import dumps, loads
+from app.search import search_poll_ids
+from app.snapshots import FrozenResults, IMMUTABLE_CACHE_CONTROL, etag_matches, snapshot_cache
+from app.versioning import REVALIDATE_CACHE_CONTROL, feed_etag, poll_etag, versions
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=Poll)
-async def create_poll(poll: PollCreate, request: Request, db: Session = Depends(get_db)):
-    """Create a new poll with options"""
+def _creator_identity(request: Request):
+    """Stable (username, email) of the anonymous user behind a request"""
     # Check if this is a test request with a specific user identifier
     test_user_id = request.query_params.get("test_user")
     if test_user_id:
         # Use test user ID for testing multiple users from same IP
-        user_identifier = f"test_{test_user_id}"
         username = f"test_user_{test_user_id}"
         email = f"{username}@test.local"
     else:
         # Create unique anonymous user based on IP and user agent
+        client_ip = request.client.host
+        user_agent = request.headers.get("user-agent", "unknown")
         user_identifier = f"{client_ip}_{hash(user_agent) % 10000}"
         username = f"anonymous_{user_identifier}"
         email = f"{username}@anonymous.local"
+    return username, email
 
-    # Check if user exists, if not create one
+def _get_owned_poll(poll_id: int, request: Request, db: Session) -> Poll:
+    """Load a poll that the requesting user created, for modification"""
+    poll = db.query(Poll).filter(Poll.id == poll_id).first()
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    username, _ = _creator_identity(request)
     user = db.query(User).filter(User.username == username).first()
-    if not user:
-        user = User(username=username, email=email)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    if not user or user.id != poll.creator_id:
+        raise HTTPException(status_code=403, detail="Only the poll creator can modify this poll")
+
+    if not poll.is_active:
+        raise HTTPException(status_code=409, detail="Poll is closed")
+
+    return poll
+
+def _load_poll_detail(poll_id: int, db: Session):
+    """Poll with creator joined and options in one follow-up query (two round trips)"""
+    return db.query(Poll).options(
+        joinedload(Poll.creator),
+        selectinload(Poll.options)
+    ).filter(Poll.id == poll_id).first()
 
-    db_poll = Poll(
-        title=poll.title,
-        description=poll.description,
-        creator_id=user.id
+SHARDS = VoteCountShard.__table__
+
+# Versions include writes still sitting in counter shards (hot polls) and,
+# on the primary, writes the hot state store has not checkpointed yet. The
+# replica's versions are cached apart from the primary's.
+def _stored_poll_version(poll_id: int, db: Session):
+    return replicas.version_registry(db).poll_version(
+        poll_id,
+        lambda: db.query(Poll.version + counter_shards.pending_writes(SHARDS, Poll.id)).filter(
+            Poll.id == poll_id, Poll.is_active == True
+        ).scalar()
     )
-    db.add(db_poll)
-    db.commit()
-    db.refresh(db_poll)
 
-    # Create poll options
+def _current_poll_version(poll_id: int, db: Session):
+    version = _stored_poll_version(poll_id, db)
+    if version is None or replicas.is_replica(db):
+        return version
+    return version + hot_state.store.pending_writes(poll_id)
+
+def _current_feed_version(db: Session) -> int:
+    version = replicas.version_registry(db).feed_version(lambda: db.query(
+        func.coalesce(func.sum(Poll.version), 0) + counter_shards.total_pending_writes(SHARDS)
+    ).scalar())
+    if replicas.is_replica(db):
+        return version
+    return version + hot_state.store.total_pending_writes()
+
+def _revalidate_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_revalidate_headers(etag))
+
+# ORM rows are already trusted, so read endpoints build their documented
+# response shapes (schemas.Poll / schemas.PollSummary) directly instead of
+# validating through Pydantic again before encoding.
+def _poll_summary_dict(poll: Poll, total_votes: int, total_likes: int, creator_username) -> dict:
+    return {
+        "id": poll.id,
+        "title": poll.title,
+        "description": poll.description,
+        "created_at": poll.created_at,
+        "total_votes": total_votes or 0,
+        "total_likes": total_likes or 0,
+        "creator_username": creator_username or "anonymous"
+    }
+
+def _poll_detail_dict(poll: Poll) -> dict:
+    creator = poll.creator
+    return {
+        "title": poll.title,
+        "description": poll.description,
+        "id": poll.id,
+        "created_at": poll.created_at,
+        "updated_at": poll.updated_at,
+        "creator_id": poll.creator_id,
+        "is_active": poll.is_active,
+        "poll_type": poll.poll_type,
+        "total_votes": poll.total_votes,
+        "total_likes": poll.total_likes,
+        "creator": {
+            "username": creator.username,
+            "email": creator.email,
+            "id": creator.id,
+            "created_at": creator.created_at
+        },
+        "options": [
+            {
+                "option_text": option.option_text,
+                "id": option.id,
+                "poll_id": option.poll_id,
+                "vote_count": option.vote_count
+            }
+            for option in poll.options
+        ]
+    }
+
+def _hot_detail_dict(state: hot_state.PollState) -> dict:
+    title, description, created_at, updated_at, creator_id, username, email, creator_created_at, poll_type, _ = state.header
+    return {
+        "title": title,
+        "description": description,
+        "id": state.poll_id,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "creator_id": creator_id,
+        "is_active": True,
+        "poll_type": poll_type,
+        "total_votes": state.votes,
+        "total_likes": state.likes,
+        "creator": {
+            "username": username,
+            "email": email,
+            "id": creator_id,
+            "created_at": creator_created_at
+        },
+        "options": [
+            {
+                "option_text": option_text,
+                "id": option_id,
+                "poll_id": state.poll_id,
+                "vote_count": vote_count
+            }
+            for option_id, option_text, vote_count in state.options()
+        ]
+    }
+
+def _hot_state_response(state: hot_state.PollState) -> Response:
+    return FastJSONResponse(_hot_detail_dict(state), headers=_revalidate_headers(poll_etag(state.poll_id, state.version)))
+
+def _hot_poll(poll_id: int, db: Session) -> Optional[hot_state.PollState]:
+    """The poll's hot state entry, loaded on a miss; None once the poll is closed"""
+    state = hot_state.store.get(poll_id)
+    if state is not None:
+        return state
+    poll = _load_poll_detail(poll_id, db)
+    if poll is None or not poll.is_active:
+        return None
+    return hot_state.store.load(poll, counter_shards.cached_totals(db, SHARDS, poll_id))
+
+def warm_hot_state(limit: int) -> int:
+    """Load the most recent live polls into the hot state store, e.g. before a worker takes requests"""
+    if not hot_state.ENABLED or limit <= 0:
+        return 0
+    db = SessionLocal()
+    try:
+        polls = db.query(Poll).options(joinedload(Poll.creator), selectinload(Poll.options)).filter(
+            Poll.is_active == True
+        ).order_by(Poll.id.desc()).limit(limit).all()
+        # Only polls with counter shards need their totals read
+        sharded = set(db.execute(
+            select(VoteCountShard.poll_id).where(VoteCountShard.poll_id.in_([poll.id for poll in polls])).distinct()
+        ).scalars())
+        for poll in polls:
+            totals = counter_shards.cached_totals(db, SHARDS, poll.id) if poll.id in sharded else counter_shards.ShardTotals()
+            hot_state.store.load(poll, totals)
+        return len(polls)
+    finally:
+        db.close()
+
+def poll_snapshots(poll_ids: List[int]) -> dict:
+    """GET /api/polls/{id} bodies of several polls for one real-time message (app.realtime_snapshot)"""
+    poll_ids = poll_ids[:realtime_snapshot.MAX_POLLS]
+    details = {}
+    unread = []
+    for poll_id in poll_ids:
+        frozen = snapshot_cache.get(poll_id)
+        if frozen:
+            details[poll_id] = loads(frozen.body)
+        else:
+            unread.append(poll_id)
+    if unread:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Poll, counter_shards.pending_writes(SHARDS, Poll.id))
+                .options(joinedload(Poll.creator), joinedload(Poll.options))
+                .where(Poll.id.in_(unread))
+            ).unique().all()
+            for poll, shard_writes in rows:
+                if not poll.is_active:
+                    details[poll.id] = loads(_load_snapshot(poll, db).body)
+                    continue
+                if hot_state.ENABLED:
+                    state = hot_state.store.fresh(poll.id, lambda: poll.version + shard_writes)
+                    if state is not None:
+                        details[poll.id] = _hot_detail_dict(state)
+                        continue
+                # Shard rows without writes hold no uncounted votes either
+                totals = (counter_shards.cached_totals(db, SHARDS, poll.id)
+                          if shard_writes else counter_shards.ShardTotals())
+                if hot_state.ENABLED:
+                    details[poll.id] = _hot_detail_dict(hot_state.store.load(poll, totals))
+                else:
+                    details[poll.id] = counter_shards.apply_to_detail(_poll_detail_dict(poll), totals)
+    return realtime_snapshot.snapshot_data(poll_ids, details)
+
+def _commit_checkpoint(operation):
+    """Hot state checkpoints go through the group-commit writer too, else commit on their own session"""
+    if group_writer is not None:
+        return group_writer.run(operation)
+    with SessionLocal() as db:
+        result = operation(db)
+        db.commit()
+        return result
+
+if hot_state.ENABLED:
+    hot_state.store.configure(_commit_checkpoint, Poll.__table__, PollOption.__table__)
+
+def _freeze_poll(poll: Poll, db: Session) -> FrozenResults:
+    """Serialize a closed poll once and store it as its permanent snapshot"""
+    db.flush()
+    counter_shards.fold(db, SHARDS, PollOption.__table__, Poll.__table__, poll.id)
+    db.refresh(poll)
     for option in poll.options:
-        db_option = PollOption(
-            poll_id=db_poll.id,
-            option_text=option.option_text
-        )
-        db.add(db_option)
+        db.refresh(option)
+    frozen = FrozenResults(dumps(_poll_detail_dict(poll)))
+    db.add(PollSnapshot(poll_id=poll.id, payload=frozen.body.decode("utf-8"), etag=frozen.etag))
+    db.commit()
+    snapshot_cache.put(poll.id, frozen)
+    return frozen
+
+def _load_snapshot(poll: Poll, db: Session) -> FrozenResults:
+    frozen = snapshot_cache.get(poll.id)
+    if frozen:
+        return frozen
+
+    snapshot = db.query(PollSnapshot).filter(PollSnapshot.poll_id == poll.id).first()
+    if not snapshot:
+        # Poll was deactivated before snapshots existed
+        return _freeze_poll(poll, db)
+
+    frozen = FrozenResults(snapshot.payload.encode("utf-8"), snapshot.etag)
+    snapshot_cache.put(poll.id, frozen)
+    return frozen
+
+def _snapshot_response(frozen: FrozenResults, request: Request) -> Response:
+    headers = {"ETag": frozen.etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), frozen.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=frozen.body, media_type="application/json", headers=headers)
+
+async def _close_poll(poll: Poll, db: Session) -> FrozenResults:
+    poll.is_active = False
+    # Writes this worker has not checkpointed are dropped with its entry below;
+    # counting them keeps the poll and feed versions from going backwards
+    poll.version = Poll.version + 1 + hot_state.store.pending_writes(poll.id)
+    if hot_state.ENABLED and poll.poll_type == tally.SINGLE:
+        # Deltas not yet checkpointed, here or by other workers, are replaced by a recount
+        hot_state.recount(db, Poll.__table__, PollOption.__table__, Vote.__table__, Like.__table__, SHARDS, poll.id)
+    frozen = _freeze_poll(poll, db)
+    hot_state.store.forget(poll.id)
+    versions.record_write(poll.id)
+    membership.voters.forget(poll.id)
+    membership.likers.forget(poll.id)
+
+    # Final results go out once; closed polls get no further live updates
+    await manager.retire_poll(
+        poll.id,
+        {
+            "total_votes": poll.total_votes,
+            "total_likes": poll.total_likes,
+            "options": [
+                {"option_id": option.id, "option_text": option.option_text, "vote_count": option.vote_count}
+                for option in poll.options
+            ]
+        }
+    )
 
+    return frozen
+
+def _get_or_create_creator(request: Request, db: Session) -> User:
+    """The anonymous user behind a request, flushed but not committed if new"""
+    username, email = _creator_identity(request)
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        user = User(username=username, email=email, password_hash="")
+        db.add(user)
+        db.flush()
+    return user
+
+@router.post("/", response_model=PollSchema)
+async def create_poll(poll: PollCreate, request: Request, db: Session = Depends(get_db)):
+    """Create a new poll with options"""
+    # User, poll and options are written in one transaction
+    try:
+        poll_type = poll_import.check_poll_type(poll.poll_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user = _get_or_create_creator(request, db)
+    draft = poll_import.PollDraft(poll.title, poll.description, [option.option_text for option in poll.options],
+                                  poll_type)
+    created = poll_import.insert_polls(db, Poll.__table__, PollOption.__table__, user.id, [draft])[0]
     db.commit()
-    db.refresh(db_poll)
+    versions.record_write(created["id"], created["version"])
 
     # Broadcast new poll creation
     await manager.broadcast_poll_update(
-        db_poll.id,
+        created["id"],
         "created",
         {
             "poll": {
-                "id": db_poll.id,
-                "title": db_poll.title,
-                "description": db_poll.description,
+                "id": created["id"],
+                "title": poll.title,
+                "description": poll.description,
                 "total_votes": 0,
                 "total_likes": 0,
                 "creator_username": user.username
@@ -73,48 +354,334 @@ async def create_poll(poll: PollCreate, request: Request, db: Session = Depends(
         }
     )
 
-    return db_poll
+    return FastJSONResponse({
+        "title": poll.title,
+        "description": poll.description,
+        "id": created["id"],
+        "created_at": created["created_at"],
+        "updated_at": None,
+        "creator_id": user.id,
+        "is_active": True,
+        "poll_type": poll_type,
+        "total_votes": 0,
+        "total_likes": 0,
+        "creator": {
+            "username": user.username,
+            "email": user.email,
+            "id": user.id,
+            "created_at": user.created_at
+        },
+        "options": [
+            {"option_text": text, "id": option_id, "poll_id": created["id"], "vote_count": 0}
+            for option_id, text in created["options"]
+        ]
+    })
+
+@router.post(":import")
+async def import_polls(request: Request, db: Session = Depends(get_db)):
+    """Create many polls from an NDJSON body, one poll per line, committed in chunks"""
+    user = _get_or_create_creator(request, db)
+    db.commit()
+
+    def write_chunk(drafts):
+        created = poll_import.insert_polls(db, Poll.__table__, PollOption.__table__, user.id, drafts)
+        db.commit()
+        return [poll["id"] for poll in created]
+
+    importer = poll_import.PollImport(write_chunk)
+    async for chunk in request.stream():
+        importer.feed(chunk)
+    summary = importer.finish()
+    if summary["imported"]:
+        # Imported polls are not announced one by one; feeds pick them up on their next fetch
+        versions.invalidate_feed()
+    return summary
 
 @router.get("/", response_model=List[PollSummary])
-async def get_polls(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_polls(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """Get all active polls"""
-    polls = db.query(Poll).filter(Poll.is_active == True).offset(skip).limit(limit).all()
+    # Read the version before the data so the ETag can only be older than the body
+    version = _current_feed_version(db)
+    if replicas.is_replica(db) and replicas.is_behind(version, request.headers.get("if-none-match")):
+        version = _current_feed_version(use_primary(db))
+    etag = feed_etag(version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+
+    # One query for the page with creator names, then one grouped query for
+    # votes still in counter shards. The poll counters are kept exact by the
+    # write paths and app.reconcile, so likes are not recounted here.
+    rows = db.query(Poll, User.username).outerjoin(User, User.id == Poll.creator_id).filter(
+        Poll.is_active == True
+    ).offset(skip).limit(limit).all()
+    poll_ids = [poll.id for poll, _ in rows]
+
+    shard_votes = {}
+    if poll_ids:
+        shard_votes = dict(db.execute(counter_shards.shard_votes_statement(SHARDS, poll_ids)).all())
 
     result = []
-    for poll in polls:
-        # Get creator username
-        creator = db.query(User).filter(User.id == poll.creator_id).first()
-
-        # Calculate total votes
-        total_votes = db.query(func.sum(PollOption.vote_count)).filter(
-            PollOption.poll_id == poll.id
-        ).scalar() or 0
-
-        # Calculate total likes
-        total_likes = db.query(func.count(Like.id)).filter(
-            Like.poll_id == poll.id
-        ).scalar() or 0
-
-        result.append(PollSummary(
-            id=poll.id,
-            title=poll.title,
-            description=poll.description,
-            created_at=poll.created_at,
-            total_votes=total_votes,
-            total_likes=total_likes,
-            creator_username=creator.username if creator else "anonymous"
-        ))
+    for poll, username in rows:
+        total_votes = (poll.total_votes or 0) + shard_votes.get(poll.id, 0)
+        total_likes = poll.total_likes or 0
+        # Counts this worker has not checkpointed yet (in the version too)
+        state = hot_state.store.get(poll.id) if not replicas.is_replica(db) else None
+        if state is not None:
+            total_votes += state.pending_votes
+            total_likes += state.pending_likes
+        result.append(_poll_summary_dict(poll, total_votes, total_likes, username))
+
+    return FastJSONResponse(result, headers=_revalidate_headers(etag))
+
+@router.get("/search", response_model=List[PollSummary])
+async def search_polls(q: str, skip: int = 0, limit: int = 20, db: Session = Depends(get_read_db)):
+    """Full-text search over poll titles and descriptions, best match first"""
+    limit = max(1, min(limit, 100))
+    poll_ids = search_poll_ids(db.connection(), q, table=Poll.__tablename__, limit=limit, offset=skip)
+    if not poll_ids:
+        return []
+
+    rows = db.query(Poll, User.username).outerjoin(User, User.id == Poll.creator_id).filter(
+        Poll.id.in_(poll_ids)
+    ).all()
+    by_id = {poll.id: (poll, username) for poll, username in rows}
+    # Votes still in counter shards, as in the feed
+    shard_votes = {}
+    if by_id:
+        shard_votes = dict(db.execute(counter_shards.shard_votes_statement(SHARDS, list(by_id))).all())
 
-    return result
+    result = []
+    for poll_id in poll_ids:
+        if poll_id not in by_id:
+            continue
+        poll, username = by_id[poll_id]
+        total_votes = (poll.total_votes or 0) + shard_votes.get(poll_id, 0)
+        result.append(_poll_summary_dict(poll, total_votes, poll.total_likes, username))
 
-@router.get("/{poll_id}", response_model=Poll)
-async def get_poll(poll_id: int, db: Session = Depends(get_db)):
+    return FastJSONResponse(result)
+
+@router.get("/{poll_id}", response_model=PollSchema)
+async def get_poll(poll_id: int, request: Request, db: Session = Depends(get_read_db)):
     """Get a specific poll with all options"""
-    poll = db.query(Poll).filter(Poll.id == poll_id, Poll.is_active == True).first()
+    # Closed polls are served from their frozen snapshot without touching the DB
+    frozen = snapshot_cache.get(poll_id)
+    if frozen:
+        return _snapshot_response(frozen, request)
+
+    if_none_match = request.headers.get("if-none-match")
+    # A lagging replica (older than the client's copy, or without the poll) is skipped
+    if replicas.is_replica(db) and replicas.is_behind(_current_poll_version(poll_id, db), if_none_match):
+        use_primary(db)
+
+    # Unchanged live polls are answered from the version counter alone
+    if if_none_match:
+        version = _current_poll_version(poll_id, db)
+        if version is not None and etag_matches(if_none_match, poll_etag(poll_id, version)):
+            return _not_modified(poll_etag(poll_id, version))
+
+    # The primary's live polls are served from the hot state store while it is current
+    use_hot_state = hot_state.ENABLED and not replicas.is_replica(db)
+    if use_hot_state:
+        state = hot_state.store.fresh(poll_id, lambda: _stored_poll_version(poll_id, db))
+        if state is not None:
+            return _hot_state_response(state)
+
+    poll = _load_poll_detail(poll_id, db)
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
 
-    return poll
+    if not poll.is_active:
+        return _snapshot_response(_load_snapshot(poll, db), request)
+
+    totals = counter_shards.cached_totals(db, SHARDS, poll.id)
+    if use_hot_state:
+        return _hot_state_response(hot_state.store.load(poll, totals))
+    etag = poll_etag(poll.id, poll.version + totals.writes)
+    detail = counter_shards.apply_to_detail(_poll_detail_dict(poll), totals)
+    return FastJSONResponse(detail, headers=_revalidate_headers(etag))
+
+@router.get("/{poll_id}/stream")
+async def stream_poll(poll_id: int, request: Request, last_event_id: Optional[str] = None,
+                      db: Session = Depends(get_read_db)):
+    """Server-Sent Events stream of a poll's live updates, resumable with Last-Event-ID"""
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    is_active = db.query(Poll.is_active).filter(Poll.id == poll_id).scalar()
+    if is_active is None and replicas.is_replica(db):
+        # The replica may not have a poll created a moment ago
+        use_primary(db)
+        is_active = db.query(Poll.is_active).filter(Poll.id == poll_id).scalar()
+    # The stream outlives the request; do not hold a pooled connection for it
+    db.close()
+    if is_active is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if not is_active and not sse.hub.has_replay(poll_id, last_event_id):
+        raise HTTPException(status_code=409, detail="Poll is closed")
+
+    subscription, initial = sse.hub.subscribe(poll_id, last_event_id)
+    return StreamingResponse(sse.hub.aiter_frames(subscription, initial),
+                             media_type=sse.MEDIA_TYPE, headers=sse.HEADERS)
+
+@router.patch("/{poll_id}", response_model=PollSchema)
+async def update_poll(poll_id: int, poll_update: PollUpdate, request: Request, db: Session = Depends(get_db)):
+    """Update a poll's title or description, or close it with is_active=false"""
+    poll = _get_owned_poll(poll_id, request, db)
+
+    changes = poll_update.model_dump(exclude_unset=True)
+    closing = changes.pop("is_active", True) is False
+
+    if changes.get("title") is not None and not changes["title"].strip():
+        raise HTTPException(status_code=400, detail="Title cannot be empty")
+    for field, value in changes.items():
+        if value is not None or field == "description":
+            setattr(poll, field, value)
+
+    if closing:
+        return _snapshot_response(await _close_poll(poll, db), request)
+
+    poll.version = Poll.version + 1
+    db.commit()
+    db.refresh(poll)
+    versions.record_write(poll.id, poll.version)
+
+    await manager.broadcast_poll_update(
+        poll_id,
+        "updated",
+        {
+            "title": poll.title,
+            "description": poll.description
+        }
+    )
+
+    return FastJSONResponse(_poll_detail_dict(poll))
+
+@router.post("/{poll_id}/close")
+async def close_poll(poll_id: int, request: Request, db: Session = Depends(get_db)):
+    """Close a poll and freeze its final results"""
+    poll = _get_owned_poll(poll_id, request, db)
+    return _snapshot_response(await _close_poll(poll, db), request)
+
+def _member_ids(db: Session, model, poll_id: int):
+    """User ids with a vote or like (model) on a poll, streamed"""
+    return (user_id for (user_id,) in db.query(model.user_id).filter(model.poll_id == poll_id).yield_per(50_000))
+
+async def _definitely_absent(index: membership.MembershipIndex, db: Session, model, poll_id: int, user_id: int) -> bool:
+    """index.definitely_absent, reading a poll's member ids in a worker thread rather than on the event loop"""
+    if not index.enabled:
+        return False
+    members = index.get(poll_id)
+    if members is None:
+        members = await run_in_threadpool(index.load, poll_id, lambda: _member_ids(db, model, poll_id))
+    return user_id not in members
+
+def _find_vote(db: Session, user_id: int, poll_id: int):
+    return db.query(Vote).filter(Vote.user_id == user_id, Vote.poll_id == poll_id).first()
+
+def _apply_vote(db: Session, poll: Poll, option: PollOption, user_id: int, existing_vote, sharded: bool):
+    """Record or move a user's vote and update the counters, without committing;
+    returns the option the vote moved from, if any"""
+    previous_option_id = existing_vote.option_id if existing_vote else None
+    if hot_state.ENABLED:
+        # Counted by the hot state store, which checkpoints the counters
+        if existing_vote:
+            existing_vote.option_id = option.id
+        else:
+            db.add(Vote(user_id=user_id, poll_id=poll.id, option_id=option.id))
+        return previous_option_id
+
+    if existing_vote:
+        # Update existing vote
+        if sharded:
+            counter_shards.increment(db, SHARDS, poll.id, existing_vote.option_id, -1)
+        else:
+            old_option = db.query(PollOption).filter(PollOption.id == existing_vote.option_id).first()
+            if old_option:
+                old_option.vote_count -= 1
+
+        existing_vote.option_id = option.id
+    else:
+        # Create new vote
+        db.add(Vote(user_id=user_id, poll_id=poll.id, option_id=option.id))
+
+        # Update poll total votes
+        if not sharded:
+            poll.total_votes += 1
+
+    # Update option vote count
+    if sharded:
+        counter_shards.increment(db, SHARDS, poll.id, option.id, 1)
+    else:
+        option.vote_count += 1
+        poll.version = Poll.version + 1
+        # Fold counts left in shards from when the poll was hot
+        if counter_shards.tracker.may_have_shards(poll.id):
+            counter_shards.fold(db, SHARDS, PollOption.__table__, Poll.__table__, poll.id)
+    return previous_option_id
+
+def _vote_write(poll_id: int, option_id: int, user_id: int, check_existing: bool, sharded: bool):
+    """Write recording a vote; returns the new counts, or None if the poll closed meanwhile"""
+    def write(db: Session):
+        poll = db.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        option = db.get(PollOption, option_id)
+        existing_vote = _find_vote(db, user_id, poll_id) if check_existing else None
+        try:
+            with db.begin_nested():
+                previous_option_id = _apply_vote(db, poll, option, user_id, existing_vote, sharded)
+        except IntegrityError:
+            # Another worker recorded a vote for this user after our member set was loaded
+            previous_option_id = _apply_vote(db, poll, option, user_id, _find_vote(db, user_id, poll_id), sharded)
+        db.flush()
+        return {"option_id": option.id, "option_text": option.option_text, "vote_count": option.vote_count,
+                "total_votes": poll.total_votes, "version": poll.version,
+                "previous_option_id": previous_option_id}
+    return write
+
+def _like_write(poll_id: int, user_id: int, liked: bool):
+    """Write adding or removing a like; returns the new total, or None if there was nothing to do"""
+    def write(db: Session):
+        poll = db.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        delta = 1 if liked else -1
+        if liked:
+            db.add(Like(user_id=user_id, poll_id=poll_id))
+        else:
+            like = db.query(Like).filter(Like.user_id == user_id, Like.poll_id == poll_id).first()
+            if like is None:
+                return None
+            db.delete(like)
+        if not hot_state.ENABLED:
+            # Otherwise counted by the hot state store
+            poll.total_likes += delta
+            poll.version = Poll.version + 1
+        db.flush()
+        return {"total_likes": poll.total_likes, "version": poll.version}
+    return write
+
+async def _write(db: Session, operation):
+    """Run a write through the group-commit writer, or commit it on the request's session"""
+    if group_writer is not None:
+        # Hand the pooled connection back while waiting; loaded attributes stay readable
+        db.close()
+        return await group_writer.run_async(operation)
+    try:
+        result = operation(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+def _count_like(poll_id: int, counts: dict, delta: int, db: Session):
+    """Count a committed like or unlike in the hot state store, or note the poll's new version"""
+    state = _hot_poll(poll_id, db) if hot_state.ENABLED else None
+    if state is not None:
+        counts["total_likes"] = hot_state.store.record_like(state, delta).likes
+    else:
+        versions.record_write(poll_id)
+    # Nothing below reads the database; do not hold a connection across the awaits
+    db.close()
 
 @router.post("/{poll_id}/vote")
 async def vote_on_poll(poll_id: int, vote: VoteCreate, request: Request, db: Session = Depends(get_db)):
@@ -123,6 +690,8 @@ async def vote_on_poll(poll_id: int, vote: VoteCreate, request: Request, db: Ses
     poll = db.query(Poll).filter(Poll.id == poll_id, Poll.is_active == True).first()
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
+    if poll.poll_type != tally.SINGLE:
+        raise HTTPException(status_code=400, detail=f"This poll takes ballots: POST /api/polls/{poll_id}/ballot")
 
     # Check if option exists
     option = db.query(PollOption).filter(
@@ -154,59 +723,147 @@ async def vote_on_poll(poll_id: int, vote: VoteCreate, request: Request, db: Ses
     # Check if user exists, if not create one
     user = db.query(User).filter(User.username == username).first()
     if not user:
-        user = User(username=username, email=email)
+        user = User(username=username, email=email, password_hash="")
         db.add(user)
         db.commit()
         db.refresh(user)
 
-    # Check if user already voted on this poll
-    existing_vote = db.query(Vote).filter(
-        Vote.user_id == user.id,
-        Vote.poll_id == poll_id
-    ).first()
-
-    if existing_vote:
-        # Update existing vote
-        old_option = db.query(PollOption).filter(PollOption.id == existing_vote.option_id).first()
-        if old_option:
-            old_option.vote_count -= 1
+    # Hot polls count into counter shards instead of locking the poll and option rows
+    # (unless the hot state store keeps all counts off those rows)
+    sharded = not hot_state.ENABLED and counter_shards.tracker.record_vote(poll_id)
 
-        existing_vote.option_id = vote.option_id
-        db.commit()
+    # First-time voters, the common case, skip the existing-vote lookup
+    check_existing = not await _definitely_absent(membership.voters, db, Vote, poll_id, user.id)
+    counts = await _write(db, _vote_write(poll_id, option.id, user.id, check_existing, sharded))
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    membership.voters.add(poll_id, user.id)
+    user_state.cache.invalidate(user.id, poll_id)
+
+    state = _hot_poll(poll_id, db) if hot_state.ENABLED else None
+    if state is not None:
+        state = hot_state.store.record_vote(state, counts["previous_option_id"], counts["option_id"])
+        counts["vote_count"], counts["total_votes"] = state.vote_count(counts["option_id"]), state.votes
+        totals = counter_shards.ShardTotals()
+    elif sharded:
+        versions.record_write(poll_id)
+        totals = counter_shards.refresh_totals(db, SHARDS, poll_id)
     else:
-        # Create new vote
-        new_vote = Vote(
-            user_id=user.id,
-            poll_id=poll_id,
-            option_id=vote.option_id
-        )
-        db.add(new_vote)
-
-        # Update poll total votes
-        poll.total_votes += 1
-
-    # Update option vote count
-    option.vote_count += 1
-    db.commit()
-
-    # Refresh data for broadcast
-    db.refresh(poll)
-    db.refresh(option)
+        versions.record_write(poll_id, counts["version"])
+        totals = counter_shards.ShardTotals()
+    # Nothing below reads the database; do not hold a connection across the awaits
+    db.close()
 
     # Broadcast vote update
     await manager.broadcast_poll_update(
         poll_id,
         "vote",
         {
-            "option_id": option.id,
-            "option_text": option.option_text,
-            "vote_count": option.vote_count,
-            "total_votes": poll.total_votes
+            "option_id": counts["option_id"],
+            "option_text": counts["option_text"],
+            "vote_count": counts["vote_count"] + totals.options.get(counts["option_id"], 0),
+            "total_votes": counts["total_votes"] + totals.votes
         }
     )
 
     return {"message": "Vote recorded successfully"}
 
+def _ballot_write(poll_id: int, user_id: int, choices: List[int]):
+    """Write casting or replacing a ballot; returns the new counts, or None if the poll closed meanwhile"""
+    def write(db: Session):
+        poll = db.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        ballot = db.query(Ballot).filter(Ballot.user_id == user_id, Ballot.poll_id == poll_id).first()
+        previous = None
+        if ballot is None:
+            db.add(Ballot(user_id=user_id, poll_id=poll_id, choices=tally.encode_choices(choices)))
+            poll.total_votes += 1
+        else:
+            previous = tally.decode_choices(ballot.choices)
+            ballot.choices = tally.encode_choices(choices)
+        options = PollOption.__table__
+        for option_id, delta in tally.counter_deltas(poll.poll_type, previous, choices).items():
+            db.execute(options.update().where(options.c.id == option_id)
+                       .values(vote_count=options.c.vote_count + delta))
+        poll.version = Poll.version + 1
+        db.flush()
+        vote_counts = db.query(PollOption.id, PollOption.vote_count).filter(PollOption.poll_id == poll_id).all()
+        return {"total_votes": poll.total_votes, "version": poll.version, "vote_counts": vote_counts}
+    return write
+
+@router.post("/{poll_id}/ballot")
+async def cast_ballot(poll_id: int, ballot: BallotCreate, request: Request, db: Session = Depends(get_db)):
+    """Cast or replace a ballot on a multiple-choice or ranked-choice poll"""
+    poll = db.query(Poll).filter(Poll.id == poll_id, Poll.is_active == True).first()
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    option_ids = [option_id for (option_id,) in db.query(PollOption.id).filter(PollOption.poll_id == poll_id)]
+    try:
+        choices = tally.validate_ballot(poll.poll_type, ballot.option_ids, option_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user = _get_or_create_creator(request, db)
+    db.commit()
+    try:
+        counts = await _write(db, _ballot_write(poll_id, user.id, choices))
+    except IntegrityError:
+        # The same voter's first ballot, committed concurrently through another request
+        raise HTTPException(status_code=409, detail="Ballot changed concurrently, please retry")
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    versions.record_write(poll_id, counts["version"])
+    user_state.cache.invalidate(user.id, poll_id)
+    # Nothing below reads the database; do not hold a connection across the awaits
+    db.close()
+
+    await manager.broadcast_poll_update(
+        poll_id,
+        "ballot",
+        {
+            "total_votes": counts["total_votes"],
+            "options": [{"option_id": option_id, "vote_count": vote_count} for option_id, vote_count in counts["vote_counts"]]
+        }
+    )
+
+    return {"message": "Ballot recorded successfully"}
+
+@router.get("/{poll_id}/results")
+async def get_poll_results(poll_id: int, db: Session = Depends(get_read_db)):
+    """Tallied results: option counts, plus instant-runoff rounds and winner for ranked-choice polls"""
+    poll = db.query(Poll).options(selectinload(Poll.options)).filter(Poll.id == poll_id).first()
+    if not poll and replicas.is_replica(db):
+        # The replica may not have a poll created a moment ago
+        use_primary(db)
+        poll = db.query(Poll).options(selectinload(Poll.options)).filter(Poll.id == poll_id).first()
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    if poll.poll_type != tally.SINGLE:
+        options = [(option.id, option.option_text) for option in poll.options]
+        return FastJSONResponse(tally.ballot_results(db, Ballot.__table__, poll.id, poll.poll_type, options, poll.version))
+
+    totals = counter_shards.cached_totals(db, SHARDS, poll.id)
+    if hot_state.ENABLED and poll.is_active and not replicas.is_replica(db):
+        # Votes not yet checkpointed are only counted in the hot state store; a
+        # stale entry (PATCH, another worker's checkpoint) is reloaded with them kept
+        state = hot_state.store.fresh(poll.id, lambda: poll.version + totals.writes)
+        if state is None:
+            state = hot_state.store.load(poll, totals)
+        total_ballots, counts = state.votes, list(state.options())
+    else:
+        total_ballots = poll.total_votes + totals.votes
+        counts = [(option.id, option.option_text, option.vote_count + totals.options.get(option.id, 0))
+                  for option in sorted(poll.options, key=lambda option: option.id)]
+    return FastJSONResponse({
+        "poll_id": poll.id,
+        "poll_type": poll.poll_type,
+        "total_ballots": total_ballots,
+        "options": [{"option_id": option_id, "option_text": option_text, "votes": votes}
+                    for option_id, option_text, votes in counts]
+    })
+
 @router.post("/{poll_id}/like")
 async def like_poll(poll_id: int, request: Request, db: Session = Depends(get_db)):
     """Like a poll"""
@@ -237,37 +894,38 @@ async def like_poll(poll_id: int, request: Request, db: Session = Depends(get_db
     # Check if user exists, if not create one
     user = db.query(User).filter(User.username == username).first()
     if not user:
-        user = User(username=username, email=email)
+        user = User(username=username, email=email, password_hash="")
         db.add(user)
         db.commit()
         db.refresh(user)
 
-    # Check if user already liked this poll
-    existing_like = db.query(Like).filter(
-        Like.user_id == user.id,
-        Like.poll_id == poll_id
-    ).first()
-
-    if existing_like:
-        raise HTTPException(status_code=400, detail="Already liked this poll")
+    # Check if user already liked this poll (skipped when the member set rules it out)
+    if not await _definitely_absent(membership.likers, db, Like, poll_id, user.id):
+        existing_like = db.query(Like).filter(
+            Like.user_id == user.id,
+            Like.poll_id == poll_id
+        ).first()
 
-    # Create new like
-    new_like = Like(
-        user_id=user.id,
-        poll_id=poll_id
-    )
-    db.add(new_like)
+        if existing_like:
+            raise HTTPException(status_code=400, detail="Already liked this poll")
 
-    # Update poll total likes
-    poll.total_likes += 1
-    db.commit()
+    try:
+        counts = await _write(db, _like_write(poll_id, user.id, liked=True))
+    except IntegrityError:
+        # Liked through another worker after our member set was loaded
+        raise HTTPException(status_code=400, detail="Already liked this poll")
+    if counts is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    membership.likers.add(poll_id, user.id)
+    user_state.cache.invalidate(user.id, poll_id)
+    _count_like(poll_id, counts, 1, db)
 
     # Broadcast like update
     await manager.broadcast_poll_update(
         poll_id,
         "like",
         {
-            "total_likes": poll.total_likes,
+            "total_likes": counts["total_likes"],
             "liked": True
         }
     )
@@ -307,27 +965,19 @@ async def unlike_poll(poll_id: int, request: Request, db: Session = Depends(get_
         raise HTTPException(status_code=404, detail="User not found")
 
     # Find and remove like
-    like = db.query(Like).filter(
-        Like.user_id == user.id,
-        Like.poll_id == poll_id
-    ).first()
-
-    if not like:
+    counts = await _write(db, _like_write(poll_id, user.id, liked=False))
+    if counts is None:
         raise HTTPException(status_code=404, detail="Like not found")
-
-    # Remove like
-    db.delete(like)
-
-    # Update poll total likes
-    poll.total_likes -= 1
-    db.commit()
+    membership.likers.discard(poll_id, user.id)
+    user_state.cache.invalidate(user.id, poll_id)
+    _count_like(poll_id, counts, -1, db)
 
     # Broadcast like update
     await manager.broadcast_poll_update(
         poll_id,
         "like",
         {
-            "total_likes": poll.total_likes,
+            "total_likes": counts["total_likes"],
             "liked": False
         }
     )
@@ -1,26 +1,55 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import List, Optional
 import json
 import logging
 
-from app.websocket_manager import manager
+from app import realtime_snapshot
+from app.routers.polls import poll_snapshots
+from app.websocket_manager import Connection, manager
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _poll_ids(message: dict):
+    return realtime_snapshot.parse_poll_ids(message.get("poll_ids", []))
+
+async def _subscribe(connection: Connection, poll_ids: List[int]):
+    """Subscribe first, then send the polls' current state, so no update falls in between"""
+    manager.subscribe(connection.websocket, poll_ids)
+    await manager.send_snapshot(connection, poll_snapshots(poll_ids))
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates"""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, encoding: str = "text", poll_ids: Optional[str] = None):
+    """WebSocket endpoint for real-time updates
+
+    Clients receive every poll update until they send
+    {"type": "subscribe", "poll_ids": [...]} or connect with ?poll_ids=1,2,3;
+    either is answered with a poll_snapshot message holding those polls.
+    ?encoding=binary sends updates as binary frames. Clients must answer
+    every {"type": "ping"} with a message, e.g. {"type": "pong"}, or they are
+    disconnected after REALTIME_IDLE_TIMEOUT seconds.
+    """
+    connection = await manager.connect(websocket, encoding)
     try:
+        if poll_ids:
+            await _subscribe(connection, realtime_snapshot.parse_poll_ids(poll_ids))
         while True:
             # Keep connection alive and listen for client messages
             data = await websocket.receive_text()
+            connection.touch()
             try:
                 message = json.loads(data)
-                # Handle any client-specific messages here if needed
-                logger.info(f"Received message: {message}")
+                logger.debug(f"Received message: {message}")
             except json.JSONDecodeError:
                 logger.warning(f"Invalid JSON received: {data}")
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("type") == "subscribe":
+                await _subscribe(connection, _poll_ids(message))
+            elif message.get("type") == "unsubscribe":
+                manager.unsubscribe(websocket, _poll_ids(message))
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("Client disconnected")
+    finally:
+        manager.disconnect(websocket)
@@ -0,0 +1,282 @@
+"""
+On-demand sampling profiler for diagnosing latency in production.
+
+Opt-in and admin-only: GET /debug/profile exists only when PROFILER_TOKEN is
+set, and answers only requests that carry the same token in X-Profiler-Token
+(the app has no admin accounts; the token is the operator's). It profiles
+the worker that answered for ?seconds= (at most PROFILER_MAX_SECONDS) and
+returns collapsed stacks: one "frame;frame;...;frame count" line per
+distinct stack, ready for flamegraph.pl, speedscope or inferno.
+
+A native thread (not a greenlet, so that it still runs while a greenlet or
+coroutine hogs the worker) wakes every ?interval_ms= and records
+
+- the running stack of every thread, rooted at "thread:<name>": where CPU
+  time goes, including the request that is blocking the event loop;
+- the suspended stack of every asyncio task (root "task") or gevent greenlet
+  (root "greenlet"): where requests are waiting.
+
+Frames are "module:qualified name", e.g. app.routers.polls:get_polls,
+app_flask:vote_poll, app.websocket_manager:ConnectionManager.broadcast or
+app_flask:verify_password around the bcrypt call, independent of line
+numbers. Greenlets are found by tracing greenlet switches during the
+profile, so one that does not switch in the window (an idle Socket.IO
+connection) is not listed.
+
+Overhead is bounded: one profile per worker at a time, the interval is at
+least PROFILER_MIN_INTERVAL_MS, stacks are cut at PROFILER_MAX_DEPTH frames
+and at most PROFILER_MAX_TASKS tasks or greenlets are walked per sample.
+The sampler holds the GIL while it samples. Walking costs about 0.45 us per
+frame (python -m benchmarks.bench_profiler): 0.03 ms for an idle worker and
+0.9 ms with 100 requests waiting 20 coroutines deep. Samples that take
+longer are spaced out so sampling never takes more than PROFILER_MAX_OVERHEAD
+(5%) of the wall time, and fewer samples are taken instead. Greenlet tracing
+adds a function call per switch. X-Profile-Overhead reports the measured
+share of the profile's wall time spent sampling.
+"""
+import _thread
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from gevent import monkey as _gevent_monkey
+except ImportError:
+    _gevent_monkey = None
+
+TOKEN = os.getenv("PROFILER_TOKEN") or None
+TOKEN_HEADER = "X-Profiler-Token"
+DEFAULT_SECONDS = 10.0
+MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+DEFAULT_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+MIN_INTERVAL_MS = float(os.getenv("PROFILER_MIN_INTERVAL_MS", "1"))
+MAX_TASKS = int(os.getenv("PROFILER_MAX_TASKS", "1000"))
+MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", "128"))
+MAX_OVERHEAD = float(os.getenv("PROFILER_MAX_OVERHEAD", "0.05"))
+
+MEDIA_TYPE = "text/plain; charset=utf-8"
+BUSY_MESSAGE = "A profile is already running in this worker"
+
+# Only ever tried without blocking, so it may be a gevent lock as well
+_running = threading.Lock()
+
+def _native(module: str, name: str, default):
+    """The stdlib function even when gevent has patched it"""
+    if _gevent_monkey is None:
+        return default
+    return _gevent_monkey.get_original(module, name)
+
+def authorized(token: Optional[str]) -> bool:
+    return TOKEN is not None and token is not None and hmac.compare_digest(token.encode(), TOKEN.encode())
+
+def parse_window(seconds, interval_ms):
+    """Clamp the requested duration and interval; raises ValueError for non-numbers"""
+    seconds = DEFAULT_SECONDS if seconds in (None, "") else float(seconds)
+    interval_ms = DEFAULT_INTERVAL_MS if interval_ms in (None, "") else float(interval_ms)
+    return min(max(seconds, 0.1), MAX_SECONDS), max(interval_ms, MIN_INTERVAL_MS)
+
+class Profile:
+    __slots__ = ("stacks", "samples", "seconds", "sampling_seconds")
+
+    def __init__(self, stacks: Counter, samples: int, seconds: float, sampling_seconds: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.seconds = seconds
+        self.sampling_seconds = sampling_seconds
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most frequent first"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def headers(self) -> dict:
+        overhead = self.sampling_seconds / self.seconds if self.seconds else 0.0
+        return {
+            "X-Profile-Samples": str(self.samples),
+            "X-Profile-Seconds": f"{self.seconds:.3f}",
+            "X-Profile-Overhead": f"{overhead:.4f}",
+        }
+
+class StackSampler:
+    """Samples thread stacks plus suspended tasks or greenlets from a native thread"""
+
+    def __init__(self, interval: float, suspended: Callable[["StackSampler"], List[Tuple[str, list]]],
+                 max_depth: int = MAX_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._suspended = suspended
+        # Stacks of code objects while sampling; labelled once in result()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        allocate_lock = _native("_thread", "allocate_lock", _thread.allocate_lock)
+        # Held until stop(); the sampler waits on it between samples
+        self._stop = allocate_lock()
+        self._stop.acquire()
+        self._done = allocate_lock()
+        self._ident: Optional[int] = None
+
+    def frames(self, frame) -> list:
+        """Code objects from the outermost to frame, keeping the innermost max_depth"""
+        codes = []
+        while frame is not None and len(codes) < self.max_depth:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return codes
+
+    def sample(self):
+        try:
+            # Not threading.enumerate(): its lock may be gevent's, which this thread cannot wait on
+            names = {ident: thread.name for ident, thread in dict(threading._active).items()}
+        except RuntimeError:
+            names = {}
+        for ident, frame in sys._current_frames().items():
+            if ident != self._ident:
+                self.stacks[(f"thread:{names.get(ident, ident)}", *self.frames(frame))] += 1
+        for root, codes in self._suspended(self):
+            if codes:
+                self.stacks[(root, *codes)] += 1
+        self.samples += 1
+
+    def _run(self):
+        self._ident = _native("_thread", "get_ident", _thread.get_ident)()
+        try:
+            while True:
+                start = time.perf_counter()
+                self.sample()
+                elapsed = time.perf_counter() - start
+                self.sampling_seconds += elapsed
+                # Slower samples (many tasks) are spaced out to stay within MAX_OVERHEAD
+                if self._stop.acquire(True, max(self.interval - elapsed, elapsed * (1 / MAX_OVERHEAD - 1))):
+                    return
+        finally:
+            self._done.release()
+
+    def start(self):
+        self._done.acquire()
+        _native("_thread", "start_new_thread", _thread.start_new_thread)(self._run, ())
+
+    def stop(self):
+        """Stop sampling; waits for the sample in progress"""
+        self._stop.release()
+        self._done.acquire()
+        self._done.release()
+
+    def result(self, seconds: float) -> Profile:
+        modules = {getattr(module, "__file__", None): name for name, module in list(sys.modules.items())}
+        labels: Dict[object, str] = {}
+        for stack in self.stacks:
+            for code in stack[1:]:
+                if code not in labels:
+                    module = modules.get(code.co_filename, code.co_filename)
+                    labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        stacks = Counter()
+        for stack, count in self.stacks.items():
+            stacks[(stack[0], *(labels[code] for code in stack[1:]))] += count
+        return Profile(stacks, self.samples, seconds, self.sampling_seconds)
+
+def _await_chain(coro, max_depth: int) -> list:
+    """Code objects of a suspended coroutine and the coroutines it awaits, outermost first"""
+    codes = []
+    while coro is not None and len(codes) < max_depth:
+        frame = getattr(coro, "cr_frame", None)
+        if frame is not None:
+            following = coro.cr_await
+        else:
+            # A generator-based awaitable; a Future ends the chain
+            frame = getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            following = coro.gi_yieldfrom
+        codes.append(frame.f_code)
+        coro = following
+    return codes
+
+def _task_stacks(sampler: StackSampler, loop, exclude) -> List:
+    try:
+        tasks = list(asyncio.all_tasks(loop))
+    except RuntimeError:
+        # The task set changed while it was copied; the next sample gets it
+        return []
+    current = asyncio.current_task(loop)
+    stacks = []
+    for task in tasks[:MAX_TASKS]:
+        if task is current or task is exclude or task.done():
+            continue
+        stacks.append(("task", _await_chain(task.get_coro(), sampler.max_depth)))
+    return stacks
+
+async def profile_tasks(seconds: float, interval_ms: float) -> Optional[Profile]:
+    """Profile this event loop's threads and tasks; None while another profile runs"""
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        loop, own = asyncio.get_running_loop(), asyncio.current_task()
+        sampler = StackSampler(interval_ms / 1000, lambda sampler: _task_stacks(sampler, loop, own))
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        return sampler.result(time.perf_counter() - start)
+    finally:
+        _running.release()
+
+def _greenlet_stacks(sampler: StackSampler, seen, exclude) -> List:
+    try:
+        greenlets = list(seen)
+    except RuntimeError:
+        return []
+    stacks = []
+    for glet in greenlets[:MAX_TASKS]:
+        if glet in exclude:
+            continue
+        # None while it runs (the thread stacks have it) and once it is dead
+        frame = glet.gr_frame
+        if frame is not None:
+            stacks.append(("greenlet", sampler.frames(frame)))
+    return stacks
+
+def profile_greenlets(seconds: float, interval_ms: float) -> Optional[Profile]:
+    """Profile this process's threads and the greenlets that switch meanwhile; None while another profile runs"""
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        import greenlet
+        from gevent import get_hub
+    except ImportError:
+        greenlet = None
+    try:
+        seen = weakref.WeakSet()
+        exclude = set()
+        previous = None
+        if greenlet is not None:
+            exclude = {greenlet.getcurrent(), get_hub()}
+
+            def trace(event, args):
+                if event in ("switch", "throw"):
+                    seen.update(args)
+                if previous is not None:
+                    previous(event, args)
+
+            previous = greenlet.settrace(trace)
+        sampler = StackSampler(interval_ms / 1000, lambda sampler: _greenlet_stacks(sampler, seen, exclude))
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            # Yields to the other greenlets when gevent has patched time
+            time.sleep(seconds)
+        finally:
+            sampler.stop()
+            if greenlet is not None:
+                greenlet.settrace(previous)
+        return sampler.result(time.perf_counter() - start)
+    finally:
+        _running.release()
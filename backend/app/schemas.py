@@ -38,6 +38,8 @@ class PollBase(BaseModel):
 
 class PollCreate(PollBase):
     options: List[PollOptionCreate]
+    # single, multiple or ranked (see app.tally)
+    poll_type: str = "single"
 
 class PollUpdate(BaseModel):
     title: Optional[str] = None
@@ -50,6 +52,7 @@ class Poll(PollBase):
     updated_at: Optional[datetime]
     creator_id: int
     is_active: bool
+    poll_type: str = "single"
     total_votes: int
     total_likes: int
     creator: User
@@ -78,6 +81,10 @@ class VoteBase(BaseModel):
 class VoteCreate(VoteBase):
     pass
 
+class BallotCreate(BaseModel):
+    # Every approved option (multiple), or options in preference order (ranked)
+    option_ids: List[int]
+
 class Vote(VoteBase):
     id: int
     user_id: int
@@ -101,6 +108,13 @@ class Like(LikeBase):
     class Config:
         orm_mode = True
 
+# The requesting user's state on one poll (GET /api/me/poll-state)
+class PollState(BaseModel):
+    poll_id: int
+    voted_option_id: Optional[int]
+    ballot_option_ids: Optional[List[int]]
+    liked: bool
+
 # WebSocket message schemas
 class WSMessage(BaseModel):
     type: str  # "poll_update", "vote", "like", "new_poll"
@@ -0,0 +1,149 @@
+import logging
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Search terms are reduced to plain word characters before they reach the
+# index, so user input never leaks FTS5/tsquery operators into the query.
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TERMS = 8
+
+# Title matches weigh more than description matches when ranking
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+def _fts_table(table: str) -> str:
+    return f"{table}_fts"
+
+def tokenize_query(q: str) -> List[str]:
+    """Split a raw search string into safe lowercase terms"""
+    return [term.lower() for term in _TOKEN_RE.findall(q or "")][:MAX_QUERY_TERMS]
+
+def build_sqlite_match(terms: List[str]) -> str:
+    """FTS5 MATCH expression: every term must match, the last one as a prefix"""
+    parts = [f'"{term}"' for term in terms]
+    parts[-1] += "*"
+    return " ".join(parts)
+
+def build_postgres_tsquery(terms: List[str]) -> str:
+    """to_tsquery expression: every term must match, the last one as a prefix"""
+    parts = list(terms)
+    parts[-1] += ":*"
+    return " & ".join(parts)
+
+def _sqlite_has_fts5(conn) -> bool:
+    try:
+        options = conn.execute(text("PRAGMA compile_options")).scalars().all()
+    except OperationalError:
+        return False
+    return "ENABLE_FTS5" in options
+
+def _has_table(conn, name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name}
+    ).first() is not None
+
+def install_search_index(engine, table: str = "polls"):
+    """Create the full-text index for a polls table and keep it in sync
+
+    SQLite gets an external-content FTS5 table maintained by triggers,
+    PostgreSQL gets a generated tsvector column with a GIN index. Both are
+    idempotent, so this can run on every startup next to create_all().
+    """
+    dialect = engine.dialect.name
+    fts = _fts_table(table)
+
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            if not _sqlite_has_fts5(conn):
+                logger.warning("SQLite was built without FTS5, poll search will fall back to LIKE")
+                return
+            if _has_table(conn, fts):
+                return
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                f"title, description, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, coalesce(new.description, '')); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, coalesce(old.description, '')); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, coalesce(old.description, '')); "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, coalesce(new.description, '')); END"
+            ))
+            # Index polls that existed before the FTS table did
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            logger.info(f"Created FTS5 search index {fts}")
+
+        elif dialect == "postgresql":
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+                f") STORED"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector "
+                f"ON {table} USING GIN (search_vector)"
+            ))
+
+        else:
+            logger.warning(f"No full-text index support for {dialect}, poll search will fall back to LIKE")
+
+def search_poll_ids(conn, q: str, table: str = "polls", limit: int = 20, offset: int = 0) -> List[int]:
+    """Return ids of active polls matching q, best match first"""
+    terms = tokenize_query(q)
+    if not terms:
+        return []
+
+    dialect = conn.dialect.name
+    fts = _fts_table(table)
+    params = {"limit": limit, "offset": offset}
+
+    if dialect == "sqlite" and _has_table(conn, fts):
+        sql = (
+            f"SELECT p.id FROM {fts} JOIN {table} p ON p.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :match AND p.is_active = 1 "
+            f"ORDER BY bm25({fts}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}), p.id DESC "
+            f"LIMIT :limit OFFSET :offset"
+        )
+        params["match"] = build_sqlite_match(terms)
+    elif dialect == "postgresql":
+        sql = (
+            f"SELECT id FROM {table}, to_tsquery('english', :tsquery) query "
+            f"WHERE search_vector @@ query AND is_active "
+            f"ORDER BY ts_rank_cd(search_vector, query) DESC, id DESC "
+            f"LIMIT :limit OFFSET :offset"
+        )
+        params["tsquery"] = build_postgres_tsquery(terms)
+    else:
+        # Unindexed fallback, only used when no text index could be built
+        clauses = []
+        for i, term in enumerate(terms):
+            params[f"term{i}"] = f"%{term}%"
+            clauses.append(f"(lower(title) LIKE :term{i} OR lower(coalesce(description, '')) LIKE :term{i})")
+        sql = (
+            f"SELECT id FROM {table} WHERE is_active = :active AND {' AND '.join(clauses)} "
+            f"ORDER BY id DESC LIMIT :limit OFFSET :offset"
+        )
+        params["active"] = True
+
+    return list(conn.execute(text(sql), params).scalars())
@@ -0,0 +1,35 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+# orjson is several times faster than the stdlib encoder and handles
+# datetimes natively; the stdlib path keeps things working without it.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj) -> bytes:
+        """Encode trusted, already-shaped data (dicts, lists, datetimes) to JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    BACKEND = "json"
+
+    def dumps(obj) -> bytes:
+        """Encode trusted, already-shaped data (dicts, lists, datetimes) to JSON bytes"""
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
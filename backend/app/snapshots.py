@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Closed polls never change again, so clients and CDNs may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SNAPSHOT_CACHE_SIZE = 1024
+
+class FrozenResults:
+    """Serialized final results of a closed poll plus their strong ETag"""
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+class SnapshotCache:
+    """Bounded LRU of frozen results keyed by poll id
+
+    Snapshots are immutable, so entries never need invalidating; the bound
+    only keeps memory flat when many polls are archived.
+    """
+
+    def __init__(self, maxsize: int = SNAPSHOT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, FrozenResults]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, poll_id: int) -> Optional[FrozenResults]:
+        with self._lock:
+            frozen = self._entries.get(poll_id)
+            if frozen is not None:
+                self._entries.move_to_end(poll_id)
+            return frozen
+
+    def put(self, poll_id: int, frozen: FrozenResults):
+        with self._lock:
+            self._entries[poll_id] = frozen
+            self._entries.move_to_end(poll_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+snapshot_cache = SnapshotCache()
@@ -0,0 +1,144 @@
+"""
+Opt-in per-request SQL profiling and slow-query log.
+
+Enable with SQL_PROFILING=1. Every statement is then recorded with its
+text, parameter shape (types only, never values), duration and the route
+that issued it. Statements slower than SLOW_QUERY_MS are written to the
+"slow_query" logger (and to SLOW_QUERY_LOG if set), and the last
+PROFILE_HISTORY request breakdowns can be fetched by id.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+ENABLED = os.getenv("SQL_PROFILING", "").lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "200"))
+
+PROFILE_ID_HEADER = "X-Query-Profile-Id"
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_TIME_HEADER = "X-Query-Time-Ms"
+
+slow_query_logger = logging.getLogger("slow_query")
+if ENABLED and SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(_handler)
+
+def parameters_shape(parameters, executemany: bool = False):
+    """Describe bound parameters by type so profiles never hold user data"""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters \
+            and isinstance(parameters[0], (dict, list, tuple)):
+        return {"rows": len(parameters), "row": parameters_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None if parameters is None else type(parameters).__name__
+
+class QueryRecord:
+    __slots__ = ("statement", "parameters", "duration_ms")
+
+    def __init__(self, statement: str, parameters, duration_ms: float):
+        self.statement = statement
+        self.parameters = parameters
+        self.duration_ms = duration_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "parameters": self.parameters,
+            "duration_ms": round(self.duration_ms, 3)
+        }
+
+class RequestProfile:
+    __slots__ = ("id", "method", "route", "queries", "started")
+
+    def __init__(self, method: str, route: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.route = route
+        self.queries: List[QueryRecord] = []
+        self.started = time.time()
+
+    @property
+    def total_ms(self) -> float:
+        return sum(query.duration_ms for query in self.queries)
+
+    def to_dict(self) -> dict:
+        # Slowest statements first, which is what you look at when profiling
+        queries = sorted(self.queries, key=lambda query: query.duration_ms, reverse=True)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "query_count": len(self.queries),
+            "total_ms": round(self.total_ms, 3),
+            "queries": [query.to_dict() for query in queries]
+        }
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+_history: "OrderedDict[str, RequestProfile]" = OrderedDict()
+_history_lock = threading.Lock()
+
+def start_profile(method: str, route: str) -> RequestProfile:
+    profile = RequestProfile(method, route)
+    _current_profile.set(profile)
+    return profile
+
+def finish_profile(profile: RequestProfile, route: Optional[str] = None):
+    """Store a finished request; route can be refined once routing has happened"""
+    if route:
+        profile.route = route
+    _current_profile.set(None)
+    with _history_lock:
+        _history[profile.id] = profile
+        while len(_history) > PROFILE_HISTORY:
+            _history.popitem(last=False)
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    with _history_lock:
+        profile = _history.get(profile_id)
+    return profile.to_dict() if profile else None
+
+def response_headers(profile: RequestProfile) -> dict:
+    return {
+        PROFILE_ID_HEADER: profile.id,
+        QUERY_COUNT_HEADER: str(len(profile.queries)),
+        QUERY_TIME_HEADER: f"{profile.total_ms:.3f}"
+    }
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profiler_query_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile = _current_profile.get()
+
+    record = QueryRecord(" ".join(statement.split()), parameters_shape(parameters, executemany), duration_ms)
+    if profile is not None:
+        profile.queries.append(record)
+
+    if duration_ms >= SLOW_QUERY_MS:
+        route = f"{profile.method} {profile.route}" if profile else "background"
+        slow_query_logger.warning(
+            f"slow query {duration_ms:.1f}ms route={route} params={record.parameters} sql={record.statement}"
+        )
+
+def attach(engine):
+    """Install the profiling hooks on engine when SQL_PROFILING is enabled"""
+    if not ENABLED or event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,239 @@
+"""
+Server-Sent Events stream of one poll's updates.
+
+GET /api/polls/{poll_id}/stream carries the same events as the WebSocket and
+Socket.IO broadcasts (poll_vote, poll_like, poll_updated, poll_closed) for a
+single poll, over plain HTTP: it passes proxies that block upgrades, needs
+no client library and the browser's EventSource reconnects by itself.
+
+Every poll with listeners or recent events has one PollStream. Each event is
+encoded into an SSE frame once, kept in a ring buffer of SSE_REPLAY_EVENTS
+frames and wakes all of the poll's listeners through one shared waiter
+(an asyncio.Event for FastAPI, a condition variable for Flask/gevent),
+which also carries the keepalive comment every REALTIME_PING_INTERVAL. A connection
+holds only the sequence number it has sent up to, so its cost is the
+response generator and that number.
+
+Event ids are "<epoch>-<seq>": epoch identifies this worker process and seq
+increases across all polls. A client that reconnects with Last-Event-ID (or
+?last_event_id=, for clients that cannot set headers) gets the frames it
+missed. When they are no longer buffered, or the id comes from another
+worker or a restarted one, it gets a `resync` event instead and should
+reload GET /api/polls/{poll_id}. The stream ends after poll_closed.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from app.heartbeat import PING_INTERVAL
+from app.metrics import BROADCAST_FANOUT, REALTIME_CONNECTIONS
+from app.serialization import dumps
+
+REPLAY_EVENTS = int(os.getenv("SSE_REPLAY_EVENTS", "100"))
+MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "10000"))
+RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
+MEDIA_TYPE = "text/event-stream"
+CLOSED_EVENT = "poll_closed"
+RESYNC_EVENT = "resync"
+KEEPALIVE = b": ping\n\n"
+# Disables response buffering in nginx and similar proxies
+HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def encode_frame(event_id: str, event: str, data: dict) -> bytes:
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), event.encode(), dumps(data))
+
+class PollStream:
+    """Buffered frames and listeners of one poll"""
+    __slots__ = ("poll_id", "frames", "floor", "closed_seq", "listeners", "_event", "_timer", "_condition")
+
+    def __init__(self, poll_id: int, seq: int, replay_events: int):
+        self.poll_id = poll_id
+        # (seq, frame) pairs, oldest first
+        self.frames = deque(maxlen=replay_events)
+        # Every event after floor is still in frames
+        self.floor = seq
+        self.closed_seq: Optional[int] = None
+        self.listeners = 0
+        self._event: Optional[asyncio.Event] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._condition: Optional[threading.Condition] = None
+
+    def append(self, seq: int, frame: bytes):
+        if len(self.frames) == self.frames.maxlen:
+            self.floor = self.frames[0][0]
+        self.frames.append((seq, frame))
+
+    def after(self, seq: int) -> List[bytes]:
+        return [frame for frame_seq, frame in self.frames if frame_seq > seq]
+
+    @property
+    def last_seq(self) -> int:
+        return self.frames[-1][0] if self.frames else self.floor
+
+    def wake(self):
+        if self._event is not None:
+            self._timer.cancel()
+            self._event.set()
+            self._event = None
+        if self._condition is not None:
+            with self._condition:
+                self._condition.notify_all()
+
+    def async_waiter(self) -> asyncio.Event:
+        # Replaced on every wake, so one set() releases exactly the current waiters.
+        # One timer per poll wakes them all for the keepalive, instead of a
+        # timeout per connection.
+        if self._event is None:
+            self._event = asyncio.Event()
+            self._timer = asyncio.get_running_loop().call_later(PING_INTERVAL, self.wake)
+        return self._event
+
+    def condition(self) -> threading.Condition:
+        # Created on first use, after gevent has patched threading
+        if self._condition is None:
+            self._condition = threading.Condition()
+        return self._condition
+
+class Subscription:
+    """One open stream: the poll and the last event sent to it"""
+    __slots__ = ("stream", "seq", "transport")
+
+    def __init__(self, stream: PollStream, seq: int, transport: str):
+        self.stream = stream
+        self.seq = seq
+        self.transport = transport
+
+    @property
+    def finished(self) -> bool:
+        closed_seq = self.stream.closed_seq
+        return closed_seq is not None and self.seq >= closed_seq
+
+class StreamHub:
+    def __init__(self, replay_events: int = REPLAY_EVENTS, max_streams: int = MAX_STREAMS):
+        self.replay_events = replay_events
+        self.max_streams = max_streams
+        self.epoch = format(time.time_ns() // 1000, "x")
+        self.seq = 0
+        self._streams: "OrderedDict[int, PollStream]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._streams)
+
+    def _stream(self, poll_id: int) -> PollStream:
+        stream = self._streams.get(poll_id)
+        if stream is None:
+            stream = self._streams[poll_id] = PollStream(poll_id, self.seq, self.replay_events)
+            self._evict()
+        else:
+            self._streams.move_to_end(poll_id)
+        return stream
+
+    def _evict(self):
+        # Least recently used first; polls with open streams are kept
+        excess = len(self._streams) - self.max_streams
+        if excess <= 0:
+            return
+        for poll_id in [poll_id for poll_id, stream in self._streams.items() if not stream.listeners][:excess]:
+            del self._streams[poll_id]
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def parse_event_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence number of an id issued by this process, else None"""
+        epoch, _, seq = (last_event_id or "").strip().partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, poll_id: int, event: str, data: dict):
+        """Record an update and wake the poll's listeners"""
+        with self._lock:
+            stream = self._stream(poll_id)
+            self.seq += 1
+            stream.append(self.seq, encode_frame(self._event_id(self.seq), event, data))
+            if event == CLOSED_EVENT:
+                stream.closed_seq = self.seq
+            listeners = stream.listeners
+        if listeners:
+            BROADCAST_FANOUT.observe(listeners, transport="sse")
+        stream.wake()
+
+    def subscribe(self, poll_id: int, last_event_id: Optional[str] = None,
+                  transport: str = "sse") -> Tuple[Subscription, List[bytes]]:
+        """Open a stream; returns it with the frames to send first"""
+        with self._lock:
+            stream = self._stream(poll_id)
+            stream.listeners += 1
+            current = stream.last_seq
+            subscription = Subscription(stream, current, transport)
+            initial = [b"retry: %d\n\n" % RETRY_MS]
+            if last_event_id:
+                seq = self.parse_event_id(last_event_id)
+                if seq is not None and stream.floor <= seq <= self.seq:
+                    initial.extend(stream.after(seq))
+                else:
+                    initial.append(encode_frame(self._event_id(current), RESYNC_EVENT, {"poll_id": poll_id}))
+        REALTIME_CONNECTIONS.inc(transport=transport)
+        return subscription, initial
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscription.stream.listeners -= 1
+        REALTIME_CONNECTIONS.dec(transport=subscription.transport)
+
+    def has_replay(self, poll_id: int, last_event_id: Optional[str]) -> bool:
+        """Whether a reconnect can still be served the poll's final frames"""
+        stream = self._streams.get(poll_id)
+        seq = self.parse_event_id(last_event_id)
+        return (stream is not None and stream.closed_seq is not None
+                and seq is not None and stream.floor <= seq < stream.closed_seq)
+
+    def _pending(self, subscription: Subscription) -> List[bytes]:
+        frames = subscription.stream.after(subscription.seq)
+        if frames:
+            subscription.seq = subscription.stream.last_seq
+        return frames
+
+    async def next_frames(self, subscription: Subscription) -> List[bytes]:
+        """Frames published since the last call; empty when woken for the keepalive"""
+        frames = self._pending(subscription)
+        if frames:
+            return frames
+        await subscription.stream.async_waiter().wait()
+        return self._pending(subscription)
+
+    def wait_frames(self, subscription: Subscription, timeout: float = PING_INTERVAL) -> List[bytes]:
+        """Blocking next_frames, for threads and greenlets"""
+        stream = subscription.stream
+        condition = stream.condition()
+        with condition:
+            condition.wait_for(lambda: stream.last_seq > subscription.seq, timeout)
+        return self._pending(subscription)
+
+    async def aiter_frames(self, subscription: Subscription, initial: List[bytes]) -> AsyncIterator[bytes]:
+        """The response body of an open stream (asyncio)"""
+        try:
+            yield b"".join(initial)
+            while not subscription.finished:
+                frames = await self.next_frames(subscription)
+                yield b"".join(frames) if frames else KEEPALIVE
+        finally:
+            self.unsubscribe(subscription)
+
+    def iter_frames(self, subscription: Subscription, initial: List[bytes]) -> Iterator[bytes]:
+        """The response body of an open stream (threads/gevent)"""
+        try:
+            yield b"".join(initial)
+            while not subscription.finished:
+                frames = self.wait_frames(subscription)
+                yield b"".join(frames) if frames else KEEPALIVE
+        finally:
+            self.unsubscribe(subscription)
+
+hub = StreamHub()
@@ -0,0 +1,220 @@
+"""
+Ballots of multi-choice and ranked-choice polls, and their tallies.
+
+Polls have a poll_type: "single" (one option per voter, POST /vote, counted
+in poll_options.vote_count as before), "multiple" (approve any number of
+options) or "ranked" (order any number of options by preference). The
+latter two take ballots through POST /api/polls/{id}/ballot: one row per
+voter holding the chosen option ids as a packed int32 array, replaced when
+the voter changes it. Ballot writes still keep the counters of the poll
+detail up to date: total_votes counts ballots, vote_count counts approvals
+of multiple-choice options and first preferences of ranked ones.
+
+GET /api/polls/{id}/results computes the full result from all of a poll's
+ballots at once. The packed arrays are joined into one ballots x ranks
+matrix of option indexes (-1 padded), then:
+
+- multiple: approvals are one bincount over the matrix;
+- ranked: instant runoff. Each round is a bincount of every ballot's
+  current choice; the option with the fewest votes is eliminated (ties go
+  to the option with fewer first preferences, then the later one) and only
+  the ballots that were on it move to their next continuing choice, so a
+  round costs O(ballots moved), not O(ballots x ranks). A ballot with no
+  continuing choice left is exhausted. An option wins with more than half
+  of the non-exhausted ballots, or as the last one standing.
+
+Results are cached per poll (TALLY_CACHE_POLLS) until the poll's version
+moves, i.e. until a ballot, like or edit. Tally time is exported on
+/metrics (tally_seconds); benchmarks/bench_tally.py times 1M ballots.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app import metrics
+
+SINGLE = "single"
+MULTIPLE = "multiple"
+RANKED = "ranked"
+POLL_TYPES = (SINGLE, MULTIPLE, RANKED)
+BALLOT_TYPES = (MULTIPLE, RANKED)
+
+CACHE_POLLS = int(os.getenv("TALLY_CACHE_POLLS", "1000"))
+
+# Packed ballot: option ids in preference order, little-endian int32
+CHOICE_DTYPE = np.dtype("<i4")
+
+TALLY_SECONDS = metrics.registry.histogram(
+    "tally_seconds", "Time to load and tally a poll's ballots", ["poll_type"]
+)
+
+def encode_choices(option_ids: Sequence[int]) -> bytes:
+    return np.asarray(option_ids, dtype=CHOICE_DTYPE).tobytes()
+
+def decode_choices(blob: bytes) -> List[int]:
+    return np.frombuffer(blob, dtype=CHOICE_DTYPE).tolist()
+
+def validate_ballot(poll_type: str, option_ids, poll_option_ids: Sequence[int]) -> List[int]:
+    """The ballot's option ids; raises ValueError with a client-facing message"""
+    if poll_type not in BALLOT_TYPES:
+        raise ValueError("Single-choice polls take votes, not ballots")
+    if not isinstance(option_ids, list) or not option_ids:
+        raise ValueError("option_ids must be a non-empty list")
+    if len(set(option_ids)) != len(option_ids):
+        raise ValueError("option_ids must not repeat an option")
+    allowed = set(poll_option_ids)
+    if any(option_id not in allowed for option_id in option_ids):
+        raise ValueError("option_ids must be options of this poll")
+    return option_ids
+
+def counted_options(poll_type: str, option_ids: Sequence[int]) -> Sequence[int]:
+    """Options whose vote_count a ballot adds to: every approval, or the first preference"""
+    if poll_type == RANKED:
+        return option_ids[:1]
+    return option_ids
+
+def counter_deltas(poll_type: str, previous: Optional[Sequence[int]], option_ids: Sequence[int]) -> Dict[int, int]:
+    """option_id -> vote_count change for replacing previous (None for a new ballot) with option_ids"""
+    deltas: Dict[int, int] = {}
+    for option_id in counted_options(poll_type, previous or ()):
+        deltas[option_id] = deltas.get(option_id, 0) - 1
+    for option_id in counted_options(poll_type, option_ids):
+        deltas[option_id] = deltas.get(option_id, 0) + 1
+    return {option_id: delta for option_id, delta in deltas.items() if delta}
+
+def ballot_matrix(blobs: Sequence[bytes], option_ids: Sequence[int]) -> np.ndarray:
+    """ballots x ranks matrix of indexes into option_ids (sorted), -1 padded"""
+    option_ids = np.asarray(option_ids, dtype=np.int64)
+    count = len(blobs)
+    lengths = np.fromiter((len(blob) for blob in blobs), dtype=np.intp, count=count) // CHOICE_DTYPE.itemsize
+    choices = np.frombuffer(b"".join(blobs), dtype=CHOICE_DTYPE)
+    rows = np.repeat(np.arange(count), lengths)
+    index = np.minimum(np.searchsorted(option_ids, choices), max(len(option_ids) - 1, 0))
+    # Ids that are not options of the poll are left out; later choices move up
+    known = option_ids[index] == choices if len(option_ids) else np.zeros(choices.size, dtype=bool)
+    rows, index = rows[known], index[known]
+    lengths = np.bincount(rows, minlength=count)
+    depth = int(lengths.max()) if count else 0
+    matrix = np.full((count, depth), -1, dtype=np.int16)
+    if not depth:
+        return matrix
+    columns = np.arange(rows.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix[rows, columns] = index
+    return matrix
+
+def approval_counts(matrix: np.ndarray, option_count: int) -> np.ndarray:
+    return np.bincount(matrix[matrix >= 0], minlength=option_count)
+
+def option_counters(poll_type: str, blobs: Sequence[bytes], option_ids: Sequence[int]) -> List[int]:
+    """vote_count of each option (sorted ids) as ballot writes keep it: approvals, or first preferences"""
+    matrix = ballot_matrix(blobs, option_ids)
+    if poll_type == RANKED:
+        matrix = matrix[:, :1]
+    return approval_counts(matrix, len(option_ids)).tolist()
+
+def instant_runoff(matrix: np.ndarray, option_count: int):
+    """(rounds, winner index or None); each round is (counts per option, exhausted
+    ballots, eliminated index or None), counts being -1 for options already out"""
+    ballots, depth = matrix.shape
+    # Index option_count stands for "no choice left"; it is never eliminated
+    ranks = np.where(matrix < 0, option_count, matrix).astype(np.intp)
+    eliminated = np.zeros(option_count + 1, dtype=bool)
+    position = np.zeros(ballots, dtype=np.intp)
+    current = ranks[:, 0].copy() if depth else np.full(ballots, option_count, dtype=np.intp)
+    first_preferences = None
+    rounds = []
+    while True:
+        tally = np.bincount(current, minlength=option_count + 1)
+        counts, exhausted = tally[:option_count], int(tally[option_count])
+        if first_preferences is None:
+            first_preferences = counts.copy()
+        continuing = np.flatnonzero(~eliminated[:option_count])
+        shown = np.where(eliminated[:option_count], -1, counts)
+        active = ballots - exhausted
+        leader = continuing[np.argmax(counts[continuing])] if continuing.size else None
+        if leader is None or active == 0:
+            rounds.append((shown, exhausted, None))
+            return rounds, None
+        if counts[leader] * 2 > active or continuing.size == 1:
+            rounds.append((shown, exhausted, None))
+            return rounds, int(leader)
+
+        # Fewest votes, then fewest first preferences, then the later option
+        order = np.lexsort((-continuing, first_preferences[continuing], counts[continuing]))
+        loser = int(continuing[order[0]])
+        eliminated[loser] = True
+        rounds.append((shown, exhausted, loser))
+
+        moving = np.flatnonzero(current == loser)
+        while moving.size:
+            position[moving] += 1
+            ended = position[moving] >= depth
+            current[moving[ended]] = option_count
+            moving = moving[~ended]
+            current[moving] = ranks[moving, position[moving]]
+            moving = moving[eliminated[current[moving]]]
+
+class TallyCache:
+    """poll_id -> (version, result) for the most recently tallied polls"""
+
+    def __init__(self, max_polls: int = CACHE_POLLS):
+        self.max_polls = max_polls
+        self._entries: Dict[int, Tuple[int, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, poll_id: int, version: int, compute: Callable[[], dict]) -> dict:
+        entry = self._entries.get(poll_id)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        result = compute()
+        with self._lock:
+            if len(self._entries) >= self.max_polls and poll_id not in self._entries:
+                self._entries.clear()
+            self._entries[poll_id] = (version, result)
+        return result
+
+cache = TallyCache()
+
+def load_ballots(session, ballots, poll_id: int) -> List[bytes]:
+    return session.execute(select(ballots.c.choices).where(ballots.c.poll_id == poll_id)).scalars().all()
+
+def _results(poll_id: int, poll_type: str, options: Sequence[Tuple[int, str]], blobs: Sequence[bytes]) -> dict:
+    options = sorted(options)
+    option_ids = [option_id for option_id, _ in options]
+    matrix = ballot_matrix(blobs, option_ids)
+    result = {"poll_id": poll_id, "poll_type": poll_type, "total_ballots": len(blobs)}
+    if poll_type == MULTIPLE:
+        counts = approval_counts(matrix, len(options)).tolist()
+        result["options"] = [{"option_id": option_id, "option_text": text, "votes": count}
+                             for (option_id, text), count in zip(options, counts)]
+        return result
+
+    rounds, winner = instant_runoff(matrix, len(options))
+    first = rounds[0][0].tolist()
+    result["options"] = [{"option_id": option_id, "option_text": text, "votes": count}
+                         for (option_id, text), count in zip(options, first)]
+    result["rounds"] = [{
+        "round": number,
+        "counts": {option_ids[index]: count for index, count in enumerate(counts.tolist()) if count >= 0},
+        "exhausted": exhausted,
+        "eliminated": option_ids[loser] if loser is not None else None
+    } for number, (counts, exhausted, loser) in enumerate(rounds, start=1)]
+    result["winner"] = option_ids[winner] if winner is not None else None
+    return result
+
+def ballot_results(session, ballots, poll_id: int, poll_type: str, options: Sequence[Tuple[int, str]],
+                   version: int) -> dict:
+    """Results of a multiple- or ranked-choice poll from all of its ballots, cached by poll version
+
+    options are (option_id, option_text) pairs.
+    """
+    def compute():
+        start = time.perf_counter()
+        result = _results(poll_id, poll_type, options, load_ballots(session, ballots, poll_id))
+        TALLY_SECONDS.observe(time.perf_counter() - start, poll_type=poll_type)
+        return result
+    return cache.get(poll_id, version, compute)
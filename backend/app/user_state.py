@@ -0,0 +1,124 @@
+"""
+The requesting user's own state (vote, ballot, like) on many polls at once.
+
+Rendering "you voted / you liked" on a feed page used to take one detail
+request per poll. GET /api/me/poll-state?poll_ids=1,2,3 answers for up to
+MAX_POLL_IDS polls with one statement: a UNION ALL over votes, ballots and
+likes, each served by its unique (user_id, poll_id) index. Ballots of
+multiple- and ranked-choice polls are answered as ballot_option_ids, their
+decoded choices in preference order.
+
+Answers are cached per user for POLL_STATE_CACHE_TTL seconds, including
+"no vote, no like", which is most of them. The user's own votes, ballots
+and likes invalidate their entry in this process; a write handled by another worker
+is visible here after at most the TTL.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import cast, literal, null, select, union_all
+
+from app.tally import decode_choices
+
+MAX_POLL_IDS = int(os.getenv("POLL_STATE_MAX_IDS", "200"))
+CACHE_TTL_SECONDS = float(os.getenv("POLL_STATE_CACHE_TTL", "5"))
+MAX_CACHED_USERS = 10_000
+
+# Per-user answers must not be stored by shared caches
+CACHE_CONTROL = "private, no-cache"
+
+def parse_poll_ids(raw: Optional[str]) -> List[int]:
+    """Comma-separated poll ids, de-duplicated in request order
+
+    Raises ValueError with a client-facing message.
+    """
+    poll_ids = []
+    seen = set()
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError("poll_ids must be a comma-separated list of poll ids")
+        poll_id = int(part)
+        if poll_id not in seen:
+            seen.add(poll_id)
+            poll_ids.append(poll_id)
+    if len(poll_ids) > MAX_POLL_IDS:
+        raise ValueError(f"At most {MAX_POLL_IDS} poll_ids per request")
+    return poll_ids
+
+def empty_state(poll_id: int) -> dict:
+    return {"poll_id": poll_id, "voted_option_id": None, "ballot_option_ids": None, "liked": False}
+
+def state_statement(votes, ballots, likes, user_id: int, poll_ids: Iterable[int]):
+    """(poll_id, option_id, choices, liked) rows of one user's votes, ballots and likes on poll_ids"""
+    poll_ids = list(poll_ids)
+    no_choices = cast(null(), ballots.c.choices.type)
+    return union_all(
+        select(votes.c.poll_id, votes.c.option_id, no_choices.label("choices"), literal(False).label("liked"))
+        .where(votes.c.user_id == user_id, votes.c.poll_id.in_(poll_ids)),
+        select(ballots.c.poll_id, null(), ballots.c.choices, literal(False))
+        .where(ballots.c.user_id == user_id, ballots.c.poll_id.in_(poll_ids)),
+        select(likes.c.poll_id, null(), no_choices, literal(True))
+        .where(likes.c.user_id == user_id, likes.c.poll_id.in_(poll_ids))
+    )
+
+def load_states(session, votes, ballots, likes, user_id: int, poll_ids: Iterable[int]) -> Dict[int, dict]:
+    poll_ids = list(poll_ids)
+    states = {poll_id: empty_state(poll_id) for poll_id in poll_ids}
+    statement = state_statement(votes, ballots, likes, user_id, poll_ids)
+    for poll_id, option_id, choices, liked in session.execute(statement):
+        if liked:
+            states[poll_id]["liked"] = True
+        elif choices is not None:
+            states[poll_id]["ballot_option_ids"] = decode_choices(choices)
+        else:
+            states[poll_id]["voted_option_id"] = option_id
+    return states
+
+class PollStateCache:
+    """user_id -> {poll_id: state}; each user's entries expire together"""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._users: Dict[int, tuple] = {}
+        # Bumped by every invalidation, so a load racing a write is not stored
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, poll_ids: List[int],
+            loader: Callable[[List[int]], Dict[int, dict]]) -> List[dict]:
+        """States for poll_ids in order; loader(missing_ids) runs only for uncached polls"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            cached = dict(entry[1]) if entry and entry[0] > now else {}
+            writes = self._writes
+        missing = [poll_id for poll_id in poll_ids if poll_id not in cached]
+        if missing:
+            loaded = loader(missing)
+            cached.update(loaded)
+            with self._lock:
+                if writes != self._writes:
+                    return [cached[poll_id] for poll_id in poll_ids]
+                entry = self._users.get(user_id)
+                if entry and entry[0] > now:
+                    entry[1].update(loaded)
+                else:
+                    if len(self._users) >= MAX_CACHED_USERS:
+                        self._users.clear()
+                    self._users[user_id] = (now + self.ttl, loaded)
+        return [cached[poll_id] for poll_id in poll_ids]
+
+    def invalidate(self, user_id: int, poll_id: int):
+        """Drop one poll from a user's entry after they vote, like or unlike it"""
+        with self._lock:
+            self._writes += 1
+            entry = self._users.get(user_id)
+            if entry:
+                entry[1].pop(poll_id, None)
+
+cache = PollStateCache()
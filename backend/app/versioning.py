@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# Versions learned from the database are trusted for this long. Writes made
+# by this process update the cache immediately; the TTL bounds how stale a
+# 304 can be when another worker process made the write.
+VERSION_TTL_SECONDS = 1.0
+MAX_TRACKED_POLLS = 100_000
+
+# Live responses may be stored but must be revalidated with their ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+def poll_etag(poll_id: int, version: int) -> str:
+    return f'W/"poll-{poll_id}-v{version}"'
+
+def feed_etag(version: int) -> str:
+    return f'W/"feed-v{version}"'
+
+class VersionRegistry:
+    """Short-lived cache of per-poll and feed version counters
+
+    Every write to a poll bumps polls.version in the same transaction. The
+    feed version is the sum of all poll versions, so it moves whenever any
+    poll is created, voted on, liked or updated.
+    """
+
+    def __init__(self, ttl: float = VERSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._polls: Dict[int, Tuple[int, float]] = {}
+        self._feed: Optional[Tuple[int, float]] = None
+        self._lock = threading.Lock()
+
+    def poll_version(self, poll_id: int, loader: Callable[[], Optional[int]]) -> Optional[int]:
+        """Current version of a live poll; loader reads it from the DB on a miss"""
+        now = time.monotonic()
+        entry = self._polls.get(poll_id)
+        if entry and entry[1] > now:
+            return entry[0]
+
+        version = loader()
+        if version is None:
+            self._polls.pop(poll_id, None)
+            return None
+        self._store_poll(poll_id, version, now)
+        return version
+
+    def feed_version(self, loader: Callable[[], int]) -> int:
+        now = time.monotonic()
+        entry = self._feed
+        if entry and entry[1] > now:
+            return entry[0]
+
+        version = int(loader() or 0)
+        self._feed = (version, now + self.ttl)
+        return version
+
+    def record_write(self, poll_id: int, version: Optional[int] = None):
+        """Note a committed write; pass the new version when it is known"""
+        with self._lock:
+            if version is None:
+                self._polls.pop(poll_id, None)
+            else:
+                self._store_poll(poll_id, version, time.monotonic())
+            self._feed = None
+
+    def invalidate_feed(self):
+        """Note new polls whose versions need not be tracked, e.g. a bulk import"""
+        self._feed = None
+
+    def _store_poll(self, poll_id: int, version: int, now: float):
+        if len(self._polls) >= MAX_TRACKED_POLLS and poll_id not in self._polls:
+            self._polls.clear()
+        self._polls[poll_id] = (version, now + self.ttl)
+
+versions = VersionRegistry()
@@ -1,35 +1,196 @@
-import json
-from typing import List, Dict
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set
 from fastapi import WebSocket
 from app.schemas import WSMessage
+from app.serialization import dumps
+from app.heartbeat import IDLE_TIMEOUT, PING_INTERVAL
+from app import fanout, realtime_snapshot, sse
+from app.metrics import BROADCAST_FANOUT, BROADCAST_SECONDS, REALTIME_CONNECTIONS, REALTIME_REAPED
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("text", "binary")
+
+class Connection:
+    """One connected client; slots keep the per-socket footprint small at 10k+ sockets"""
+    __slots__ = ("websocket", "subscriptions", "connected_at", "last_seen", "encoding")
+
+    def __init__(self, websocket: WebSocket, encoding: str = "text"):
+        now = time.monotonic()
+        self.websocket = websocket
+        # None means every poll; otherwise the poll ids this client follows
+        self.subscriptions: Optional[Set[int]] = None
+        self.connected_at = now
+        self.last_seen = now
+        self.encoding = encoding
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    async def send(self, text: str, payload: bytes):
+        if self.encoding == "binary":
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(text)
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Keyed by id(websocket): O(1) connect/disconnect regardless of count
+        self.connections: Dict[int, Connection] = {}
+        # Clients following every poll, and per-poll subscribers
+        self._firehose: Dict[int, Connection] = {}
+        self._subscribers: Dict[int, Dict[int, Connection]] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        REALTIME_CONNECTIONS.set(0, transport="websocket")
+
+    def __len__(self):
+        return len(self.connections)
 
-    async def connect(self, websocket: WebSocket):
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return [connection.websocket for connection in self.connections.values()]
+
+    async def connect(self, websocket: WebSocket, encoding: str = "text") -> Connection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._run_heartbeat())
+        return self.register(websocket, encoding)
+
+    def register(self, websocket: WebSocket, encoding: str = "text") -> Connection:
+        key = id(websocket)
+        connection = Connection(websocket, encoding if encoding in ENCODINGS else "text")
+        self.connections[key] = connection
+        self._firehose[key] = connection
+        REALTIME_CONNECTIONS.set(len(self.connections), transport="websocket")
+        return connection
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        """Forget a socket; safe to call twice or for sockets already dropped by a broadcast"""
+        key = id(websocket)
+        connection = self.connections.pop(key, None)
+        if connection is None:
+            return
+        self._firehose.pop(key, None)
+        for poll_id in connection.subscriptions or ():
+            self._unsubscribe_key(key, poll_id)
+        REALTIME_CONNECTIONS.set(len(self.connections), transport="websocket")
+
+    def get(self, websocket: WebSocket) -> Optional[Connection]:
+        return self.connections.get(id(websocket))
+
+    def subscribe(self, websocket: WebSocket, poll_ids: Iterable[int]):
+        """Switch a connection from every poll to the given polls (cumulative)"""
+        key = id(websocket)
+        connection = self.connections.get(key)
+        if connection is None:
+            return
+        if connection.subscriptions is None:
+            connection.subscriptions = set()
+            self._firehose.pop(key, None)
+        for poll_id in poll_ids:
+            connection.subscriptions.add(poll_id)
+            self._subscribers.setdefault(poll_id, {})[key] = connection
+
+    def unsubscribe(self, websocket: WebSocket, poll_ids: Iterable[int]):
+        key = id(websocket)
+        connection = self.connections.get(key)
+        if connection is None or connection.subscriptions is None:
+            return
+        for poll_id in poll_ids:
+            connection.subscriptions.discard(poll_id)
+            self._unsubscribe_key(key, poll_id)
+
+    def _unsubscribe_key(self, key: int, poll_id: int):
+        subscribers = self._subscribers.get(poll_id)
+        if subscribers is not None:
+            subscribers.pop(key, None)
+            if not subscribers:
+                del self._subscribers[poll_id]
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, message: WSMessage):
-        message_data = message.model_dump()
-        for connection in self.active_connections:
+    async def _send_all(self, connections: List[Connection], message: WSMessage, observe: bool = True):
+        # Serialize once for every recipient
+        payload = dumps(message.model_dump())
+        text = payload.decode("utf-8")
+        start = time.perf_counter()
+        failed = []
+        for connection in connections:
             try:
-                await connection.send_text(json.dumps(message_data))
-            except:
-                self.active_connections.remove(connection)
+                await connection.send(text, payload)
+            except Exception:
+                failed.append(connection.websocket)
+        # Removal happens after the loop so no socket is skipped
+        for websocket in failed:
+            self.disconnect(websocket)
+        if failed:
+            REALTIME_REAPED.inc(len(failed), transport="websocket", reason="send_failed")
+        if observe:
+            BROADCAST_FANOUT.observe(len(connections), transport="websocket")
+            BROADCAST_SECONDS.observe(time.perf_counter() - start, transport="websocket")
+
+    async def broadcast(self, message: WSMessage):
+        await self._send_all(list(self.connections.values()), message)
 
-    async def broadcast_poll_update(self, poll_id: int, update_type: str, data: dict):
+    async def broadcast_poll_update(self, poll_id: int, update_type: str, data: dict, relay: bool = True):
+        if relay:
+            # Clients of the other workers get it through app.fanout
+            fanout.bus.publish({"poll_id": poll_id, "type": update_type, "data": data})
         message = WSMessage(
             type=f"poll_{update_type}",
             data={"poll_id": poll_id, **data}
         )
-        await self.broadcast(message)
+        if update_type == "created":
+            # Nobody can have subscribed to a poll that did not exist yet
+            await self.broadcast(message)
+            return
+        # SSE listeners of this poll are woken through the stream hub
+        sse.hub.publish(poll_id, message.type, message.data)
+        recipients = list(self._firehose.values())
+        recipients.extend(self._subscribers.get(poll_id, {}).values())
+        await self._send_all(recipients, message)
+
+    async def deliver_relayed(self, update: dict):
+        """An update broadcast by another worker, for this worker's clients only"""
+        await self.broadcast_poll_update(update["poll_id"], update["type"], update["data"], relay=False)
+
+    async def send_snapshot(self, connection: Connection, data: dict):
+        """Initial state of the polls a client named (app.realtime_snapshot), to that client only"""
+        await self._send_all([connection], WSMessage(type=realtime_snapshot.EVENT, data=data), observe=False)
+
+    async def retire_poll(self, poll_id: int, data: dict):
+        """Send the final state of a closed poll; no updates follow it"""
+        await self.broadcast_poll_update(poll_id, "closed", data)
+
+    async def heartbeat(self):
+        """Reap clients silent for longer than IDLE_TIMEOUT and ping the rest"""
+        now = time.monotonic()
+        idle, alive = [], []
+        for connection in list(self.connections.values()):
+            (idle if now - connection.last_seen > IDLE_TIMEOUT else alive).append(connection)
+
+        for connection in idle:
+            self.disconnect(connection.websocket)
+            try:
+                await connection.websocket.close(code=1001)
+            except Exception:
+                pass
+        if idle:
+            REALTIME_REAPED.inc(len(idle), transport="websocket", reason="idle")
+            logger.info(f"Reaped {len(idle)} idle WebSocket connections")
+
+        if alive:
+            await self._send_all(alive, WSMessage(type="ping", data={"ts": time.time()}), observe=False)
+
+    async def _run_heartbeat(self):
+        while self.connections:
+            await asyncio.sleep(PING_INTERVAL)
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception("WebSocket heartbeat failed")
 
 manager = ConnectionManager()
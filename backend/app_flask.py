@@ -1,14 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
 import os
+import time
 from datetime import datetime, timedelta
 import json
 import jwt
 import bcrypt
 
+from app.search import install_search_index, search_poll_ids
+from app.serialization import dumps as fast_dumps, loads as fast_loads
+from app import admission, counter_shards, group_commit, heartbeat, hot_state, membership, metrics, poll_import, realtime_snapshot, replicas, sampling_profiler, sql_profiler, sse, tally, user_state
+from app.migrations import ensure_column, ensure_unique_index
+from app.snapshots import FrozenResults, IMMUTABLE_CACHE_CONTROL, etag_matches, snapshot_cache
+from app.versioning import REVALIDATE_CACHE_CONTROL, feed_etag, poll_etag, versions
+
 # Monkey patch for gevent compatibility
 try:
     import gevent
@@ -17,7 +28,18 @@ try:
 except ImportError:
     pass
 
+class FastJSONProvider(DefaultJSONProvider):
+    """Encodes jsonify() responses with the fast encoder (orjson when installed)"""
+
+    def dumps(self, obj, **kwargs):
+        return fast_dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(fast_dumps(obj), mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///./opinion_poll.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -26,6 +48,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
 
+# Optional read replica for read-only routes (see app.replicas)
+if replicas.REPLICA_URL:
+    app.config['SQLALCHEMY_BINDS'] = {'replica': replicas.normalize_url(replicas.REPLICA_URL)}
+
 # CORS configuration for production
 cors_origins = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
 CORS(app, origins=cors_origins)
@@ -36,7 +62,8 @@ socketio_cors_origins = os.getenv('SOCKETIO_CORS_ORIGINS', 'http://localhost:300
 async_modes = ['gevent', 'eventlet', 'threading']
 for mode in async_modes:
     try:
-        socketio = SocketIO(app, cors_allowed_origins=socketio_cors_origins, async_mode=mode)
+        socketio = SocketIO(app, cors_allowed_origins=socketio_cors_origins, async_mode=mode,
+                            **heartbeat.engineio_options())
         print(f"Using SocketIO async mode: {mode}")
         break
     except (RuntimeError, ImportError) as e:
@@ -44,9 +71,21 @@ for mode in async_modes:
         continue
 else:
     # Final fallback - disable async mode entirely (uses HTTP polling)
-    socketio = SocketIO(app, cors_allowed_origins=socketio_cors_origins, async_mode=None)
+    socketio = SocketIO(app, cors_allowed_origins=socketio_cors_origins, async_mode=None,
+                        **heartbeat.engineio_options())
 db = SQLAlchemy(app)
 
+metrics.REALTIME_CONNECTIONS.set(0, transport='socketio')
+
+def broadcast_event(event, data):
+    """Emit a real-time update to every connected client and record fan-out"""
+    metrics.BROADCAST_FANOUT.observe(metrics.REALTIME_CONNECTIONS.value(transport='socketio'), transport='socketio')
+    with metrics.BROADCAST_SECONDS.time(transport='socketio'):
+        socketio.emit(event, data)
+    if event != 'poll_created' and 'poll_id' in data:
+        # SSE listeners of this poll are woken through the stream hub
+        sse.hub.publish(data['poll_id'], event, data)
+
 # Models
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -65,6 +104,13 @@ class Poll(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     total_votes = db.Column(db.Integer, default=0)
     total_likes = db.Column(db.Integer, default=0)
+    # Bumped on every vote, like and edit; drives ETags and cache freshness
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # single, multiple or ranked (see app.tally)
+    poll_type = db.Column(db.String(16), nullable=False, default='single', server_default='single')
+
+    creator = db.relationship('User')
+    options = db.relationship('PollOption', order_by='PollOption.id')
 
 class PollOption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -79,22 +125,194 @@ class Vote(db.Model):
     option_id = db.Column(db.Integer, db.ForeignKey('poll_option.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # One vote per user per poll; app.membership relies on it. The second
+    # index serves the grouped counts of app.reconcile
+    __table_args__ = (
+        db.Index('uq_vote_user_poll', 'user_id', 'poll_id', unique=True),
+        db.Index('ix_vote_poll_option', 'poll_id', 'option_id'),
+    )
+
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     poll_id = db.Column(db.Integer, db.ForeignKey('poll.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_like_user_poll', 'user_id', 'poll_id', unique=True),
+        db.Index('ix_like_poll', 'poll_id'),
+    )
+
+class Ballot(db.Model):
+    """A voter's choices on a multiple- or ranked-choice poll, packed by app.tally"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id'), nullable=False, index=True)
+    choices = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index('uq_ballot_user_poll', 'user_id', 'poll_id', unique=True),)
+
+class PollSnapshot(db.Model):
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id'), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    etag = db.Column(db.String(80), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class VoteCountShard(db.Model):
+    """One of several counter rows per option for hot polls (see app.counter_shards)"""
+    option_id = db.Column(db.Integer, db.ForeignKey('poll_option.id'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id'), nullable=False, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    writes = db.Column(db.Integer, nullable=False, default=0)
+
+class VoteArchive(db.Model):
+    """Votes of a closed poll moved to an archive file (see app.lifecycle)"""
+    poll_id = db.Column(db.Integer, db.ForeignKey('poll.id'), primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    bytes = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Create tables
 with app.app_context():
     db.create_all()
+    ensure_column(db.engine, Poll.__tablename__, 'version', 'INTEGER NOT NULL DEFAULT 1')
+    ensure_column(db.engine, Poll.__tablename__, 'poll_type', "VARCHAR(16) NOT NULL DEFAULT 'single'")
+    install_search_index(db.engine, Poll.__tablename__)
+    membership.voters.enabled = ensure_unique_index(db.engine, Vote.__tablename__, 'uq_vote_user_poll', ['user_id', 'poll_id'])
+    membership.likers.enabled = ensure_unique_index(db.engine, Like.__tablename__, 'uq_like_user_poll', ['user_id', 'poll_id'])
+    metrics.instrument_engine(db.engine)
+    sql_profiler.attach(db.engine)
+    replica_engine = db.engines.get('replica')
+    if replica_engine is not None:
+        metrics.instrument_engine(replica_engine)
+        sql_profiler.attach(replica_engine)
+    # Votes and likes go through one writer thread on SQLite (see app.group_commit)
+    group_writer = group_commit.writer_for(db.engine)
+ReplicaSession = sessionmaker(bind=replica_engine, info={'replica': True}) if replica_engine is not None else None
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_stats = metrics.start_request()
+    g.metrics_start = time.perf_counter()
+
+@app.after_request
+def finish_request_metrics(response):
+    stats = g.pop('metrics_stats', None)
+    if stats is not None:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.finish_request(
+            stats, request.method, route, response.status_code,
+            time.perf_counter() - g.metrics_start
+        )
+    return response
+
+if admission.ENABLED:
+    # Created after monkey patching so the semaphore cooperates with gevent
+    rate_limiter = admission.TokenBucketLimiter()
+    auth_rate_limiter = admission.TokenBucketLimiter(admission.AUTH_RATE_LIMIT_PER_SECOND, admission.AUTH_RATE_LIMIT_BURST)
+    write_limiter = admission.ConcurrencyLimiter()
+
+    @app.before_request
+    def admit_write():
+        """Rate limit and bound concurrent writes; shed excess load with 429/503"""
+        if not admission.is_write(request.method, request.path):
+            return None
+        limiter = auth_rate_limiter if admission.is_auth(request.path) else rate_limiter
+        retry_after = limiter.acquire(client_key())
+        if retry_after:
+            metrics.ADMISSION_REJECTIONS.inc(reason='rate_limited')
+            return jsonify({'error': admission.RATE_LIMITED_MESSAGE}), 429, admission.retry_after_header(retry_after)
+        if not write_limiter.acquire():
+            metrics.ADMISSION_REJECTIONS.inc(reason='overloaded')
+            return jsonify({'error': admission.OVERLOADED_MESSAGE}), 503, admission.retry_after_header(write_limiter.max_wait)
+        g.write_admitted = True
+        return None
+
+    @app.teardown_request
+    def release_write(exc):
+        if g.pop('write_admitted', False):
+            write_limiter.release()
+
+def read_session():
+    """Session for read-only routes: the replica, unless the client just wrote"""
+    if 'read_session' not in g:
+        if ReplicaSession is not None and replicas.use_replica(client_key(), request.cookies):
+            g.read_session = ReplicaSession()
+        else:
+            g.read_session = db.session
+    return g.read_session
+
+def use_primary():
+    """Serve the rest of this request from the primary, e.g. when the replica lags"""
+    session = g.get('read_session')
+    if session is not None and replicas.is_replica(session):
+        session.close()
+    g.read_session = db.session
+    return db.session
+
+@app.teardown_request
+def close_read_session(exc):
+    session = g.pop('read_session', None)
+    if session is not None and replicas.is_replica(session):
+        session.close()
+
+if replicas.REPLICA_URL:
+    @app.after_request
+    def stick_writer_to_primary(response):
+        """After a successful write the client reads from the primary for a while"""
+        if admission.is_write(request.method, request.path) and response.status_code < 400:
+            replicas.sticky.wrote(client_key())
+            response.set_cookie(**replicas.sticky_cookie())
+        return response
+
+if sql_profiler.ENABLED:
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = sql_profiler.start_profile(request.method, request.path)
+
+    @app.after_request
+    def finish_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is not None:
+            sql_profiler.finish_profile(profile, request.url_rule.rule if request.url_rule else None)
+            response.headers.update(sql_profiler.response_headers(profile))
+        return response
+
+    @app.route('/debug/queries/<profile_id>')
+    def query_profile(profile_id):
+        profile = sql_profiler.get_profile(profile_id)
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+        return jsonify(profile)
+
+if sampling_profiler.TOKEN:
+    @app.route('/debug/profile')
+    def sample_stacks():
+        if not sampling_profiler.authorized(request.headers.get(sampling_profiler.TOKEN_HEADER)):
+            return jsonify({'error': 'Not authorized to profile'}), 403
+        try:
+            seconds, interval_ms = sampling_profiler.parse_window(request.args.get('seconds'), request.args.get('interval_ms'))
+        except ValueError:
+            return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+        profile = sampling_profiler.profile_greenlets(seconds, interval_ms)
+        if profile is None:
+            return jsonify({'error': sampling_profiler.BUSY_MESSAGE}), 409
+        return Response(profile.collapsed(), mimetype='text/plain', headers=profile.headers())
 
 # Authentication utility functions
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    with metrics.track_bcrypt('hash'):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    with metrics.track_bcrypt('verify'):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_access_token(data):
     to_encode = data.copy()
@@ -122,6 +340,10 @@ def get_current_user():
         return payload.get("sub")
     return None
 
+def client_key():
+    """Signed-in user id, else the client address"""
+    return str(get_current_user() or request.remote_addr)
+
 # Authentication endpoints
 @app.route('/api/auth/signup', methods=['POST'])
 def signup():
@@ -218,16 +440,108 @@ def get_current_user_info():
 
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/me/poll-state', methods=['GET'])
+def get_poll_state():
+    """The signed-in user's vote and like on each of ?poll_ids= (comma-separated)"""
+    try:
+        user_id = get_current_user()
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        user_id = int(user_id)
+
+        try:
+            poll_ids = user_state.parse_poll_ids(request.args.get('poll_ids'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        states = user_state.cache.get(user_id, poll_ids, lambda missing: user_state.load_states(
+            read_session(), Vote.__table__, Ballot.__table__, Like.__table__, user_id, missing
+        )) if poll_ids else []
+        response = jsonify(states)
+        response.headers['Cache-Control'] = user_state.CACHE_CONTROL
+        return response
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+# Versions include writes still sitting in counter shards (hot polls) and,
+# on the primary, writes the hot state store has not checkpointed yet. The
+# replica's versions are cached apart from the primary's.
+def stored_poll_version(poll_id, session):
+    return replicas.version_registry(session).poll_version(
+        poll_id,
+        lambda: session.query(
+            Poll.version + counter_shards.pending_writes(VoteCountShard.__table__, Poll.id)
+        ).filter_by(id=poll_id, is_active=True).scalar()
+    )
+
+def current_poll_version(poll_id, session):
+    version = stored_poll_version(poll_id, session)
+    if version is None or replicas.is_replica(session):
+        return version
+    return version + hot_state.store.pending_writes(poll_id)
+
+def current_feed_version(session):
+    version = replicas.version_registry(session).feed_version(lambda: session.query(
+        func.coalesce(func.sum(Poll.version), 0) + counter_shards.total_pending_writes(VoteCountShard.__table__)
+    ).scalar())
+    if replicas.is_replica(session):
+        return version
+    return version + hot_state.store.total_pending_writes()
+
+def member_ids(model, poll_id):
+    """User ids with a vote or like (model) on a poll, streamed"""
+    return (user_id for (user_id,) in db.session.query(model.user_id).filter_by(poll_id=poll_id).yield_per(50000))
+
+def fold_counter_shards(poll_id, session=None):
+    return counter_shards.fold(
+        session or db.session, VoteCountShard.__table__, PollOption.__table__, Poll.__table__, poll_id
+    )
+
+def not_modified(etag):
+    return app.response_class(status=304, headers={'ETag': etag, 'Cache-Control': REVALIDATE_CACHE_CONTROL})
+
+def with_revalidate_headers(response, etag):
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    return response
+
 @app.route('/api/polls/', methods=['GET'])
 @app.route('/api/polls', methods=['GET'])
 def get_polls():
-    polls = Poll.query.filter_by(is_active=True).all()
-    result = []
-    for poll in polls:
-        creator = User.query.get(poll.creator_id)
-        total_votes = db.session.query(func.sum(PollOption.vote_count)).filter(PollOption.poll_id == poll.id).scalar() or 0
-        total_likes = Like.query.filter_by(poll_id=poll.id).count()
+    session = read_session()
+    # Read the version before the data so the ETag can only be older than the body
+    version = current_feed_version(session)
+    if replicas.is_replica(session) and replicas.is_behind(version, request.headers.get('If-None-Match')):
+        session = use_primary()
+        version = current_feed_version(session)
+    etag = feed_etag(version)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return not_modified(etag)
+
+    # One query for the polls with creator names, then one grouped query for
+    # votes still in counter shards. The poll counters are kept exact by the
+    # write paths and app.reconcile, so likes are not recounted here.
+    rows = session.query(Poll, User.username).join(User, User.id == Poll.creator_id).filter(
+        Poll.is_active == True
+    ).all()
+    poll_ids = [poll.id for poll, _ in rows]
+
+    shard_votes = {}
+    if poll_ids:
+        shard_votes = dict(session.execute(
+            counter_shards.shard_votes_statement(VoteCountShard.__table__, poll_ids)
+        ).all())
 
+    result = []
+    for poll, username in rows:
+        total_votes = (poll.total_votes or 0) + shard_votes.get(poll.id, 0)
+        total_likes = poll.total_likes or 0
+        # Counts this worker has not checkpointed yet (in the version too)
+        state = hot_state.store.get(poll.id) if not replicas.is_replica(session) else None
+        if state is not None:
+            total_votes += state.pending_votes
+            total_likes += state.pending_likes
         result.append({
             'id': poll.id,
             'title': poll.title,
@@ -235,7 +549,45 @@ def get_polls():
             'created_at': poll.created_at.isoformat(),
             'total_votes': total_votes,
             'total_likes': total_likes,
-            'creator_username': creator.username
+            'creator_username': username
+        })
+    return with_revalidate_headers(jsonify(result), etag)
+
+@app.route('/api/polls/search', methods=['GET'])
+def search_polls():
+    q = request.args.get('q', '')
+    skip = request.args.get('skip', 0, type=int)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+    session = read_session()
+    poll_ids = search_poll_ids(session.connection(), q, table=Poll.__tablename__, limit=limit, offset=skip)
+    if not poll_ids:
+        return jsonify([])
+
+    rows = session.query(Poll, User.username).outerjoin(User, User.id == Poll.creator_id).filter(
+        Poll.id.in_(poll_ids)
+    ).all()
+    by_id = {poll.id: (poll, username) for poll, username in rows}
+    # Votes still in counter shards, as in the feed
+    shard_votes = {}
+    if by_id:
+        shard_votes = dict(session.execute(
+            counter_shards.shard_votes_statement(VoteCountShard.__table__, list(by_id))
+        ).all())
+
+    result = []
+    for poll_id in poll_ids:
+        if poll_id not in by_id:
+            continue
+        poll, username = by_id[poll_id]
+        result.append({
+            'id': poll.id,
+            'title': poll.title,
+            'description': poll.description,
+            'created_at': poll.created_at.isoformat(),
+            'total_votes': (poll.total_votes or 0) + shard_votes.get(poll.id, 0),
+            'total_likes': poll.total_likes or 0,
+            'creator_username': username or 'anonymous'
         })
     return jsonify(result)
 
@@ -252,30 +604,28 @@ def create_poll():
             return jsonify({'error': 'User not found'}), 404
 
         data = request.get_json()
-
-        poll = Poll(
-            title=data['title'],
-            description=data.get('description'),
-            creator_id=user.id
+        try:
+            poll_type = poll_import.check_poll_type(data.get('poll_type', tally.SINGLE))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Poll and options are written in one transaction
+        draft = poll_import.PollDraft(
+            data['title'], data.get('description'),
+            [option_data['option_text'] for option_data in data['options']],
+            poll_type
         )
-        db.session.add(poll)
-        db.session.commit()
-
-        for option_data in data['options']:
-            option = PollOption(
-                poll_id=poll.id,
-                option_text=option_data['option_text']
-            )
-            db.session.add(option)
-
+        poll = poll_import.insert_polls(db.session, Poll.__table__, PollOption.__table__, user.id, [draft])[0]
         db.session.commit()
+        versions.record_write(poll['id'], poll['version'])
 
         # Emit real-time update
-        socketio.emit('poll_created', {
+        broadcast_event('poll_created', {
             'poll': {
-                'id': poll.id,
-                'title': poll.title,
-                'description': poll.description,
+                'id': poll['id'],
+                'title': draft.title,
+                'description': draft.description,
+                'poll_type': draft.poll_type,
                 'total_votes': 0,
                 'total_likes': 0,
                 'creator_username': user.username
@@ -287,18 +637,48 @@ def create_poll():
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/polls/<int:poll_id>/', methods=['GET'])
-@app.route('/api/polls/<int:poll_id>', methods=['GET'])
-def get_poll(poll_id):
-    poll = Poll.query.filter_by(id=poll_id, is_active=True).first()
-    if not poll:
-        return jsonify({'error': 'Poll not found'}), 404
+@app.route('/api/polls:import', methods=['POST'])
+def import_polls():
+    """Create many polls from an NDJSON body, one poll per line, committed in chunks"""
+    try:
+        user_id = get_current_user()
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
 
-    creator = User.query.get(poll.creator_id)
-    options = PollOption.query.filter_by(poll_id=poll.id).all()
+        user = User.query.get(int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        def write_chunk(drafts):
+            created = poll_import.insert_polls(db.session, Poll.__table__, PollOption.__table__, user.id, drafts)
+            db.session.commit()
+            return [poll['id'] for poll in created]
+
+        importer = poll_import.PollImport(write_chunk)
+        for chunk in iter(lambda: request.stream.read(65536), b''):
+            importer.feed(chunk)
+        summary = importer.finish()
+        if summary['imported']:
+            # Imported polls are not announced one by one; feeds pick them up on their next fetch
+            versions.invalidate_feed()
+        return jsonify(summary)
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+def load_poll_detail(poll_id, session):
+    """Poll with creator joined and options in one follow-up query (two round trips)"""
+    return session.query(Poll).options(
+        joinedload(Poll.creator),
+        selectinload(Poll.options)
+    ).filter_by(id=poll_id).first()
+
+def serialize_poll_detail(poll):
+    creator = poll.creator
+    options = poll.options
 
     # Format response to match frontend expectations
-    return jsonify({
+    return {
         'id': poll.id,
         'title': poll.title,
         'description': poll.description,
@@ -306,6 +686,7 @@ def get_poll(poll_id):
         'updated_at': poll.updated_at.isoformat() if poll.updated_at else None,
         'creator_id': poll.creator_id,
         'is_active': poll.is_active,
+        'poll_type': poll.poll_type,
         'total_votes': poll.total_votes,
         'total_likes': poll.total_likes,
         'creator': {
@@ -320,7 +701,393 @@ def get_poll(poll_id):
             'option_text': option.option_text,
             'vote_count': option.vote_count
         } for option in options]
+    }
+
+def serialize_hot_state(state):
+    title, description, created_at, updated_at, creator_id, username, email, creator_created_at, poll_type, _ = state.header
+    return {
+        'id': state.poll_id,
+        'title': title,
+        'description': description,
+        'created_at': created_at.isoformat(),
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'creator_id': creator_id,
+        'is_active': True,
+        'poll_type': poll_type,
+        'total_votes': state.votes,
+        'total_likes': state.likes,
+        'creator': {
+            'id': creator_id,
+            'username': username,
+            'email': email,
+            'created_at': creator_created_at.isoformat()
+        },
+        'options': [{
+            'id': option_id,
+            'poll_id': state.poll_id,
+            'option_text': option_text,
+            'vote_count': vote_count
+        } for option_id, option_text, vote_count in state.options()]
+    }
+
+def hot_state_response(state):
+    return with_revalidate_headers(jsonify(serialize_hot_state(state)), poll_etag(state.poll_id, state.version))
+
+def hot_poll(poll_id):
+    """The poll's hot state entry, loaded on a miss; None once the poll is closed"""
+    state = hot_state.store.get(poll_id)
+    if state is not None:
+        return state
+    poll = load_poll_detail(poll_id, db.session)
+    if poll is None or not poll.is_active:
+        return None
+    return hot_state.store.load(poll, counter_shards.cached_totals(db.session, VoteCountShard.__table__, poll_id))
+
+def warm_hot_state(limit):
+    """Load the most recent live polls into the hot state store, e.g. before a worker takes requests"""
+    if not hot_state.ENABLED or limit <= 0:
+        return 0
+    with app.app_context():
+        polls = Poll.query.options(joinedload(Poll.creator), selectinload(Poll.options)).filter_by(
+            is_active=True
+        ).order_by(Poll.id.desc()).limit(limit).all()
+        # Only polls with counter shards need their totals read
+        sharded = set(db.session.execute(
+            select(VoteCountShard.poll_id).where(VoteCountShard.poll_id.in_([poll.id for poll in polls])).distinct()
+        ).scalars())
+        for poll in polls:
+            totals = (counter_shards.cached_totals(db.session, VoteCountShard.__table__, poll.id)
+                      if poll.id in sharded else counter_shards.ShardTotals())
+            hot_state.store.load(poll, totals)
+        return len(polls)
+
+def poll_snapshots(poll_ids):
+    """GET /api/polls/<id> bodies of several polls for one real-time message (app.realtime_snapshot)"""
+    poll_ids = poll_ids[:realtime_snapshot.MAX_POLLS]
+    details = {}
+    unread = []
+    for poll_id in poll_ids:
+        frozen = snapshot_cache.get(poll_id)
+        if frozen:
+            details[poll_id] = fast_loads(frozen.body)
+        else:
+            unread.append(poll_id)
+    if unread:
+        shards = VoteCountShard.__table__
+        rows = db.session.execute(
+            select(Poll, counter_shards.pending_writes(shards, Poll.id))
+            .options(joinedload(Poll.creator), joinedload(Poll.options))
+            .where(Poll.id.in_(unread))
+        ).unique().all()
+        for poll, shard_writes in rows:
+            if not poll.is_active:
+                details[poll.id] = fast_loads(load_snapshot(poll).body)
+                continue
+            if hot_state.ENABLED:
+                state = hot_state.store.fresh(poll.id, lambda: poll.version + shard_writes)
+                if state is not None:
+                    details[poll.id] = serialize_hot_state(state)
+                    continue
+            # Shard rows without writes hold no uncounted votes either
+            totals = counter_shards.cached_totals(db.session, shards, poll.id) if shard_writes else counter_shards.ShardTotals()
+            if hot_state.ENABLED:
+                details[poll.id] = serialize_hot_state(hot_state.store.load(poll, totals))
+            else:
+                details[poll.id] = counter_shards.apply_to_detail(serialize_poll_detail(poll), totals)
+    return realtime_snapshot.snapshot_data(poll_ids, details)
+
+def freeze_poll(poll):
+    """Serialize a closed poll once and store it as its permanent snapshot"""
+    # Votes still in counter shards belong in the final counts
+    fold_counter_shards(poll.id)
+    db.session.refresh(poll)
+    for option in poll.options:
+        db.session.refresh(option)
+    frozen = FrozenResults(fast_dumps(serialize_poll_detail(poll)))
+    db.session.add(PollSnapshot(poll_id=poll.id, payload=frozen.body.decode('utf-8'), etag=frozen.etag))
+    db.session.commit()
+    snapshot_cache.put(poll.id, frozen)
+    return frozen
+
+def load_snapshot(poll):
+    frozen = snapshot_cache.get(poll.id)
+    if frozen:
+        return frozen
+
+    snapshot = PollSnapshot.query.get(poll.id)
+    if not snapshot:
+        # Poll was deactivated before snapshots existed
+        return freeze_poll(poll)
+
+    frozen = FrozenResults(snapshot.payload.encode('utf-8'), snapshot.etag)
+    snapshot_cache.put(poll.id, frozen)
+    return frozen
+
+def snapshot_response(frozen):
+    headers = {'ETag': frozen.etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get('If-None-Match'), frozen.etag):
+        return app.response_class(status=304, headers=headers)
+    return app.response_class(frozen.body, mimetype='application/json', headers=headers)
+
+def close_poll_and_freeze(poll):
+    poll.is_active = False
+    # Writes this worker has not checkpointed are dropped with its entry below;
+    # counting them keeps the poll and feed versions from going backwards
+    poll.version = Poll.version + 1 + hot_state.store.pending_writes(poll.id)
+    if hot_state.ENABLED and poll.poll_type == tally.SINGLE:
+        # Deltas not yet checkpointed, here or by other workers, are replaced by a recount
+        hot_state.recount(db.session, Poll.__table__, PollOption.__table__, Vote.__table__, Like.__table__,
+                          VoteCountShard.__table__, poll.id)
+    frozen = freeze_poll(poll)
+    hot_state.store.forget(poll.id)
+    versions.record_write(poll.id)
+    membership.voters.forget(poll.id)
+    membership.likers.forget(poll.id)
+
+    # Final results go out once; closed polls get no further live updates
+    options = poll.options
+    broadcast_event('poll_closed', {
+        'poll_id': poll.id,
+        'total_votes': poll.total_votes,
+        'total_likes': poll.total_likes,
+        'options': [{
+            'option_id': option.id,
+            'option_text': option.option_text,
+            'vote_count': option.vote_count
+        } for option in options]
     })
+    return frozen
+
+def get_owned_poll(poll_id):
+    """Returns (poll, None) for the current user's open poll, else (None, error response)"""
+    user_id = get_current_user()
+    if not user_id:
+        return None, (jsonify({'error': 'Authentication required'}), 401)
+
+    poll = Poll.query.get(poll_id)
+    if not poll:
+        return None, (jsonify({'error': 'Poll not found'}), 404)
+    if poll.creator_id != int(user_id):
+        return None, (jsonify({'error': 'Only the poll creator can modify this poll'}), 403)
+    if not poll.is_active:
+        return None, (jsonify({'error': 'Poll is closed'}), 409)
+    return poll, None
+
+@app.route('/api/polls/<int:poll_id>/', methods=['GET'])
+@app.route('/api/polls/<int:poll_id>', methods=['GET'])
+def get_poll(poll_id):
+    # Closed polls are served from their frozen snapshot without touching the DB
+    frozen = snapshot_cache.get(poll_id)
+    if frozen:
+        return snapshot_response(frozen)
+
+    session = read_session()
+    if_none_match = request.headers.get('If-None-Match')
+    # A lagging replica (older than the client's copy, or without the poll) is skipped
+    if replicas.is_replica(session) and replicas.is_behind(current_poll_version(poll_id, session), if_none_match):
+        session = use_primary()
+
+    # Unchanged live polls are answered from the version counter alone
+    if if_none_match:
+        version = current_poll_version(poll_id, session)
+        if version is not None and etag_matches(if_none_match, poll_etag(poll_id, version)):
+            return not_modified(poll_etag(poll_id, version))
+
+    # The primary's live polls are served from the hot state store while it is current
+    use_hot_state = hot_state.ENABLED and not replicas.is_replica(session)
+    if use_hot_state:
+        state = hot_state.store.fresh(poll_id, lambda: stored_poll_version(poll_id, session))
+        if state is not None:
+            return hot_state_response(state)
+
+    poll = load_poll_detail(poll_id, session)
+    if not poll:
+        return jsonify({'error': 'Poll not found'}), 404
+
+    if not poll.is_active:
+        return snapshot_response(load_snapshot(poll))
+
+    totals = counter_shards.cached_totals(session, VoteCountShard.__table__, poll.id)
+    if use_hot_state:
+        return hot_state_response(hot_state.store.load(poll, totals))
+    etag = poll_etag(poll.id, poll.version + totals.writes)
+    detail = counter_shards.apply_to_detail(serialize_poll_detail(poll), totals)
+    return with_revalidate_headers(jsonify(detail), etag)
+
+@app.route('/api/polls/<int:poll_id>/stream', methods=['GET'])
+def stream_poll(poll_id):
+    """Server-Sent Events stream of a poll's live updates, resumable with Last-Event-ID"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    session = read_session()
+    is_active = session.query(Poll.is_active).filter(Poll.id == poll_id).scalar()
+    if is_active is None and replicas.is_replica(session):
+        # The replica may not have a poll created a moment ago
+        is_active = use_primary().query(Poll.is_active).filter(Poll.id == poll_id).scalar()
+    if is_active is None:
+        return jsonify({'error': 'Poll not found'}), 404
+    if not is_active and not sse.hub.has_replay(poll_id, last_event_id):
+        return jsonify({'error': 'Poll is closed'}), 409
+
+    # The generator runs after teardown, so the stream holds no session
+    subscription, initial = sse.hub.subscribe(poll_id, last_event_id)
+    return Response(sse.hub.iter_frames(subscription, initial), mimetype=sse.MEDIA_TYPE, headers=sse.HEADERS)
+
+@app.route('/api/polls/<int:poll_id>', methods=['PATCH'])
+def update_poll(poll_id):
+    try:
+        poll, error = get_owned_poll(poll_id)
+        if error:
+            return error
+
+        data = request.get_json() or {}
+        if 'title' in data and data['title'] is not None:
+            if not str(data['title']).strip():
+                return jsonify({'error': 'Title cannot be empty'}), 400
+            poll.title = data['title']
+        if 'description' in data:
+            poll.description = data['description']
+
+        if data.get('is_active') is False:
+            return snapshot_response(close_poll_and_freeze(poll))
+
+        poll.version = Poll.version + 1
+        db.session.commit()
+        versions.record_write(poll.id, poll.version)
+
+        # Emit real-time update
+        broadcast_event('poll_updated', {
+            'poll_id': poll.id,
+            'title': poll.title,
+            'description': poll.description
+        })
+
+        return jsonify(serialize_poll_detail(poll))
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/polls/<int:poll_id>/close', methods=['POST'])
+def close_poll(poll_id):
+    try:
+        poll, error = get_owned_poll(poll_id)
+        if error:
+            return error
+
+        return snapshot_response(close_poll_and_freeze(poll))
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+def apply_vote(session, poll, option, user_id, existing_vote, sharded):
+    """Record or move a user's vote and update the counters, without committing;
+    returns the option the vote moved from, if any"""
+    previous_option_id = existing_vote.option_id if existing_vote else None
+    if hot_state.ENABLED:
+        # Counted by the hot state store, which checkpoints the counters
+        if existing_vote:
+            existing_vote.option_id = option.id
+        else:
+            session.add(Vote(user_id=user_id, poll_id=poll.id, option_id=option.id))
+        return previous_option_id
+
+    shards = VoteCountShard.__table__
+    if existing_vote:
+        if sharded:
+            counter_shards.increment(session, shards, poll.id, existing_vote.option_id, -1)
+        else:
+            old_option = session.get(PollOption, existing_vote.option_id)
+            if old_option:
+                old_option.vote_count -= 1
+        existing_vote.option_id = option.id
+    else:
+        session.add(Vote(user_id=user_id, poll_id=poll.id, option_id=option.id))
+        if not sharded:
+            poll.total_votes += 1
+
+    if sharded:
+        counter_shards.increment(session, shards, poll.id, option.id, 1)
+    else:
+        option.vote_count += 1
+        poll.version = Poll.version + 1
+        # Fold counts left in shards from when the poll was hot
+        if counter_shards.tracker.may_have_shards(poll.id):
+            fold_counter_shards(poll.id, session)
+    return previous_option_id
+
+def find_vote(session, user_id, poll_id):
+    return session.query(Vote).filter_by(user_id=user_id, poll_id=poll_id).first()
+
+def vote_write(poll_id, option_id, user_id, check_existing, sharded):
+    """Write recording a vote; returns the new counts, or None if the poll closed meanwhile"""
+    def write(session):
+        poll = session.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        option = session.get(PollOption, option_id)
+        existing_vote = find_vote(session, user_id, poll_id) if check_existing else None
+        try:
+            with session.begin_nested():
+                previous_option_id = apply_vote(session, poll, option, user_id, existing_vote, sharded)
+        except IntegrityError:
+            # Another worker recorded a vote for this user after our member set was loaded
+            previous_option_id = apply_vote(session, poll, option, user_id, find_vote(session, user_id, poll_id), sharded)
+        session.flush()
+        return {'option_id': option.id, 'option_text': option.option_text, 'vote_count': option.vote_count,
+                'total_votes': poll.total_votes, 'version': poll.version,
+                'previous_option_id': previous_option_id}
+    return write
+
+def like_write(poll_id, user_id, liked):
+    """Write adding or removing a like; returns the new total, or None if there was nothing to do"""
+    def write(session):
+        poll = session.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        delta = 1 if liked else -1
+        if liked:
+            session.add(Like(user_id=user_id, poll_id=poll_id))
+        else:
+            like = session.query(Like).filter_by(user_id=user_id, poll_id=poll_id).first()
+            if like is None:
+                return None
+            session.delete(like)
+        if not hot_state.ENABLED:
+            # Otherwise counted by the hot state store
+            poll.total_likes += delta
+            poll.version = Poll.version + 1
+        session.flush()
+        return {'total_likes': poll.total_likes, 'version': poll.version}
+    return write
+
+def run_write(operation):
+    """Run a write through the group-commit writer, or commit it on db.session"""
+    if group_writer is not None:
+        # Hand the pooled connection back while waiting; loaded attributes stay readable
+        db.session.close()
+        return group_writer.run(operation)
+    try:
+        result = operation(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+def commit_checkpoint(operation):
+    """Hot state checkpoints go through the group-commit writer too, else commit on their own session"""
+    with app.app_context():
+        return run_write(operation)
+
+if hot_state.ENABLED:
+    hot_state.store.configure(commit_checkpoint, Poll.__table__, PollOption.__table__)
+
+def count_like(poll_id, counts, delta):
+    """Count a committed like or unlike in the hot state store, or note the poll's new version"""
+    state = hot_poll(poll_id) if hot_state.ENABLED else None
+    if state is not None:
+        counts['total_likes'] = hot_state.store.record_like(state, delta).likes
+    else:
+        versions.record_write(poll_id, counts['version'])
 
 @app.route('/api/polls/<int:poll_id>/vote', methods=['POST'])
 def vote_poll(poll_id):
@@ -337,40 +1104,160 @@ def vote_poll(poll_id):
         poll = Poll.query.filter_by(id=poll_id, is_active=True).first()
         if not poll:
             return jsonify({'error': 'Poll not found'}), 404
+        if poll.poll_type != tally.SINGLE:
+            return jsonify({'error': f'This poll takes ballots: POST /api/polls/{poll_id}/ballot'}), 400
 
         option = PollOption.query.filter_by(id=data['option_id'], poll_id=poll_id).first()
         if not option:
             return jsonify({'error': 'Poll option not found'}), 404
 
-        # Check if user already voted
-        existing_vote = Vote.query.filter_by(user_id=user.id, poll_id=poll_id).first()
-        if existing_vote:
-            old_option = PollOption.query.get(existing_vote.option_id)
-            if old_option:
-                old_option.vote_count -= 1
-            existing_vote.option_id = data['option_id']
+        # Hot polls count into counter shards instead of locking the poll and option rows
+        # (unless the hot state store keeps all counts off those rows)
+        sharded = not hot_state.ENABLED and counter_shards.tracker.record_vote(poll_id)
+        shards = VoteCountShard.__table__
+
+        # First-time voters, the common case, skip the existing-vote lookup
+        check_existing = not membership.voters.definitely_absent(poll_id, user.id, lambda: member_ids(Vote, poll_id))
+        counts = run_write(vote_write(poll_id, option.id, user.id, check_existing, sharded))
+        if counts is None:
+            return jsonify({'error': 'Poll not found'}), 404
+        membership.voters.add(poll_id, user.id)
+        user_state.cache.invalidate(user.id, poll_id)
+
+        state = hot_poll(poll_id) if hot_state.ENABLED else None
+        if state is not None:
+            state = hot_state.store.record_vote(state, counts['previous_option_id'], counts['option_id'])
+            counts['vote_count'], counts['total_votes'] = state.vote_count(counts['option_id']), state.votes
+            totals = counter_shards.ShardTotals()
+        elif sharded:
+            versions.record_write(poll_id)
+            totals = counter_shards.refresh_totals(db.session, shards, poll_id)
         else:
-            vote = Vote(user_id=user.id, poll_id=poll_id, option_id=data['option_id'])
-            db.session.add(vote)
+            versions.record_write(poll_id, counts['version'])
+            totals = counter_shards.ShardTotals()
+
+        # Emit real-time update
+        broadcast_event('poll_vote', {
+            'poll_id': poll_id,
+            'option_id': counts['option_id'],
+            'option_text': counts['option_text'],
+            'vote_count': counts['vote_count'] + totals.options.get(counts['option_id'], 0),
+            'total_votes': counts['total_votes'] + totals.votes
+        })
+
+        return jsonify({'message': 'Vote recorded successfully'})
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+def ballot_write(poll_id, user_id, choices):
+    """Write casting or replacing a ballot; returns the new counts, or None if the poll closed meanwhile"""
+    def write(session):
+        poll = session.get(Poll, poll_id)
+        if poll is None or not poll.is_active:
+            return None
+        ballot = session.query(Ballot).filter_by(user_id=user_id, poll_id=poll_id).first()
+        previous = None
+        if ballot is None:
+            session.add(Ballot(user_id=user_id, poll_id=poll_id, choices=tally.encode_choices(choices)))
             poll.total_votes += 1
+        else:
+            previous = tally.decode_choices(ballot.choices)
+            ballot.choices = tally.encode_choices(choices)
+        options = PollOption.__table__
+        for option_id, delta in tally.counter_deltas(poll.poll_type, previous, choices).items():
+            session.execute(options.update().where(options.c.id == option_id)
+                            .values(vote_count=options.c.vote_count + delta))
+        poll.version = Poll.version + 1
+        session.flush()
+        vote_counts = session.query(PollOption.id, PollOption.vote_count).filter_by(poll_id=poll_id).all()
+        return {'total_votes': poll.total_votes, 'version': poll.version, 'vote_counts': vote_counts}
+    return write
+
+@app.route('/api/polls/<int:poll_id>/ballot', methods=['POST'])
+def ballot_poll(poll_id):
+    """Cast or replace a ballot on a multiple-choice or ranked-choice poll"""
+    try:
+        user_id = get_current_user()
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
 
-        option.vote_count += 1
-        db.session.commit()
+        user = User.query.get(int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        data = request.get_json()
+        poll = Poll.query.filter_by(id=poll_id, is_active=True).first()
+        if not poll:
+            return jsonify({'error': 'Poll not found'}), 404
+        option_ids = [option_id for (option_id,) in db.session.query(PollOption.id).filter_by(poll_id=poll_id)]
+        try:
+            choices = tally.validate_ballot(poll.poll_type, (data or {}).get('option_ids'), option_ids)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            counts = run_write(ballot_write(poll_id, user.id, choices))
+        except IntegrityError:
+            # The same voter's first ballot, committed concurrently through another request
+            return jsonify({'error': 'Ballot changed concurrently, please retry'}), 409
+        if counts is None:
+            return jsonify({'error': 'Poll not found'}), 404
+        versions.record_write(poll_id, counts['version'])
+        user_state.cache.invalidate(user.id, poll_id)
 
         # Emit real-time update
-        socketio.emit('poll_vote', {
+        broadcast_event('poll_ballot', {
             'poll_id': poll_id,
-            'option_id': option.id,
-            'option_text': option.option_text,
-            'vote_count': option.vote_count,
-            'total_votes': poll.total_votes
+            'total_votes': counts['total_votes'],
+            'options': [{'option_id': option_id, 'vote_count': vote_count}
+                        for option_id, vote_count in counts['vote_counts']]
         })
 
-        return jsonify({'message': 'Vote recorded successfully'})
+        return jsonify({'message': 'Ballot recorded successfully'})
 
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/polls/<int:poll_id>/results', methods=['GET'])
+def poll_results(poll_id):
+    """Tallied results: option counts, plus instant-runoff rounds and winner for ranked-choice polls"""
+    session = read_session()
+    poll = session.query(Poll).options(selectinload(Poll.options)).filter_by(id=poll_id).first()
+    if not poll and replicas.is_replica(session):
+        # The replica may not have a poll created a moment ago
+        session = use_primary()
+        poll = session.query(Poll).options(selectinload(Poll.options)).filter_by(id=poll_id).first()
+    if not poll:
+        return jsonify({'error': 'Poll not found'}), 404
+
+    if poll.poll_type != tally.SINGLE:
+        options = [(option.id, option.option_text) for option in poll.options]
+        return jsonify(tally.ballot_results(session, Ballot.__table__, poll.id, poll.poll_type, options, poll.version))
+
+    totals = counter_shards.cached_totals(session, VoteCountShard.__table__, poll.id)
+    if hot_state.ENABLED and poll.is_active and not replicas.is_replica(session):
+        # Votes not yet checkpointed are only counted in the hot state store; a
+        # stale entry (PATCH, another worker's checkpoint) is reloaded with them kept
+        state = hot_state.store.fresh(poll.id, lambda: poll.version + totals.writes)
+        if state is None:
+            state = hot_state.store.load(poll, totals)
+        total_ballots, counts = state.votes, list(state.options())
+    else:
+        total_ballots = poll.total_votes + totals.votes
+        counts = [(option.id, option.option_text, option.vote_count + totals.options.get(option.id, 0))
+                  for option in poll.options]
+    return jsonify({
+        'poll_id': poll.id,
+        'poll_type': poll.poll_type,
+        'total_ballots': total_ballots,
+        'options': [{
+            'option_id': option_id,
+            'option_text': option_text,
+            'votes': votes
+        } for option_id, option_text, votes in counts]
+    })
+
 @app.route('/api/polls/<int:poll_id>/like', methods=['POST'])
 def like_poll(poll_id):
     try:
@@ -386,19 +1273,27 @@ def like_poll(poll_id):
         if not poll:
             return jsonify({'error': 'Poll not found'}), 404
 
-        existing_like = Like.query.filter_by(user_id=user.id, poll_id=poll_id).first()
-        if existing_like:
-            return jsonify({'error': 'Already liked this poll'}), 400
+        # Skipped when the member set rules out an existing like
+        if not membership.likers.definitely_absent(poll_id, user.id, lambda: member_ids(Like, poll_id)):
+            existing_like = Like.query.filter_by(user_id=user.id, poll_id=poll_id).first()
+            if existing_like:
+                return jsonify({'error': 'Already liked this poll'}), 400
 
-        like = Like(user_id=user.id, poll_id=poll_id)
-        db.session.add(like)
-        poll.total_likes += 1
-        db.session.commit()
+        try:
+            counts = run_write(like_write(poll_id, user.id, liked=True))
+        except IntegrityError:
+            # Liked through another worker after our member set was loaded
+            return jsonify({'error': 'Already liked this poll'}), 400
+        if counts is None:
+            return jsonify({'error': 'Poll not found'}), 404
+        membership.likers.add(poll_id, user.id)
+        user_state.cache.invalidate(user.id, poll_id)
+        count_like(poll_id, counts, 1)
 
         # Emit real-time update
-        socketio.emit('poll_like', {
+        broadcast_event('poll_like', {
             'poll_id': poll_id,
-            'total_likes': poll.total_likes,
+            'total_likes': counts['total_likes'],
             'liked': True
         })
 
@@ -422,18 +1317,17 @@ def unlike_poll(poll_id):
         if not poll:
             return jsonify({'error': 'Poll not found'}), 404
 
-        like = Like.query.filter_by(user_id=user.id, poll_id=poll_id).first()
-        if not like:
+        counts = run_write(like_write(poll_id, user.id, liked=False))
+        if counts is None:
             return jsonify({'error': 'Like not found'}), 404
-
-        db.session.delete(like)
-        poll.total_likes -= 1
-        db.session.commit()
+        membership.likers.discard(poll_id, user.id)
+        user_state.cache.invalidate(user.id, poll_id)
+        count_like(poll_id, counts, -1)
 
         # Emit real-time update
-        socketio.emit('poll_like', {
+        broadcast_event('poll_like', {
             'poll_id': poll_id,
-            'total_likes': poll.total_likes,
+            'total_likes': counts['total_likes'],
             'liked': False
         })
 
@@ -444,11 +1338,37 @@ def unlike_poll(poll_id):
 
 # WebSocket events
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    metrics.REALTIME_CONNECTIONS.inc(transport='socketio')
     print('Client connected')
-
+    # Every client receives every update; naming polls only asks for their current state
+    poll_ids = auth.get('poll_ids') if isinstance(auth, dict) else None
+    poll_ids = realtime_snapshot.parse_poll_ids(poll_ids or request.args.get('poll_ids', ''))
+    if poll_ids:
+        emit(realtime_snapshot.EVENT, poll_snapshots(poll_ids))
+
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    """Snapshot of the named polls; registers nothing, every client keeps receiving every update"""
+    poll_ids = realtime_snapshot.parse_poll_ids(data.get('poll_ids', []) if isinstance(data, dict) else [])
+    emit(realtime_snapshot.EVENT, poll_snapshots(poll_ids))
+
+# Engine.IO's own ping/pong drops clients that stop answering. Over the
+# websocket transport that surfaces as a read timeout ("transport close"),
+# so anything but a clean client or server disconnect counts as reaped.
+REAPED_DISCONNECT_REASONS = {
+    'ping timeout': 'idle',
+    'transport close': 'transport_closed',
+    'transport error': 'transport_error'
+}
+
+# python-socketio passes the reason since 5.12 (pinned in requirements.txt);
+# without one a disconnect is not counted as reaped.
 @socketio.on('disconnect')
-def handle_disconnect():
+def handle_disconnect(reason=None):
+    metrics.REALTIME_CONNECTIONS.dec(transport='socketio')
+    if reason in REAPED_DISCONNECT_REASONS:
+        metrics.REALTIME_REAPED.inc(transport='socketio', reason=REAPED_DISCONNECT_REASONS[reason])
     print('Client disconnected')
 
 @app.route('/')
@@ -459,5 +1379,9 @@ def index():
 def health():
     return jsonify({'status': 'healthy'})
 
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(metrics.registry.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     socketio.run(app, host='localhost', port=8000, debug=True)
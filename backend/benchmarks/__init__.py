@@ -0,0 +1 @@
+# Benchmarks for the Opinion Poll Platform backend
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Connection registry cost at scale.
+
+Registers N fake sockets with the FastAPI ConnectionManager and reports
+memory per connection, connect/disconnect churn time and broadcast fan-out
+time, with a fraction of sockets failing mid-broadcast to check that
+removal during fan-out skips nobody. Prints one JSON object per run.
+
+    cd backend && python -m benchmarks.bench_connections --connections 50000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from app.websocket_manager import ConnectionManager
+
+class FakeWebSocket:
+    __slots__ = ("received", "fail")
+
+    def __init__(self, fail=False):
+        self.received = 0
+        self.fail = fail
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.fail:
+            raise ConnectionResetError("client went away")
+        self.received += 1
+
+    send_bytes = send_text
+
+async def run(count, failing, subscribed):
+    sockets = [FakeWebSocket() for _ in range(count)]
+    manager = ConnectionManager()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for websocket in sockets:
+        await manager.connect(websocket)
+    connect_seconds = time.perf_counter() - start
+    registry_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    # A share of clients follow only poll 1
+    rng = random.Random(1)
+    for websocket in rng.sample(sockets, int(count * subscribed)):
+        manager.subscribe(websocket, [1])
+
+    # Churn: drop and re-add a random 10% in random order
+    churn = rng.sample(sockets, count // 10)
+    start = time.perf_counter()
+    for websocket in churn:
+        manager.disconnect(websocket)
+    for websocket in churn:
+        await manager.connect(websocket)
+    churn_seconds = time.perf_counter() - start
+
+    dead = rng.sample(sockets, int(count * failing))
+    for websocket in dead:
+        websocket.fail = True
+    # Only firehose clients receive the poll 2 update, so only they can fail
+    dead_recipients = [websocket for websocket in dead if manager.get(websocket).subscriptions is None]
+    start = time.perf_counter()
+    await manager.broadcast_poll_update(2, "vote", {"option_id": 3, "total_votes": 10})
+    broadcast_seconds = time.perf_counter() - start
+
+    alive = [websocket for websocket in sockets if not websocket.fail]
+    expected = sum(1 for websocket in alive if manager.get(websocket).subscriptions is None)
+    delivered = sum(websocket.received for websocket in alive)
+
+    return {
+        "connections": count,
+        "bytes_per_connection": round(registry_bytes / count, 1),
+        "connect_us": round(connect_seconds / count * 1e6, 3),
+        "churn_us": round(churn_seconds / (2 * len(churn)) * 1e6, 3) if churn else None,
+        "broadcast_ms": round(broadcast_seconds * 1000, 3),
+        "failed": len(dead_recipients),
+        "failed_removed": sum(1 for websocket in dead_recipients if manager.get(websocket) is None),
+        "delivered": delivered,
+        "expected": expected,
+        "remaining": len(manager)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=50_000)
+    parser.add_argument("--failing", type=float, default=0.01, help="share of sockets that fail on send")
+    parser.add_argument("--subscribed", type=float, default=0.5, help="share of sockets subscribed to one poll")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.connections, args.failing, args.subscribed))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Row-lock contention: single-row vote counters vs counter shards.
+
+N threads each increment the same option of one poll in their own
+transactions, either the way an unsharded vote does (option row, then poll
+row) or through app.counter_shards. Prints one JSON object per mode with
+throughput, latency percentiles and whether the final count is exact.
+
+Run against PostgreSQL to see the effect; SQLite takes a database-wide
+write lock, so sharding cannot help there.
+
+    cd backend && python -m benchmarks.bench_counters \\
+        --database-url postgresql://localhost/bench --threads 32 --increments 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import counter_shards
+from app.models import Base, Poll, PollOption, User, VoteCountShard
+
+def setup(engine):
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        username = f"bench_counters_{time.time_ns()}"
+        user = User(username=username, email=f"{username}@bench.local", password_hash="")
+        session.add(user)
+        session.flush()
+        poll = Poll(title="Counter contention", creator_id=user.id, total_votes=0, version=1)
+        session.add(poll)
+        session.flush()
+        option = PollOption(poll_id=poll.id, option_text="Hot option", vote_count=0)
+        session.add(option)
+        session.commit()
+        return Session, poll.id, option.id
+
+def single_row(session, poll_id, option_id):
+    options, polls = PollOption.__table__, Poll.__table__
+    session.execute(options.update().where(options.c.id == option_id)
+                    .values(vote_count=options.c.vote_count + 1))
+    session.execute(polls.update().where(polls.c.id == poll_id)
+                    .values(total_votes=polls.c.total_votes + 1, version=polls.c.version + 1))
+
+def sharded(session, poll_id, option_id):
+    counter_shards.increment(session, VoteCountShard.__table__, poll_id, option_id, 1)
+
+MODES = {"single_row": single_row, "sharded": sharded}
+
+def run(engine, mode, threads, increments):
+    Session, poll_id, option_id = setup(engine)
+    write = MODES[mode]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        with Session() as session:
+            for _ in range(increments):
+                start = time.perf_counter()
+                try:
+                    write(session, poll_id, option_id)
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    errors.append(type(e).__name__)
+                    continue
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with Session() as session:
+        base = session.execute(select(PollOption.vote_count).where(PollOption.id == option_id)).scalar()
+        shard_sum = session.execute(
+            select(func.coalesce(func.sum(VoteCountShard.count), 0)).where(VoteCountShard.option_id == option_id)
+        ).scalar()
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3) if latencies else None
+    return {
+        "mode": mode,
+        "dialect": engine.dialect.name,
+        "threads": threads,
+        "increments": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "increments_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "exact": base + shard_sum == len(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--increments", type=int, default=200, help="per thread")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-counters-'), 'counters.db')}"
+    connect_args = {"timeout": 60, "check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=args.threads, max_overflow=0, connect_args=connect_args)
+    for mode in args.modes.split(","):
+        print(json.dumps(run(engine, mode.strip(), args.threads, args.increments)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+SQLite write throughput: one commit per vote vs app.group_commit.
+
+N threads each record --writes votes on one poll (vote row, option count,
+poll total and version), either committing every vote in their own
+transaction or handing it to a GroupCommitWriter and waiting for the
+result. Prints one JSON object per mode with votes and commits per second,
+errors (e.g. "database is locked"), latency percentiles and the batch size
+distribution.
+
+    cd backend && python -m benchmarks.bench_group_commit --threads 32 --writes 100
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.group_commit import GroupCommitWriter, writer_engine
+from app.models import Base, Poll, PollOption, User, Vote
+
+def setup(engine, users):
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        prefix = f"bench_group_commit_{time.time_ns()}"
+        session.execute(User.__table__.insert(), [
+            {"username": f"{prefix}_{i}", "email": f"{prefix}_{i}@bench.local", "password_hash": ""}
+            for i in range(users + 1)
+        ])
+        user_ids = session.execute(
+            select(User.id).where(User.username.like(f"{prefix}_%")).order_by(User.id)
+        ).scalars().all()
+        poll = Poll(title="Group commit", creator_id=user_ids[0], total_votes=0, version=1)
+        session.add(poll)
+        session.flush()
+        option = PollOption(poll_id=poll.id, option_text="Option", vote_count=0)
+        session.add(option)
+        session.commit()
+        return Session, poll.id, option.id, user_ids[1:]
+
+def vote(poll_id, option_id, user_id):
+    def write(session):
+        session.add(Vote(user_id=user_id, poll_id=poll_id, option_id=option_id))
+        options, polls = PollOption.__table__, Poll.__table__
+        session.execute(options.update().where(options.c.id == option_id)
+                        .values(vote_count=options.c.vote_count + 1))
+        session.execute(polls.update().where(polls.c.id == poll_id)
+                        .values(total_votes=polls.c.total_votes + 1, version=polls.c.version + 1))
+        session.flush()
+    return write
+
+class RecordingWriter(GroupCommitWriter):
+    """Keeps the size of every committed batch"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sizes = Counter()
+
+    def commit_batch(self, batch):
+        super().commit_batch(batch)
+        self.batch_sizes[len(batch)] += 1
+
+def run(engine, mode, threads, writes, max_batch, max_wait):
+    Session, poll_id, option_id, user_ids = setup(engine, threads * writes)
+    writer = RecordingWriter(writer_engine(engine), max_batch, max_wait) if mode == "group_commit" else None
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def worker(index):
+        local = []
+        with Session() as session:
+            for user_id in user_ids[index * writes:(index + 1) * writes]:
+                operation = vote(poll_id, option_id, user_id)
+                start = time.perf_counter()
+                try:
+                    if writer is not None:
+                        writer.run(operation)
+                    else:
+                        operation(session)
+                        session.commit()
+                except Exception as e:
+                    session.rollback()
+                    with lock:
+                        # The driver's message, e.g. "database is locked"
+                        errors[str(getattr(e, "orig", e))[:80]] += 1
+                    continue
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with Session() as session:
+        counted = session.execute(select(PollOption.vote_count).where(PollOption.id == option_id)).scalar()
+
+    commits = sum(writer.batch_sizes.values()) if writer is not None else len(latencies)
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3) if latencies else None
+    return {
+        "mode": mode,
+        "dialect": engine.dialect.name,
+        "threads": threads,
+        "votes": len(latencies),
+        "errors": dict(errors),
+        "seconds": round(elapsed, 3),
+        "votes_per_second": round(len(latencies) / elapsed, 1),
+        "commits_per_second": round(commits / elapsed, 1),
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "batch_sizes": dict(sorted(writer.batch_sizes.items())) if writer is not None else None,
+        "exact": counted == len(latencies)
+    }
+
+MODES = ("direct", "group_commit")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=100, help="per thread")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--busy-timeout", type=float, default=5, help="SQLite lock wait in seconds")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-group-commit-'), 'votes.db')}"
+    connect_args = {"timeout": args.busy_timeout, "check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=args.threads, max_overflow=0, connect_args=connect_args)
+    for mode in args.modes.split(","):
+        print(json.dumps(run(engine, mode.strip(), args.threads, args.writes,
+                             args.max_batch, args.max_wait_ms / 1000)), flush=True)
+
+if __name__ == "__main__":
+    main()
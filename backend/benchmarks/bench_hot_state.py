@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Memory of live poll state: app.hot_state entries vs ORM objects vs dicts.
+
+Seeds --polls polls with --options options each into a throwaway SQLite
+database and loads them the way GET /api/polls/{id} does (poll, creator and
+options as ORM objects). Reports traced memory per 100k polls for:
+
+- hot_state: PollState entries in a HotStateStore (arrays, ints, one tuple);
+- hot_state_counts: the same without the text fields, i.e. what the arrays
+  and counters alone cost;
+- orm: the loaded ORM objects held by their session;
+- dict: detail dicts shaped like the API response.
+
+ORM objects and dicts are measured on --sample polls and scaled. Also
+prints the time to build one detail from an entry and to load one from the
+database.
+
+    cd backend && python -m benchmarks.bench_hot_state --polls 100000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+
+from app.counter_shards import ShardTotals
+from app.hot_state import HotStateStore
+from app.models import Base, Poll, PollOption, User
+
+PER = 100_000
+CHUNK = 5_000
+
+def seed(engine, polls, options):
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "bench_hot_state", "email": "bench@bench.local",
+                                                "password_hash": "", "created_at": now}])
+        for start in range(1, polls + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, polls + 1))
+            conn.execute(Poll.__table__.insert(), [
+                {"id": i, "title": f"Which option should poll {i} pick?", "description": "bench_hot_state fixture poll",
+                 "creator_id": 1, "created_at": now, "updated_at": now, "is_active": True,
+                 "total_votes": 10 * options, "total_likes": 3, "version": 1}
+                for i in ids
+            ])
+            conn.execute(PollOption.__table__.insert(), [
+                {"poll_id": i, "option_text": f"Option {j}", "vote_count": 10}
+                for i in ids for j in range(options)
+            ])
+
+def load(Session, first, count):
+    """Polls first..first+count-1 as the detail route loads them, in one session"""
+    session = Session()
+    polls = session.execute(
+        select(Poll).options(joinedload(Poll.creator), selectinload(Poll.options))
+        .where(Poll.id >= first, Poll.id < first + count)
+    ).unique().scalars().all()
+    return session, polls
+
+def detail_dict(poll):
+    creator = poll.creator
+    return {
+        "title": poll.title, "description": poll.description, "id": poll.id,
+        "created_at": poll.created_at, "updated_at": poll.updated_at, "creator_id": poll.creator_id,
+        "is_active": poll.is_active, "total_votes": poll.total_votes, "total_likes": poll.total_likes,
+        "creator": {"username": creator.username, "email": creator.email, "id": creator.id,
+                    "created_at": creator.created_at},
+        "options": [{"option_text": option.option_text, "id": option.id, "poll_id": option.poll_id,
+                     "vote_count": option.vote_count} for option in poll.options]
+    }
+
+def _traced(build):
+    """Bytes still allocated by build() once it returns, and its result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return memory, result
+
+def measure_store(Session, polls, counts_only):
+    def build():
+        store = HotStateStore(max_polls=polls)
+        for first in range(1, polls + 1, CHUNK):
+            session, loaded = load(Session, first, CHUNK)
+            for poll in loaded:
+                state = store.load(poll, ShardTotals())
+                if counts_only:
+                    state.header = ()
+            session.close()
+        return store
+    memory, store = _traced(build)
+    return {"structure": "hot_state_counts" if counts_only else "hot_state", "polls": len(store),
+            "bytes_per_poll": round(memory / len(store), 1), "mib_per_100k": round(memory / len(store) * PER / 2**20, 1)}, store
+
+def measure_loaded(Session, sample, as_dicts):
+    def build():
+        session, loaded = load(Session, 1, sample)
+        if as_dicts:
+            details = [detail_dict(poll) for poll in loaded]
+            session.close()
+            return details
+        return session, loaded
+    memory, _ = _traced(build)
+    return {"structure": "dict" if as_dicts else "orm", "polls": sample,
+            "bytes_per_poll": round(memory / sample, 1), "mib_per_100k": round(memory / sample * PER / 2**20, 1)}
+
+def measure_detail_time(Session, store, requests):
+    poll_ids = list(range(1, requests + 1))
+    start = time.perf_counter()
+    for poll_id in poll_ids:
+        state = store.get(poll_id)
+        [(option_id, text, count) for option_id, text, count in state.options()]
+    from_store = (time.perf_counter() - start) / requests
+    start = time.perf_counter()
+    with Session() as session:
+        for poll_id in poll_ids:
+            poll = session.execute(
+                select(Poll).options(joinedload(Poll.creator), selectinload(Poll.options)).where(Poll.id == poll_id)
+            ).unique().scalar_one()
+            detail_dict(poll)
+            session.expunge_all()
+    from_db = (time.perf_counter() - start) / requests
+    return {"detail_from_store_us": round(from_store * 1e6, 2), "detail_from_db_us": round(from_db * 1e6, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=PER)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=10_000, help="polls measured as ORM objects and dicts")
+    parser.add_argument("--requests", type=int, default=2_000, help="detail reads timed per source")
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-hot-state-'), 'polls.db')}"
+    engine = create_engine(url)
+    seed(engine, args.polls, args.options)
+    Session = sessionmaker(bind=engine)
+
+    result, store = measure_store(Session, args.polls, counts_only=False)
+    print(json.dumps(result), flush=True)
+    print(json.dumps(measure_store(Session, args.polls, counts_only=True)[0]), flush=True)
+    sample = min(args.sample, args.polls)
+    print(json.dumps(measure_loaded(Session, sample, as_dicts=False)), flush=True)
+    print(json.dumps(measure_loaded(Session, sample, as_dicts=True)), flush=True)
+    print(json.dumps(measure_detail_time(Session, store, min(args.requests, args.polls))), flush=True)
+
+if __name__ == "__main__":
+    main()
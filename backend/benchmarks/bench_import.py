@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Poll creation throughput: one request per poll vs POST /api/polls:import.
+
+Creates --polls polls through POST /api/polls one at a time, then imports
+--import-polls polls as one NDJSON body, against a throwaway SQLite
+database in-process or a running server (--url). Prints one JSON object
+per mode with polls per second.
+
+    cd backend && python -m benchmarks.bench_import --backend fastapi
+    cd backend && python -m benchmarks.bench_import --backend flask --import-polls 20000
+    cd backend && python -m benchmarks.bench_import --url http://localhost:8000 --token <flask JWT>
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+def _poll(i, options):
+    return {
+        "title": f"Imported poll {i}",
+        "description": "bench_import fixture",
+        "options": [{"option_text": f"Option {j}"} for j in range(options)]
+    }
+
+def load_client(backend, url):
+    """post(path, **kwargs) against a server URL or an in-process app"""
+    if url:
+        import httpx
+        client = httpx.Client(base_url=url, timeout=300)
+        return client.post
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='poll-import-'), 'bench.db')}")
+    os.environ.setdefault("ADMISSION_CONTROL", "0")
+    if backend == "flask":
+        import app_flask
+        client = app_flask.app.test_client()
+        return lambda path, content=None, **kwargs: client.post(path, data=content, **kwargs)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app).post
+
+def flask_token(post):
+    username = f"bench_import_{time.time_ns()}"
+    response = post("/api/auth/signup", json={"username": username, "email": f"{username}@bench.local",
+                                              "password": "bench-password"})
+    return response.get_json()["access_token"]
+
+def run_single(post, headers, polls, options):
+    start = time.perf_counter()
+    for i in range(polls):
+        response = post("/api/polls/", json=_poll(i, options), headers=headers)
+        assert response.status_code == 200, response.status_code
+    seconds = time.perf_counter() - start
+    return {"mode": "create_one_by_one", "polls": polls, "seconds": round(seconds, 3),
+            "polls_per_second": round(polls / seconds, 1)}
+
+def run_import(post, headers, polls, options):
+    body = "".join(json.dumps(_poll(i, options)) + "\n" for i in range(polls)).encode("utf-8")
+    start = time.perf_counter()
+    response = post("/api/polls:import", content=body,
+                    headers={**headers, "Content-Type": "application/x-ndjson"})
+    seconds = time.perf_counter() - start
+    summary = response.json() if callable(getattr(response, "json", None)) else response.get_json()
+    return {"mode": "ndjson_import", "polls": polls, "imported": summary.get("imported"),
+            "failed": summary.get("failed"), "body_bytes": len(body), "seconds": round(seconds, 3),
+            "polls_per_second": round(polls / seconds, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fastapi", "flask"], default="fastapi")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--token", help="bearer token for the Flask backend with --url")
+    parser.add_argument("--polls", type=int, default=500, help="polls created one request at a time")
+    parser.add_argument("--import-polls", type=int, default=10_000, help="polls in the NDJSON import")
+    parser.add_argument("--options", type=int, default=4)
+    args = parser.parse_args()
+
+    post = load_client(args.backend, args.url)
+    headers = {"User-Agent": "bench-import"}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+    elif args.backend == "flask" and not args.url:
+        headers["Authorization"] = f"Bearer {flask_token(post)}"
+
+    if args.polls:
+        print(json.dumps(run_single(post, headers, args.polls, args.options)), flush=True)
+    if args.import_polls:
+        print(json.dumps(run_import(post, headers, args.import_polls, args.options)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Startup time and throughput of the ways each backend can be launched.
+
+Starts the backend once per launch mode against a seeded database (see
+benchmarks.seed), measures the seconds from spawning the process to the
+first healthy /health, runs the feed_browse scenario of benchmarks.loadtest
+against it, and stops it again. Prints one JSON object per mode.
+
+    cd backend
+    python -m benchmarks.seed --backend fastapi --database-url sqlite:////tmp/bench.db \\
+        --polls 2000 --manifest /tmp/bench.json
+    python -m benchmarks.bench_launch --backend fastapi --database-url sqlite:////tmp/bench.db \\
+        --manifest /tmp/bench.json --duration 15
+
+Modes: fastapi runs uvicorn directly (uvicorn) and app.launcher; flask runs
+run.py (socketio.run), the Procfile's plain gunicorn command (gunicorn) and
+app.launcher. --workers is passed to app.launcher.
+
+Keep --concurrency within a FastAPI worker's connection pool (15 by
+default): its routes query synchronously and release their connection only
+after the response is sent, so one more request blocks the event loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.loadtest import Context, _free_port, feed_browse
+
+def commands(backend, port, workers):
+    bind = f"127.0.0.1:{port}"
+    launcher = [sys.executable, "-m", "app.launcher", "--backend", backend, "--bind", bind]
+    if workers:
+        launcher += ["--workers", str(workers)]
+    if backend == "fastapi":
+        return {
+            "uvicorn": [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                        "--port", str(port), "--log-level", "warning"],
+            "launcher": launcher,
+        }
+    return {
+        "socketio_run": [sys.executable, "run.py"],
+        "gunicorn": [sys.executable, "-m", "gunicorn", "--worker-class", "gevent", "-w", "1",
+                     "-b", bind, "app_flask:app"],
+        "launcher": launcher,
+    }
+
+def wait_healthy(process, base_url, timeout=60):
+    """Seconds until /health answers 200"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + "/health", timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise SystemExit(f"server did not become healthy within {timeout}s")
+
+async def browse(args, manifest):
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        return await feed_browse(Context(args, manifest, client))
+
+def run_mode(args, manifest, mode, command, port):
+    env = dict(os.environ, DATABASE_URL=args.database_url, PORT=str(port))
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        args.base_url = f"http://127.0.0.1:{port}"
+        startup = wait_healthy(process, args.base_url)
+        result = asyncio.run(browse(args, manifest))
+    finally:
+        stopping = time.perf_counter()
+        process.terminate()
+        try:
+            process.wait(timeout=args.graceful_timeout + 5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutdown = time.perf_counter() - stopping
+    return {"backend": args.backend, "mode": mode, "startup_s": round(startup, 3),
+            "shutdown_s": round(shutdown, 3), **result}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fastapi", "flask"], required=True)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--manifest", help="fixture JSON written by benchmarks.seed")
+    parser.add_argument("--modes", help="comma separated, default all modes of the backend")
+    parser.add_argument("--workers", type=int, default=0, help="app.launcher workers (default: its own)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    manifest = {}
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+
+    port = _free_port()
+    available = commands(args.backend, port, args.workers)
+    modes = [mode.strip() for mode in args.modes.split(",")] if args.modes else list(available)
+    unknown = [mode for mode in modes if mode not in available]
+    if unknown:
+        parser.error(f"unknown modes for {args.backend}: {', '.join(unknown)}")
+    for mode in modes:
+        print(json.dumps(run_mode(args, manifest, mode, available[mode], port)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Per-poll member set cost at scale.
+
+Fills an IdBitmap (app.membership) with N user ids and reports memory per
+id next to a plain Python set, add and lookup time, and the false-positive
+rate measured by probing ids that are not members (0 for an exact set).
+"dense" ids are a contiguous block, like sequential user ids on a poll
+everyone votes on; "sparse" ids are a random sample of a 10x larger range.
+Prints one JSON object per distribution.
+
+    cd backend && python -m benchmarks.bench_membership --ids 10000000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from app.membership import IdBitmap
+
+def _ids(distribution, count, probes, rng):
+    """Member ids and ids known not to be members"""
+    if distribution == "dense":
+        return range(1, count + 1), range(count + 1, count + probes + 1)
+    universe = count * 10
+    members = rng.sample(range(universe), count)
+    member_set = set(members)
+    non_members = []
+    while len(non_members) < probes:
+        user_id = rng.randrange(universe)
+        if user_id not in member_set:
+            non_members.append(user_id)
+    return members, non_members
+
+def _set_bytes_per_id(count):
+    """Traced bytes per id of a plain Python set, measured on at most 1M ids"""
+    count = min(count, 1_000_000)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sample = set(range(1 << 20, (1 << 20) + count))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del sample
+    return size / count
+
+def run(distribution, count, probes, seed):
+    rng = random.Random(seed)
+    members, non_members = _ids(distribution, count, probes, rng)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    bitmap = IdBitmap()
+    for user_id in members:
+        bitmap.add(user_id)
+    add_seconds = time.perf_counter() - start
+    traced_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    hits = [members[rng.randrange(count)] for _ in range(probes)]
+
+    start = time.perf_counter()
+    found = sum(1 for user_id in hits if user_id in bitmap)
+    hit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    false_positives = sum(1 for user_id in non_members if user_id in bitmap)
+    miss_seconds = time.perf_counter() - start
+
+    return {
+        "distribution": distribution,
+        "ids": count,
+        "members": len(bitmap),
+        "payload_mib": round(bitmap.memory_bytes() / 2**20, 2),
+        "traced_mib": round(traced_bytes / 2**20, 2),
+        "bytes_per_id": round(traced_bytes / count, 3),
+        "python_set_bytes_per_id": round(_set_bytes_per_id(count), 1),
+        "add_us": round(add_seconds / count * 1e6, 3),
+        "lookup_hit_us": round(hit_seconds / probes * 1e6, 3),
+        "lookup_miss_us": round(miss_seconds / probes * 1e6, 3),
+        "false_negatives": probes - found,
+        "false_positive_rate": false_positives / probes
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=10_000_000)
+    parser.add_argument("--probes", type=int, default=1_000_000, help="member and non-member lookups each")
+    parser.add_argument("--distribution", choices=["dense", "sparse", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    distributions = ["dense", "sparse"] if args.distribution == "both" else [args.distribution]
+    for distribution in distributions:
+        print(json.dumps(run(distribution, args.ids, args.probes, args.seed)), flush=True)
+
+if __name__ == "__main__":
+    main()
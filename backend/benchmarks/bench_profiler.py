@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Cost of one sample of app.sampling_profiler.
+
+Parks --tasks asyncio tasks, each suspended --depth coroutines deep (a
+request waiting on the database or a socket sits about 20 deep in the
+middleware stack), and times StackSampler.sample() over them: the time the
+sampler holds the GIL per sample. Also reports what share of one CPU that
+is at the default interval before PROFILER_MAX_OVERHEAD spaces samples out.
+Prints one JSON object per task count.
+
+    cd backend && python -m benchmarks.bench_profiler --tasks 0,100,1000 --depth 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app import sampling_profiler
+
+async def nested(depth, event):
+    if depth <= 1:
+        await event.wait()
+    else:
+        await nested(depth - 1, event)
+
+async def measure(tasks, depth, samples):
+    event = asyncio.Event()
+    parked = [asyncio.create_task(nested(depth, event)) for _ in range(tasks)]
+    await asyncio.sleep(0)
+    loop = asyncio.get_running_loop()
+    sampler = sampling_profiler.StackSampler(
+        sampling_profiler.DEFAULT_INTERVAL_MS / 1000,
+        lambda sampler: sampling_profiler._task_stacks(sampler, loop, None),
+    )
+    # Stand in for the sampler thread: sample from another thread, as in production
+    start = time.perf_counter()
+    await loop.run_in_executor(None, lambda: [sampler.sample() for _ in range(samples)])
+    seconds = (time.perf_counter() - start) / samples
+    event.set()
+    await asyncio.gather(*parked)
+    return seconds, len(sampler.stacks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", default="0,100,1000")
+    parser.add_argument("--depth", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    interval = sampling_profiler.DEFAULT_INTERVAL_MS / 1000
+    for tasks in (int(value) for value in args.tasks.split(",")):
+        seconds, stacks = asyncio.run(measure(tasks, args.depth, args.samples))
+        print(json.dumps({
+            "tasks": tasks, "depth": args.depth, "sample_ms": round(seconds * 1000, 3), "stacks": stacks,
+            "cpu_share_at_default_interval": round(min(seconds / interval, sampling_profiler.MAX_OVERHEAD), 4),
+            "unbounded_share": round(seconds / interval, 4),
+        }), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Serialization cost per 1k polls for the feed and poll detail responses.
+
+Compares the previous Pydantic re-validation path, the stdlib encoder used
+by jsonify(), and the fast path in app.serialization. Prints one JSON
+object per case.
+
+    cd backend && python -m benchmarks.bench_serialization --polls 1000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from app import serialization
+from app.schemas import Poll as PollSchema, PollSummary
+
+def make_polls(count, options_per_poll=4):
+    now = datetime.utcnow()
+    creator = SimpleNamespace(id=1, username="benchmark", email="benchmark@example.com", created_at=now)
+    polls = []
+    for i in range(count):
+        options = [
+            SimpleNamespace(id=i * options_per_poll + j, poll_id=i, option_text=f"Option {j}", vote_count=j * 7)
+            for j in range(options_per_poll)
+        ]
+        polls.append(SimpleNamespace(
+            id=i, title=f"Poll number {i}", description="A reasonably sized description " * 3,
+            created_at=now, updated_at=None, creator_id=1, is_active=True,
+            total_votes=100 + i, total_likes=i % 50, creator=creator, options=options
+        ))
+    return polls
+
+def summary_dict(poll):
+    return {
+        "id": poll.id,
+        "title": poll.title,
+        "description": poll.description,
+        "created_at": poll.created_at,
+        "total_votes": poll.total_votes,
+        "total_likes": poll.total_likes,
+        "creator_username": poll.creator.username
+    }
+
+def detail_dict(poll):
+    return {
+        "title": poll.title,
+        "description": poll.description,
+        "id": poll.id,
+        "created_at": poll.created_at,
+        "updated_at": poll.updated_at,
+        "creator_id": poll.creator_id,
+        "is_active": poll.is_active,
+        "total_votes": poll.total_votes,
+        "total_likes": poll.total_likes,
+        "creator": {
+            "username": poll.creator.username,
+            "email": poll.creator.email,
+            "id": poll.creator.id,
+            "created_at": poll.creator.created_at
+        },
+        "options": [
+            {"option_text": o.option_text, "id": o.id, "poll_id": o.poll_id, "vote_count": o.vote_count}
+            for o in poll.options
+        ]
+    }
+
+def pydantic_feed(polls):
+    models = [PollSummary(**summary_dict(poll)) for poll in polls]
+    return json.dumps([m.model_dump(mode="json") for m in models]).encode("utf-8")
+
+def pydantic_detail(polls):
+    return [PollSchema.model_validate(poll, from_attributes=True).model_dump_json() for poll in polls]
+
+def stdlib_feed(polls):
+    return json.dumps([summary_dict(poll) for poll in polls], default=str).encode("utf-8")
+
+def fast_feed(polls):
+    return serialization.dumps([summary_dict(poll) for poll in polls])
+
+def fast_detail(polls):
+    return [serialization.dumps(detail_dict(poll)) for poll in polls]
+
+CASES = {
+    "feed_pydantic": pydantic_feed,
+    "feed_stdlib_json": stdlib_feed,
+    "feed_fast": fast_feed,
+    "detail_pydantic": pydantic_detail,
+    "detail_fast": fast_detail,
+}
+
+def run(polls, func, repeat):
+    func(polls)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(polls)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    polls = make_polls(args.polls)
+    for name, func in CASES.items():
+        median = run(polls, func, args.repeat)
+        print(json.dumps({
+            "benchmark": "serialization",
+            "case": name,
+            "encoder": serialization.BACKEND,
+            "polls": args.polls,
+            "median_ms": round(median * 1000, 3),
+            "ms_per_1k_polls": round(median * 1000 * 1000 / args.polls, 3)
+        }))
+
+if __name__ == "__main__":
+    main()
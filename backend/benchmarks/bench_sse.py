@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Per-connection cost of SSE streams vs WebSocket connections.
+
+Opens N SSE streams on one poll through the StreamHub (each with its running
+response generator, as the FastAPI route serves it) and N fake sockets
+subscribed to the same poll through the ConnectionManager, each with a task
+parked in receive as the /api/ws handler is. Reports the memory each
+connection adds and the time to deliver one update to all of them; SSE
+delivery includes resuming every stream's task. Server-side state only:
+socket buffers and the ASGI server's own per-connection objects come on top
+for both transports.
+
+    cd backend && python -m benchmarks.bench_sse --connections 20000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from app.sse import StreamHub
+from app.websocket_manager import ConnectionManager
+from benchmarks.bench_connections import FakeWebSocket
+
+POLL_ID = 1
+
+async def _drain(hub, subscription, initial, received):
+    async for chunk in hub.aiter_frames(subscription, initial):
+        received[0] += 1
+
+async def measure_sse(count):
+    hub = StreamHub()
+    received = [0]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = []
+    for _ in range(count):
+        subscription, initial = hub.subscribe(POLL_ID)
+        tasks.append(asyncio.create_task(_drain(hub, subscription, initial, received)))
+    # Let every stream send its first chunk and park on the shared waiter
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    received[0] = 0
+    start = time.perf_counter()
+    hub.publish(POLL_ID, "poll_vote", {"poll_id": POLL_ID, "option_id": 3, "total_votes": 10})
+    while received[0] < count:
+        await asyncio.sleep(0)
+    fanout_seconds = time.perf_counter() - start
+
+    hub.publish(POLL_ID, "poll_closed", {"poll_id": POLL_ID})
+    await asyncio.gather(*tasks)
+    return {"transport": "sse", "connections": count, "bytes_per_connection": round(memory / count, 1),
+            "fanout_ms": round(fanout_seconds * 1000, 3), "delivered": count}
+
+async def _receive(message):
+    # Stands in for the handler's await websocket.receive_text()
+    await message
+
+async def measure_websocket(count):
+    loop = asyncio.get_running_loop()
+    sockets = [FakeWebSocket() for _ in range(count)]
+    manager = ConnectionManager()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    handlers = []
+    for websocket in sockets:
+        manager.register(websocket)
+        manager.subscribe(websocket, [POLL_ID])
+        handlers.append(asyncio.create_task(_receive(loop.create_future())))
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    await manager.broadcast_poll_update(POLL_ID, "vote", {"option_id": 3, "total_votes": 10})
+    fanout_seconds = time.perf_counter() - start
+
+    for handler in handlers:
+        handler.cancel()
+    await asyncio.gather(*handlers, return_exceptions=True)
+    return {"transport": "websocket", "connections": count, "bytes_per_connection": round(memory / count, 1),
+            "fanout_ms": round(fanout_seconds * 1000, 3),
+            "delivered": sum(websocket.received for websocket in sockets)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=20_000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(measure_sse(args.connections))), flush=True)
+    print(json.dumps(asyncio.run(measure_websocket(args.connections))), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tally time of ranked-choice and multiple-choice ballots (app.tally).
+
+Generates --ballots random ballots over --options options (each ranks a
+random number of options, with a skew so runoffs take several rounds),
+packed as stored in the ballots table. Times building the ballot matrix,
+instant runoff and approval counting with NumPy, next to a plain Python
+instant runoff on the same ballots (whose result must match). With
+--database also times loading the ballots back from a throwaway SQLite
+database. Prints one JSON object per measurement.
+
+    cd backend && python -m benchmarks.bench_tally --ballots 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import tally
+
+def make_ballots(count, options, seed):
+    rng = random.Random(seed)
+    option_ids = list(range(101, 101 + options))
+    # Earlier options are more popular, but none has a first-round majority
+    weights = [options - i + 2 for i in range(options)]
+    ballots = []
+    for _ in range(count):
+        length = rng.randint(1, options)
+        ranking = []
+        pool, pool_weights = option_ids[:], weights[:]
+        for _ in range(length):
+            pick = rng.choices(range(len(pool)), pool_weights)[0]
+            ranking.append(pool.pop(pick))
+            pool_weights.pop(pick)
+        ballots.append(ranking)
+    return option_ids, ballots
+
+def python_runoff(ballots, option_ids):
+    """Reference instant runoff with the same tie-breaks as app.tally"""
+    eliminated = set()
+    first = Counter(ballot[0] for ballot in ballots)
+    while True:
+        counts = Counter()
+        for ballot in ballots:
+            for option_id in ballot:
+                if option_id not in eliminated:
+                    counts[option_id] += 1
+                    break
+        continuing = [option_id for option_id in option_ids if option_id not in eliminated]
+        active = sum(counts.values())
+        leader = max(continuing, key=lambda option_id: (counts[option_id], -option_ids.index(option_id)))
+        if active == 0:
+            return None
+        if counts[leader] * 2 > active or len(continuing) == 1:
+            return leader
+        eliminated.add(min(continuing, key=lambda option_id: (counts[option_id], first[option_id],
+                                                               -option_ids.index(option_id))))
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def load_from_database(blobs):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-tally-'), 'ballots.db')}"
+    engine = create_engine(url)
+    from app.models import Ballot, Base
+    Base.metadata.create_all(engine)
+    ballots = Ballot.__table__
+    with engine.begin() as conn:
+        for start in range(0, len(blobs), 50_000):
+            conn.execute(ballots.insert(), [{"poll_id": 1, "user_id": start + i + 1, "choices": blob}
+                                            for i, blob in enumerate(blobs[start:start + 50_000])])
+    with sessionmaker(bind=engine)() as session:
+        return timed(tally.load_ballots, session, ballots, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ballots", type=int, default=1_000_000)
+    parser.add_argument("--options", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database", action="store_true", help="also time loading the ballots from SQLite")
+    parser.add_argument("--skip-python", action="store_true", help="skip the plain Python runoff")
+    args = parser.parse_args()
+
+    option_ids, ballots = make_ballots(args.ballots, args.options, args.seed)
+    blobs = [tally.encode_choices(ballot) for ballot in ballots]
+    report = lambda step, seconds, **extra: print(json.dumps(
+        {"step": step, "ballots": args.ballots, "options": args.options, "ms": round(seconds * 1000, 1), **extra}
+    ), flush=True)
+
+    if args.database:
+        loaded, seconds = load_from_database(blobs)
+        report("load_sqlite", seconds, rows=len(loaded))
+
+    matrix, seconds = timed(tally.ballot_matrix, blobs, option_ids)
+    report("ballot_matrix", seconds, matrix_bytes=matrix.nbytes)
+    (rounds, winner), seconds = timed(tally.instant_runoff, matrix, len(option_ids))
+    winner_id = option_ids[winner] if winner is not None else None
+    report("instant_runoff_numpy", seconds, rounds=len(rounds), winner=winner_id)
+    _, seconds = timed(tally.approval_counts, matrix, len(option_ids))
+    report("approval_counts_numpy", seconds)
+
+    if not args.skip_python:
+        expected, seconds = timed(python_runoff, ballots, option_ids)
+        report("instant_runoff_python", seconds, winner=expected, matches=expected == winner_id)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Query budgets for the poll read endpoints.
+
+Seeds a throwaway SQLite database, exercises the feed, poll detail and
+per-user poll state endpoints of either backend and exits non-zero if any of them runs more
+queries than its budget, listing the statements. Budgets do not depend on
+the number of polls, so an N+1 regression fails regardless of seed size.
+
+    cd backend && python -m benchmarks.check_query_counts --backend fastapi
+    cd backend && python -m benchmarks.check_query_counts --backend flask
+
+tests/test_query_budgets.py runs it for both backends under pytest.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Endpoint -> maximum number of SQL statements
+BUDGETS = {
+    "feed": 3,           # feed version, page with creators, counter shard totals
+    "detail": 3,         # poll joined with creator, options, counter shards
+    "detail_304": 1,     # version lookup only
+    "poll_state": 2,     # requesting user (FastAPI only), votes, ballots and likes union
+}
+
+def load_backend(name, database_url):
+    os.environ["DATABASE_URL"] = database_url
+    if name == "flask":
+        import app_flask
+        ctx = app_flask.app.app_context()
+        ctx.push()
+        client = app_flask.app.test_client()
+        return client, app_flask.db.engine, app_flask.db.session, app_flask
+
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.database import SessionLocal, engine
+    from app.main import app
+    return TestClient(app), engine, SessionLocal(), models
+
+def seed(session, models, polls, options_per_poll=4, likers=3):
+    users = [
+        models.User(username=f"seed_user_{i}", email=f"seed_user_{i}@example.com", password_hash="x")
+        for i in range(likers)
+    ]
+    session.add_all(users)
+    session.flush()
+
+    first_poll_id = None
+    for i in range(polls):
+        poll = models.Poll(title=f"Seeded poll {i}", description="Query budget fixture", creator_id=users[0].id)
+        session.add(poll)
+        session.flush()
+        first_poll_id = first_poll_id or poll.id
+        for j in range(options_per_poll):
+            session.add(models.PollOption(poll_id=poll.id, option_text=f"Option {j}", vote_count=j))
+        for user in users:
+            session.add(models.Like(user_id=user.id, poll_id=poll.id))
+    session.commit()
+    return first_poll_id
+
+def poll_state_auth(backend, session, models):
+    """(query suffix, headers) identifying a seeded user to /api/me/poll-state"""
+    if backend == "flask":
+        user = session.query(models.User).filter_by(username="seed_user_0").one()
+        return "", {"Authorization": f"Bearer {models.create_access_token({'sub': str(user.id)})}"}
+    # The FastAPI backend identifies anonymous users; ?test_user=budget is test_user_budget
+    session.add(models.User(username="test_user_budget", email="test_user_budget@test.local", password_hash="x"))
+    session.commit()
+    return "&test_user=budget", {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fastapi", "flask"], default="fastapi")
+    parser.add_argument("--polls", type=int, default=25)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="poll-query-budget-")
+    database_url = f"sqlite:///{os.path.join(workdir, 'budget.db')}"
+    client, engine, session, models = load_backend(args.backend, database_url)
+
+    from app.query_counter import assert_max_queries
+
+    poll_id = seed(session, models, args.polls)
+
+    failures = 0
+    state_suffix, state_headers = poll_state_auth(args.backend, session, models)
+    poll_ids = ",".join(str(poll_id) for poll_id in range(poll_id, poll_id + args.polls))
+
+    def check(label, path, headers=None, expected_status=200):
+        nonlocal failures
+        over_budget = None
+        try:
+            with assert_max_queries(engine, BUDGETS[label], f"GET {path}") as counter:
+                response = client.get(path, headers=headers or {})
+        except AssertionError as e:
+            over_budget = str(e)
+        ok = response.status_code == expected_status and over_budget is None
+        print(f"{'ok  ' if ok else 'FAIL'} {label:<11} {path.split('?')[0]:<20} status={response.status_code} "
+              f"queries={counter.count} budget={BUDGETS[label]}")
+        if not ok:
+            failures += 1
+            print(over_budget or counter.report())
+        return response
+
+    check("feed", "/api/polls/")
+    detail = check("detail", f"/api/polls/{poll_id}")
+    check("detail_304", f"/api/polls/{poll_id}", {"If-None-Match": detail.headers.get("ETag", "")}, 304)
+    check("poll_state", f"/api/me/poll-state?poll_ids={poll_ids}{state_suffix}", state_headers)
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
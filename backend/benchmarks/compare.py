@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Compare two loadtest result files (baseline first, candidate second).
+
+    python -m benchmarks.compare before.json after.json
+
+Prints per-scenario throughput and latency percentiles with the relative
+change, and exits non-zero when --max-regression is given and any p95 got
+slower or any throughput dropped by more than that percentage.
+"""
+import argparse
+import json
+import sys
+
+FIELDS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {result["scenario"]: result for result in report["results"]}
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--max-regression", type=float, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    base_report, baseline = load(args.baseline)
+    cand_report, candidate = load(args.candidate)
+    print(f"baseline  {base_report.get('commit')} {base_report.get('backend')}")
+    print(f"candidate {cand_report.get('commit')} {cand_report.get('backend')}")
+
+    regressions = []
+    for scenario in baseline:
+        if scenario not in candidate or "skipped" in baseline[scenario] or "skipped" in candidate[scenario]:
+            continue
+        print(f"\n{scenario}")
+        for field in FIELDS:
+            before, after = baseline[scenario].get(field), candidate[scenario].get(field)
+            delta = change(before, after)
+            print(f"  {field:<15} {before!s:>12} -> {after!s:>12}  "
+                  f"{'' if delta is None else f'{delta:+.1f}%'}")
+            if args.max_regression is None or delta is None:
+                continue
+            worse = -delta if field == "throughput_rps" else delta
+            if field in ("throughput_rps", "p95_ms") and worse > args.max_regression:
+                regressions.append(f"{scenario} {field} {delta:+.1f}%")
+
+    if regressions:
+        print("\nregressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Load-test scenarios for the poll API and its real-time channel.
+
+Runs against either backend, optionally launching it on a seeded database
+(see benchmarks.seed), and reports latency percentiles and throughput per
+scenario as JSON so runs can be compared between commits with
+benchmarks.compare.
+
+    cd backend
+    python -m benchmarks.seed --backend flask --database-url sqlite:////tmp/bench.db \\
+        --manifest /tmp/bench.json
+    python -m benchmarks.loadtest --backend flask --launch --database-url sqlite:////tmp/bench.db \\
+        --manifest /tmp/bench.json --output results.json
+
+Scenarios: feed_browse, search, vote_storm, like_churn, signin_burst,
+ws_latency (N listeners, end-to-end vote-to-update latency).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import jwt
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, seconds, status):
+        self.latencies.append(seconds)
+        key = str(status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if not isinstance(status, int) or status >= 500:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        values = sorted(self.latencies)
+        ms = lambda v: None if v is None else round(v * 1000, 3)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "statuses": self.statuses,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1] if values else None),
+            "elapsed_s": round(elapsed, 3)
+        }
+
+class Context:
+    def __init__(self, args, manifest, client):
+        self.args = args
+        self.backend = args.backend
+        self.base_url = args.base_url
+        self.manifest = manifest
+        self.client = client
+        self.rng = random.Random(args.seed)
+        self._tokens = {}
+
+    @property
+    def users(self):
+        return self.manifest.get("users", 1)
+
+    @property
+    def polls(self):
+        return self.manifest.get("polls", 1)
+
+    def user_id(self, n):
+        return self.manifest.get("first_user_id", 1) + n % self.users
+
+    def random_poll_id(self):
+        return self.manifest.get("first_poll_id", 1) + self.rng.randrange(self.polls)
+
+    def identity_headers(self, n):
+        """Headers that make a request come from virtual user n"""
+        if self.backend == "flask":
+            user_id = self.user_id(n)
+            token = self._tokens.get(user_id)
+            if token is None:
+                token = self._tokens[user_id] = jwt.encode(
+                    {"sub": str(user_id), "username": f"bench_user_{user_id}",
+                     "exp": datetime.utcnow() + timedelta(hours=2)},
+                    self.args.jwt_secret, algorithm="HS256"
+                )
+            return {"Authorization": f"Bearer {token}"}
+        # The FastAPI backend identifies anonymous users by client IP and user agent
+        return {"User-Agent": f"bench-client-{n % self.users}"}
+
+    async def request(self, recorder, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        recorder.record(time.perf_counter() - start, status)
+        return response
+
+async def closed_loop(ctx, step, concurrency, duration):
+    """Run step(worker, iteration, recorder) from concurrency workers for duration seconds"""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        iteration = 0
+        while time.perf_counter() < deadline:
+            await step(index, iteration, recorder)
+            iteration += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return recorder.summary(time.perf_counter() - start)
+
+async def hot_poll_options(ctx):
+    poll_id = ctx.manifest.get("hot_poll_id", 1)
+    response = await ctx.client.get(f"/api/polls/{poll_id}")
+    response.raise_for_status()
+    return poll_id, [option["id"] for option in response.json()["options"]]
+
+@scenario("feed_browse")
+async def feed_browse(ctx):
+    """Mostly feed pages, some poll detail views"""
+    page = ctx.args.page_size
+
+    async def step(worker, iteration, recorder):
+        if ctx.rng.random() < 0.8:
+            skip = ctx.rng.randrange(max(1, ctx.polls - page))
+            await ctx.request(recorder, "GET", "/api/polls/", params={"skip": skip, "limit": page})
+        else:
+            await ctx.request(recorder, "GET", f"/api/polls/{ctx.random_poll_id()}")
+
+    return await closed_loop(ctx, step, ctx.args.concurrency, ctx.args.duration)
+
+@scenario("search")
+async def search(ctx):
+    from benchmarks.seed import WORDS
+
+    async def step(worker, iteration, recorder):
+        word = ctx.rng.choice(WORDS)
+        term = word[:max(3, len(word) - ctx.rng.randrange(3))]
+        await ctx.request(recorder, "GET", "/api/polls/search", params={"q": term})
+
+    return await closed_loop(ctx, step, ctx.args.concurrency, ctx.args.duration)
+
+@scenario("vote_storm")
+async def vote_storm(ctx):
+    """Many distinct users voting on one hot poll"""
+    poll_id, option_ids = await hot_poll_options(ctx)
+
+    async def step(worker, iteration, recorder):
+        user = worker * 100_003 + iteration
+        await ctx.request(
+            recorder, "POST", f"/api/polls/{poll_id}/vote",
+            json={"poll_id": poll_id, "option_id": ctx.rng.choice(option_ids)},
+            headers=ctx.identity_headers(user)
+        )
+
+    return await closed_loop(ctx, step, ctx.args.concurrency, ctx.args.duration)
+
+@scenario("like_churn")
+async def like_churn(ctx):
+    """Like then unlike random polls; 4xx (already liked / not liked) is expected churn"""
+    async def step(worker, iteration, recorder):
+        headers = ctx.identity_headers(worker * 100_003 + iteration)
+        poll_id = ctx.random_poll_id()
+        await ctx.request(recorder, "POST", f"/api/polls/{poll_id}/like", headers=headers)
+        await ctx.request(recorder, "DELETE", f"/api/polls/{poll_id}/like", headers=headers)
+
+    return await closed_loop(ctx, step, ctx.args.concurrency, ctx.args.duration)
+
+@scenario("signin_burst")
+async def signin_burst(ctx):
+    if ctx.backend != "flask":
+        return {"skipped": "the FastAPI backend has no sign-in route"}
+
+    async def step(worker, iteration, recorder):
+        user_id = ctx.user_id(worker * 100_003 + iteration)
+        await ctx.request(recorder, "POST", "/api/auth/signin", json={
+            "username": f"bench_user_{user_id}",
+            "password": ctx.manifest.get("password", "benchmark-password")
+        })
+
+    return await closed_loop(ctx, step, ctx.args.concurrency, ctx.args.duration)
+
+async def _fastapi_listener(ctx, poll_id, arrivals, ready):
+    import websockets
+
+    url = ctx.base_url.replace("http", "ws", 1) + "/api/ws"
+    async with websockets.connect(url, max_queue=None) as ws:
+        ready.set()
+        async for raw in ws:
+            message = json.loads(raw)
+            if message.get("type") == "ping":
+                await ws.send('{"type": "pong"}')
+            elif message.get("type") == "poll_vote" and message.get("data", {}).get("poll_id") == poll_id:
+                arrivals.put_nowait(time.perf_counter())
+
+async def _socketio_listener(ctx, poll_id, arrivals, ready, stop):
+    import socketio
+
+    client = socketio.AsyncClient(reconnection=False)
+
+    @client.on("poll_vote")
+    async def on_vote(data):
+        if data.get("poll_id") == poll_id:
+            arrivals.put_nowait(time.perf_counter())
+
+    await client.connect(ctx.base_url)
+    ready.set()
+    await stop.wait()
+    await client.disconnect()
+
+@scenario("ws_latency")
+async def ws_latency(ctx):
+    """N real-time listeners; sequential votes; time from vote request to delivery"""
+    poll_id, option_ids = await hot_poll_options(ctx)
+    listeners = ctx.args.listeners
+    stop = asyncio.Event()
+    queues, readies, tasks = [], [], []
+
+    connect_start = time.perf_counter()
+    for _ in range(listeners):
+        queue, ready = asyncio.Queue(), asyncio.Event()
+        if ctx.backend == "flask":
+            task = asyncio.create_task(_socketio_listener(ctx, poll_id, queue, ready, stop))
+        else:
+            task = asyncio.create_task(_fastapi_listener(ctx, poll_id, queue, ready))
+        queues.append(queue)
+        readies.append(ready)
+        tasks.append(task)
+    await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in readies)), timeout=120)
+    connect_seconds = time.perf_counter() - connect_start
+
+    delivery = Recorder()
+    votes = Recorder()
+    missed = 0
+    start = time.perf_counter()
+    for i in range(ctx.args.ws_votes):
+        sent = time.perf_counter()
+        await ctx.request(votes, "POST", f"/api/polls/{poll_id}/vote",
+                          json={"poll_id": poll_id, "option_id": ctx.rng.choice(option_ids)},
+                          headers=ctx.identity_headers(i))
+        for queue in queues:
+            try:
+                arrived = await asyncio.wait_for(queue.get(), timeout=ctx.args.ws_timeout)
+                delivery.record(arrived - sent, 200)
+            except asyncio.TimeoutError:
+                missed += 1
+    elapsed = time.perf_counter() - start
+
+    # Socket.IO listeners disconnect cleanly on stop; raw WebSockets are cancelled
+    stop.set()
+    done, pending = await asyncio.wait(tasks, timeout=5)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    result = delivery.summary(elapsed)
+    result.update({
+        "listeners": listeners,
+        "votes": votes.summary(elapsed),
+        "missed_deliveries": missed,
+        "connect_s": round(connect_seconds, 3)
+    })
+    return result
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def launch_server(args):
+    """Start the selected backend on a free port against args.database_url"""
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=args.database_url, JWT_SECRET_KEY=args.jwt_secret)
+    if args.backend == "flask":
+        command = [sys.executable, "-m", "gunicorn", "--worker-class", "gevent", "-w", "1",
+                   "-b", f"127.0.0.1:{port}", "--log-level", "warning", "app_flask:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with code {process.returncode}: {' '.join(command)}")
+        try:
+            if httpx.get(base_url + "/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("server did not become healthy within 60s")
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args, manifest):
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        ctx = Context(args, manifest, client)
+        results = []
+        for name in args.scenarios:
+            result = await SCENARIOS[name](ctx)
+            result = {"scenario": name, **result}
+            print(json.dumps(result), flush=True)
+            results.append(result)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fastapi", "flask"], required=True)
+    parser.add_argument("--base-url", help="URL of a running server (omit with --launch)")
+    parser.add_argument("--launch", action="store_true", help="start the backend against --database-url")
+    parser.add_argument("--database-url", help="database the launched server uses")
+    parser.add_argument("--manifest", help="fixture JSON written by benchmarks.seed")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, default all: {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per closed-loop scenario")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--listeners", type=int, default=100)
+    parser.add_argument("--ws-votes", type=int, default=50)
+    parser.add_argument("--ws-timeout", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--jwt-secret", default=os.getenv("JWT_SECRET_KEY", "your-secret-key"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write run metadata and results to this JSON file")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    manifest = {}
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+
+    process = None
+    if args.launch:
+        if not args.database_url:
+            parser.error("--launch needs --database-url")
+        process, args.base_url = launch_server(args)
+    elif not args.base_url:
+        parser.error("give --base-url or --launch")
+
+    try:
+        results = asyncio.run(run(args, manifest))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    if args.output:
+        report = {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "fixture": manifest,
+            "settings": {
+                "concurrency": args.concurrency, "duration": args.duration,
+                "listeners": args.listeners, "ws_votes": args.ws_votes
+            },
+            "results": results
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
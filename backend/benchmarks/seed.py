@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Seed a benchmark database for either backend.
+
+The schema is created by importing the backend itself (so indexes, the
+search index and added columns match production), then users, polls,
+options, votes and likes are bulk inserted with consistent denormalized
+counters. Works with SQLite and PostgreSQL through DATABASE_URL.
+
+    cd backend && python -m benchmarks.seed --backend flask \\
+        --database-url sqlite:////tmp/bench.db --polls 10000 --users 5000 --votes 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import bcrypt
+
+BENCH_PASSWORD = "benchmark-password"
+CHUNK_SIZE = 10_000
+
+WORDS = (
+    "pizza coffee election football music movie travel weather city budget climate school "
+    "science python javascript design summer winter holiday festival policy transport health "
+    "food book series game team park library concert market housing energy ocean mountain"
+).split()
+
+TABLES = {
+    "fastapi": {"user": "users", "poll": "polls", "option": "poll_options", "vote": "votes", "like": "likes"},
+    "flask": {"user": "user", "poll": "poll", "option": "poll_option", "vote": "vote", "like": "like"},
+}
+
+def load_schema(backend, database_url):
+    """Import the backend against database_url; returns (engine, metadata)"""
+    os.environ["DATABASE_URL"] = database_url
+    if backend == "flask":
+        import app_flask
+        ctx = app_flask.app.app_context()
+        ctx.push()
+        return app_flask.db.engine, app_flask.db.metadata
+
+    from app.main import Base, engine  # noqa: F401  (creates tables and indexes)
+    return engine, Base.metadata
+
+def _chunks(rows, size=CHUNK_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(conn, table, rows):
+    count = 0
+    for batch in _chunks(rows):
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+def poll_title(rng, i):
+    return f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} or {rng.choice(WORDS)}? #{i}"
+
+def seed(backend, database_url, polls, options, users, votes, likes, bcrypt_rounds=12, seed_value=42):
+    rng = random.Random(seed_value)
+    engine, metadata = load_schema(backend, database_url)
+    names = TABLES[backend]
+    t_user, t_poll, t_option, t_vote, t_like = (
+        metadata.tables[names[key]] for key in ("user", "poll", "option", "vote", "like")
+    )
+
+    if users and -(-votes // users) > polls:
+        raise SystemExit("votes cannot exceed users * polls (one vote per user per poll)")
+    if likes > users * polls:
+        raise SystemExit("likes cannot exceed users * polls (one like per user per poll)")
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(bcrypt_rounds)).decode("utf-8")
+
+    # Votes: every user's first vote goes to the hot poll (index 0), the k-th
+    # to index (u + k - 1) % (polls - 1) + 1, which keeps (user, poll) unique.
+    # Rows are generated twice (counters, then inserts) instead of being held
+    # in memory, so millions of votes stay cheap to seed.
+    def vote_rows():
+        for v in range(votes):
+            user_index, k = v % users, v // users
+            poll_index = 0 if k == 0 or polls == 1 else (user_index + k - 1) % (polls - 1) + 1
+            option_index = (v * 2654435761 >> 7) % options
+            yield user_index, poll_index, option_index
+
+    option_counts = {}
+    for _, poll_index, option_index in vote_rows():
+        key = (poll_index, option_index)
+        option_counts[key] = option_counts.get(key, 0) + 1
+
+    like_pairs = set()
+    while len(like_pairs) < likes:
+        like_pairs.add((rng.randrange(users), rng.randrange(polls)))
+    like_counts = {}
+    for _, poll_index in like_pairs:
+        like_counts[poll_index] = like_counts.get(poll_index, 0) + 1
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        user_base = conn.execute(t_user.select().with_only_columns(t_user.c.id).order_by(t_user.c.id.desc()).limit(1)).scalar() or 0
+        poll_base = conn.execute(t_poll.select().with_only_columns(t_poll.c.id).order_by(t_poll.c.id.desc()).limit(1)).scalar() or 0
+        option_base = conn.execute(t_option.select().with_only_columns(t_option.c.id).order_by(t_option.c.id.desc()).limit(1)).scalar() or 0
+
+        _insert(conn, t_user, (
+            {"id": user_base + u + 1, "username": f"bench_user_{user_base + u + 1}",
+             "email": f"bench_user_{user_base + u + 1}@bench.local", "password_hash": password_hash, "created_at": now}
+            for u in range(users)
+        ))
+        _insert(conn, t_poll, (
+            {"id": poll_base + p + 1, "title": poll_title(rng, poll_base + p + 1),
+             "description": " ".join(rng.choice(WORDS) for _ in range(12)),
+             "creator_id": user_base + 1 + p % users, "is_active": True, "created_at": now,
+             "total_votes": sum(option_counts.get((p, o), 0) for o in range(options)),
+             "total_likes": like_counts.get(p, 0), "version": 1}
+            for p in range(polls)
+        ))
+        _insert(conn, t_option, (
+            {"id": option_base + p * options + o + 1, "poll_id": poll_base + p + 1,
+             "option_text": f"Option {o + 1}", "vote_count": option_counts.get((p, o), 0)}
+            for p in range(polls) for o in range(options)
+        ))
+        _insert(conn, t_vote, (
+            {"user_id": user_base + u + 1, "poll_id": poll_base + p + 1,
+             "option_id": option_base + p * options + o + 1, "created_at": now}
+            for u, p, o in vote_rows()
+        ))
+        _insert(conn, t_like, (
+            {"user_id": user_base + u + 1, "poll_id": poll_base + p + 1, "created_at": now}
+            for u, p in like_pairs
+        ))
+
+    if engine.dialect.name == "postgresql":
+        # Explicit ids were inserted, so move the sequences past them
+        with engine.begin() as conn:
+            for table in (t_user, t_poll, t_option):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                    f"(SELECT max(id) FROM \"{table.name}\"))"
+                )
+
+    return {
+        "backend": backend,
+        "dialect": engine.dialect.name,
+        "users": users, "polls": polls, "options_per_poll": options, "votes": votes, "likes": likes,
+        "first_user_id": user_base + 1, "first_poll_id": poll_base + 1, "hot_poll_id": poll_base + 1,
+        "password": BENCH_PASSWORD,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=sorted(TABLES), required=True)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--polls", type=int, default=1000)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--votes", type=int, default=10_000)
+    parser.add_argument("--likes", type=int, default=2_000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--manifest", help="write the fixture description (ids, password) to this JSON file")
+    args = parser.parse_args()
+
+    manifest = seed(args.backend, args.database_url, args.polls, args.options, args.users,
+                    args.votes, args.likes, args.bcrypt_rounds)
+    output = json.dumps(manifest)
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            f.write(output)
+    print(output)
+    sys.stdout.flush()
+    os._exit(0)  # skip gevent/socketio teardown noise when seeding the Flask schema
+
+if __name__ == "__main__":
+    main()
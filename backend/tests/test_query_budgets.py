@@ -0,0 +1,22 @@
+"""
+Query budgets of the poll read endpoints (benchmarks.check_query_counts) as
+tests, so an N+1 regression fails the test run. Each backend runs in its own
+interpreter: the Flask backend patches the standard library with gevent
+when it is imported.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("backend", ["fastapi", "flask"])
+def test_read_endpoints_stay_within_query_budgets(backend):
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.check_query_counts", "--backend", backend],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
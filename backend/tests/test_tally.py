@@ -0,0 +1,85 @@
+"""
+Ballot matrices and instant-runoff tallies (app.tally) against elections
+counted by hand. Options are given as sorted ids, so option index i is the
+i-th id in each test's OPTIONS.
+"""
+from app import tally
+
+A, B, C, D = 10, 20, 30, 40
+
+def ballots(*groups):
+    """(copies, option ids) groups -> packed ballots"""
+    return [tally.encode_choices(choices) for copies, choices in groups for _ in range(copies)]
+
+def election(option_ids, *groups):
+    rounds, winner = tally.instant_runoff(tally.ballot_matrix(ballots(*groups), option_ids), len(option_ids))
+    return [(counts.tolist(), exhausted, loser) for counts, exhausted, loser in rounds], winner
+
+def test_eliminated_ballots_move_to_their_next_choice():
+    # a 4, b 3, c 2: c is out and both of its ballots go to b, which wins 5-4
+    rounds, winner = election([A, B, C], (4, [A, B]), (3, [B, A]), (2, [C, B]))
+    assert rounds == [([4, 3, 2], 0, 2), ([4, 5, -1], 0, None)]
+    assert winner == 1
+
+def test_majority_in_the_first_round_wins_without_eliminations():
+    rounds, winner = election([A, B, C], (3, [C]), (2, [A]))
+    assert rounds == [([2, 0, 3], 0, None)]
+    assert winner == 2
+
+def test_ties_go_to_fewer_first_preferences_then_the_later_option():
+    rounds, winner = election([A, B, C, D], (3, [A]), (2, [B]), (1, [C, B]), (1, [D, C]))
+    assert rounds == [
+        # c and d tie on votes and first preferences: the later one, d, is out
+        ([3, 2, 1, 1], 0, 3),
+        # b and c tie at 2, but c had fewer first preferences
+        ([3, 2, 2, -1], 0, 2),
+        # d's ballot had nothing left after c; a and b tie at 3, b had fewer first preferences
+        ([3, 3, -1, -1], 1, 1),
+        ([3, -1, -1, -1], 4, None),
+    ]
+    assert winner == 0
+
+def test_exhausted_ballots_do_not_count_towards_the_majority():
+    # After c is out one ballot is exhausted: a wins 3 of the 5 still counted
+    rounds, winner = election([A, B, C], (3, [A]), (2, [B]), (1, [C]))
+    assert rounds == [([3, 2, 1], 0, 2), ([3, 2, -1], 1, None)]
+    assert winner == 0
+
+def test_unknown_option_ids_are_left_out():
+    matrix = tally.ballot_matrix(ballots((1, [A, 99, B]), (1, [99]), (1, [C, A])), [A, B, C])
+    assert matrix.tolist() == [[0, 1], [-1, -1], [2, 0]]
+
+def test_unknown_first_choice_counts_the_next_one():
+    rounds, winner = election([A, B], (2, [99, B]), (1, [A]))
+    assert rounds == [([1, 2], 0, None)]
+    assert winner == 1
+
+def test_poll_without_ballots_has_no_winner():
+    assert tally.ballot_matrix([], [A, B]).shape == (0, 0)
+    rounds, winner = election([A, B])
+    assert rounds == [([0, 0], 0, None)]
+    assert winner is None
+
+def test_results_of_a_poll_without_ballots():
+    result = tally._results(1, tally.RANKED, [(B, "b"), (A, "a")], [])
+    assert result["total_ballots"] == 0
+    assert [option["option_id"] for option in result["options"]] == [A, B]
+    assert result["rounds"] == [{"round": 1, "counts": {A: 0, B: 0}, "exhausted": 0, "eliminated": None}]
+    assert result["winner"] is None
+
+def test_approvals_count_every_choice():
+    result = tally._results(1, tally.MULTIPLE, [(A, "a"), (B, "b"), (C, "c")], ballots((2, [A, C]), (1, [C])))
+    assert [option["votes"] for option in result["options"]] == [2, 0, 3]
+
+def test_cached_results_are_recomputed_when_the_version_moves():
+    cache = tally.TallyCache(max_polls=10)
+    computed = []
+
+    def compute():
+        computed.append(1)
+        return {"computed": len(computed)}
+
+    assert cache.get(1, 5, compute) == {"computed": 1}
+    assert cache.get(1, 5, compute) == {"computed": 1}
+    assert cache.get(1, 6, compute) == {"computed": 2}
+    assert len(computed) == 2
@@ -8,6 +8,7 @@ class WebSocketService {
     this.onDisconnectCallback = null;
     this.onMessageCallback = null;
     this.reconnectInterval = null;
+    this.pollIds = [];
   }
 
   connect(onConnect, onDisconnect) {
@@ -15,7 +16,10 @@ class WebSocketService {
     this.onDisconnectCallback = onDisconnect;
 
     const wsUrl = process.env.REACT_APP_WS_URL || 'http://localhost:8000';
-    this.socket = io(wsUrl);
+    // Sent on every (re)connect, so the server answers with a poll_snapshot
+    this.socket = io(wsUrl, {
+      auth: (cb) => cb({ poll_ids: this.pollIds })
+    });
 
     this.socket.on('connect', () => {
       console.log('Socket.IO connected');
@@ -60,6 +64,16 @@ class WebSocketService {
       }
     });
 
+    // Current state of the polls named in subscribe(), in one message
+    this.socket.on('poll_snapshot', (data) => {
+      if (this.onMessageCallback) {
+        this.onMessageCallback({
+          type: 'poll_snapshot',
+          data: data
+        });
+      }
+    });
+
     this.socket.on('connect_error', (error) => {
       console.error('Socket.IO connection error:', error);
       this.scheduleReconnect();
@@ -81,6 +95,19 @@ class WebSocketService {
     }
   }
 
+  // Ask for the current state of the polls on screen, now and after every
+  // reconnect; returns false when it has to be fetched over REST instead
+  subscribe(pollIds) {
+    this.pollIds = pollIds;
+    if (!this.socket || !this.isConnected) {
+      return false;
+    }
+    if (pollIds.length > 0) {
+      this.socket.emit('subscribe', { poll_ids: pollIds });
+    }
+    return true;
+  }
+
   onPollUpdate(callback) {
     this.onMessageCallback = callback;
   }
@@ -97,6 +124,9 @@ class WebSocketService {
       case 'poll_like':
         console.log('Like updated:', data.data);
         break;
+      case 'poll_snapshot':
+        console.log('Poll snapshot:', data.data);
+        break;
       default:
         console.log('Unknown message type:', data.type);
     }
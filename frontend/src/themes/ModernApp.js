@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import '../App.css';
 import Auth from '../components/Auth';
 import PollList from '../components/PollList';
@@ -14,6 +14,8 @@ function ModernApp() {
   const [selectedPoll, setSelectedPoll] = useState(null);
   const [loading, setLoading] = useState(true);
   const [wsConnected, setWsConnected] = useState(false);
+  // The poll whose detail is open or being opened
+  const selectedPollId = useRef(null);
 
   const checkAuthStatus = async () => {
     if (authService.isAuthenticated()) {
@@ -52,6 +54,17 @@ function ModernApp() {
 
     if (update.type === 'poll_created') {
       setPolls(prev => [update.data.poll, ...prev]);
+    } else if (update.type === 'poll_snapshot') {
+      const snapshot = update.data.polls.find(poll => poll.id === selectedPollId.current);
+      if (snapshot) {
+        // Unchanged state keeps the same object, so the detail is not re-rendered for it
+        setSelectedPoll(prev => JSON.stringify(prev) === JSON.stringify(snapshot) ? prev : snapshot);
+        setPolls(prev => prev.map(poll =>
+          poll.id === snapshot.id
+            ? { ...poll, total_votes: snapshot.total_votes, total_likes: snapshot.total_likes }
+            : poll
+        ));
+      }
     } else if (update.type.startsWith('poll_')) {
       setPolls(prev => prev.map(poll =>
         poll.id === update.data.poll_id
@@ -59,31 +72,20 @@ function ModernApp() {
           : poll
       ));
 
-      if (selectedPoll && selectedPoll.id === update.data.poll_id) {
-        console.log('Updating selectedPoll with WebSocket data:', update.data);
-        console.log('Current selectedPoll votes:', selectedPoll.total_votes);
-        console.log('WebSocket update votes:', update.data.total_votes);
-
+      // Read the open poll through the updater, so this callback (and the socket) never changes
+      setSelectedPoll(selectedPoll => {
+        if (!selectedPoll || selectedPoll.id !== update.data.poll_id) {
+          return selectedPoll;
+        }
         // Only update if WebSocket data is significantly different (prevents override of optimistic updates)
         const hasSignificantChange = update.data.total_votes !== selectedPoll.total_votes ||
                                    update.data.total_likes !== selectedPoll.total_likes ||
                                    JSON.stringify(update.data.options?.map(o => o.vote_count)) !==
                                    JSON.stringify(selectedPoll.options?.map(o => o.vote_count));
-
-        console.log('Significant change check:', {
-          totalVotesChanged: update.data.total_votes !== selectedPoll.total_votes,
-          totalLikesChanged: update.data.total_likes !== selectedPoll.total_likes,
-          optionsChanged: JSON.stringify(update.data.options?.map(o => o.vote_count)) !==
-                         JSON.stringify(selectedPoll.options?.map(o => o.vote_count)),
-          hasSignificantChange
-        });
-
-        if (hasSignificantChange) {
-          setSelectedPoll(prev => ({ ...prev, ...update.data }));
-        }
-      }
+        return hasSignificantChange ? { ...selectedPoll, ...update.data } : selectedPoll;
+      });
     }
-  }, [selectedPoll]);
+  }, []);
 
   const handleCreatePoll = async (pollData) => {
     try {
@@ -123,6 +125,11 @@ function ModernApp() {
   };
 
   const handleSelectPoll = async (pollSummary) => {
+    selectedPollId.current = pollSummary.id;
+    // While connected the poll arrives as a poll_snapshot message
+    if (websocketService.subscribe([pollSummary.id])) {
+      return;
+    }
     try {
       const fullPoll = await pollService.getPoll(pollSummary.id);
       setSelectedPoll(fullPoll);
@@ -131,6 +138,12 @@ function ModernApp() {
     }
   };
 
+  const handleBack = () => {
+    selectedPollId.current = null;
+    websocketService.subscribe([]);
+    setSelectedPoll(null);
+  };
+
   useEffect(() => {
     checkAuthStatus();
     loadPolls();
@@ -196,7 +209,7 @@ function ModernApp() {
             {selectedPoll ? (
               <PollDetail
                 poll={selectedPoll}
-                onBack={() => setSelectedPoll(null)}
+                onBack={handleBack}
                 onVote={handleVote}
                 onLike={handleLike}
                 onUnlike={handleUnlike}